@@ -0,0 +1,112 @@
+#------------------------------------------------------------
+# This file creates a shared response cache resource.
+#
+# Read routes opt in with a decorator placed under the route:
+#
+#   @recipes.route('/recipes', methods=['GET'])
+#   @cache.cached(tags=('recipes', 'users'))
+#   def get_recipes(): ...
+#
+# and write routes drop everything cached under a tag with
+#
+#   cache.invalidate('recipes')
+#
+# Keys are built from the endpoint, its URL arguments and its
+# query string. Each tag has a version number that is part of the
+# key, so invalidating a tag is a single counter bump and the old
+# entries simply age out of the backend. Under @conditional the
+# route's ETag (the database's table versions) is part of the key
+# too, so writes made through other workers are never missed.
+#------------------------------------------------------------
+import functools
+import threading
+
+from flask import request, make_response, g
+
+from backend.cache.backends import make_backend
+
+
+class ResponseCache(object):
+    def __init__(self, app=None):
+        self.backend = None
+        self.default_ttl = 60
+        self.enabled = True
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CACHE_ENABLED', True)
+        app.config.setdefault('CACHE_BACKEND', 'memory')
+        app.config.setdefault('CACHE_MAX_ENTRIES', 1024)
+        app.config.setdefault('CACHE_DEFAULT_TTL', 60)
+        app.config.setdefault('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+
+        self.enabled = app.config['CACHE_ENABLED']
+        self.default_ttl = app.config['CACHE_DEFAULT_TTL']
+        self.backend = make_backend(app.config, app.logger)
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _tag_versions(self, tags):
+        return ','.join(f'{tag}={self.backend.version(tag)}' for tag in tags)
+
+    def _key(self, tags):
+        view_args = sorted((request.view_args or {}).items())
+        query_args = sorted(request.args.items(multi=True))
+        return (f'resp:{request.endpoint}:{view_args}:{query_args}:{self._tag_versions(tags)}'
+                f':{g.get("etag", "")}')
+
+    #------------------------------------------------------------
+    # Decorator for GET routes. Only 200 responses that are not
+    # streamed get stored.
+    def cached(self, tags=(), ttl=None):
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                if not self.enabled or self.backend is None:
+                    return view(*args, **kwargs)
+
+                key = self._key(tags)
+                entry = self.backend.get(key)
+                if entry is not None:
+                    self._count('_hits')
+                    body, status, mimetype = entry
+                    response = make_response(body, status)
+                    response.mimetype = mimetype
+                    return response
+
+                self._count('_misses')
+                response = make_response(view(*args, **kwargs))
+                if response.status_code == 200 and not response.is_streamed:
+                    self.backend.set(key, (response.get_data(), 200, response.mimetype),
+                                     ttl or self.default_ttl)
+                return response
+            return wrapper
+        return decorator
+
+    def invalidate(self, *tags):
+        if self.backend is None:
+            return
+        for tag in tags:
+            self.backend.bump(tag)
+            self._count('_invalidations')
+
+    def stats(self):
+        with self._lock:
+            counters = {
+                'hits': self._hits,
+                'misses': self._misses,
+                'invalidations': self._invalidations,
+            }
+        if self.backend is not None:
+            counters.update(self.backend.stats())
+        return counters
+
+
+cache = ResponseCache()
@@ -0,0 +1,202 @@
+#------------------------------------------------------------
+# Storage backends for the response cache. Every backend has
+# the same small interface:
+#   get(key) -> value or None
+#   set(key, value, ttl)
+#   version(tag) -> current version number of a tag
+#   bump(tag) -> increments the version of a tag
+#   stats() -> dict of counters
+#------------------------------------------------------------
+import logging
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+
+#------------------------------------------------------------
+# In-process LRU with a per-entry TTL. Fast, but every worker
+# process has its own copy. Tag versions are kept outside the LRU
+# so they are never evicted (an evicted version would restart at
+# 0 and could bring old entries back to life).
+class LRUCache(object):
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+        self._evictions = 0
+        self._expirations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[key]
+                self._expirations += 1
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self._evictions += 1
+
+    def version(self, tag):
+        return self._versions.get(tag, 0)
+
+    def bump(self, tag):
+        with self._lock:
+            self._versions[tag] = self._versions.get(tag, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._data),
+                'max_entries': self.max_entries,
+                'evictions': self._evictions,
+                'expirations': self._expirations,
+            }
+
+
+#------------------------------------------------------------
+# A stand-in for an external key/value server (the subset of the
+# redis-py client we use), kept in process memory. Lets the
+# external backend run in development without a Redis container.
+# Like a Redis server with maxmemory-policy allkeys-lru it holds at
+# most max_entries values and evicts the least recently used; the
+# incr() counters (tag versions) live apart and are never evicted,
+# as in LRUCache.
+class LocalKVStore(object):
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._counters = {}
+        self._lock = threading.Lock()
+        self._evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            if key in self._counters:
+                return self._counters[key]
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ex=None):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ex if ex else None, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self._evictions += 1
+
+    def incr(self, key):
+        with self._lock:
+            value = self._counters.get(key, 0) + 1
+            self._counters[key] = value
+            return value
+
+    def flushdb(self):
+        with self._lock:
+            self._data.clear()
+            self._counters.clear()
+
+    def dbsize(self):
+        with self._lock:
+            return len(self._data) + len(self._counters)
+
+
+#------------------------------------------------------------
+# Backend on top of an external key/value server shared by all
+# workers. `client` is a redis.Redis instance or a LocalKVStore.
+# The server does its own eviction, so only entries are reported.
+class ExternalCache(object):
+    def __init__(self, client, prefix='pantrypal:'):
+        self.client = client
+        self.prefix = prefix
+        self._errors = 0
+        self._errors_lock = threading.Lock()
+
+    def _error(self):
+        with self._errors_lock:
+            self._errors += 1
+
+    def get(self, key):
+        try:
+            raw = self.client.get(self.prefix + key)
+        except Exception:
+            self._error()
+            return None
+        return pickle.loads(raw) if raw is not None else None
+
+    def set(self, key, value, ttl=None):
+        try:
+            self.client.set(self.prefix + key, pickle.dumps(value), ex=ttl or None)
+        except Exception:
+            self._error()
+
+    def version(self, tag):
+        try:
+            return int(self.client.get(self.prefix + 'tag:' + tag) or 0)
+        except Exception:
+            self._error()
+            return 0
+
+    def bump(self, tag):
+        try:
+            self.client.incr(self.prefix + 'tag:' + tag)
+        except Exception:
+            self._error()
+
+    def clear(self):
+        self.client.flushdb()
+
+    def stats(self):
+        try:
+            entries = self.client.dbsize()
+        except Exception:
+            entries = None
+        return {'entries': entries, 'errors': self._errors}
+
+
+#------------------------------------------------------------
+# Builds the backend named by CACHE_BACKEND:
+#   memory - LRUCache (the default)
+#   redis  - ExternalCache on CACHE_REDIS_URL (needs the redis package)
+#   local  - ExternalCache on a LocalKVStore
+# The local stand-in is bounded by CACHE_MAX_ENTRIES like the
+# memory backend.
+def make_backend(config, logger=None):
+    name = config.get('CACHE_BACKEND', 'memory')
+    max_entries = config.get('CACHE_MAX_ENTRIES', 1024)
+    if name == 'redis':
+        try:
+            import redis
+            return ExternalCache(redis.Redis.from_url(config['CACHE_REDIS_URL']))
+        except ImportError:
+            (logger or logging.getLogger(__name__)).warning(
+                'CACHE_BACKEND=redis but the redis package is not installed (pip install -r requirements.txt); '
+                'using the per-process local stand-in instead, so workers will not share the cache')
+            return ExternalCache(LocalKVStore(max_entries))
+    if name == 'local':
+        return ExternalCache(LocalKVStore(max_entries))
+    return LRUCache(max_entries)
@@ -0,0 +1,114 @@
+#------------------------------------------------------------
+# ETag / conditional GET support for read routes.
+#
+#   @recipes.route('/recipes', methods=['GET'])
+#   @conditional('recipes', 'users')
+#   def get_recipes(): ...
+#
+# The ETag is built from the endpoint, its arguments and the
+# version counters of the tables the route reads (the
+# tableVersions table, bumped by the write routes through
+# bump_versions() once their transaction has committed).
+# Looking the counters up is a single primary-key query, so when
+# the client sends a matching If-None-Match we answer 304 without
+# running the real query or serializing anything.
+#
+# Routes that answer from a per-process in-memory index also name
+# it, e.g. @conditional('recipes', indexes=(similar_recipes,)):
+# the index is brought up to date first and its generation (see
+# backend/utils/generation.py) goes into the ETag, since each
+# worker's copy can differ from the others and from the database.
+#
+# The ETag is also left in g.etag for the view. @cache.cached puts
+# it in its key, so a cached body is only ever served under the
+# table versions that were current when it was built, even when
+# another worker made the write and this worker's cache never
+# heard about it.
+#------------------------------------------------------------
+import functools
+import hashlib
+
+from flask import request, make_response, current_app, g
+
+from backend.db_connection import db
+
+
+def table_versions(tables):
+    placeholders = ', '.join(['%s'] * len(tables))
+    cursor = db.get_db().cursor()
+    cursor.execute(f'''
+        SELECT tableName, version
+        FROM tableVersions
+        WHERE tableName IN ({placeholders});
+    ''', list(tables))
+    versions = {row['tableName']: row['version'] for row in cursor.fetchall()}
+    return [versions.get(table, 0) for table in tables]
+
+
+def make_etag(tables, indexes=()):
+    view_args = sorted((request.view_args or {}).items())
+    query_args = sorted(request.args.items(multi=True))
+    versions = table_versions(tables)
+    generations = []
+    for index in indexes:
+        index.ensure_built(db.get_db().cursor())
+        generations.append(str(index.generation))
+    raw = f'{request.endpoint}|{view_args}|{query_args}|{list(zip(tables, versions))}|{generations}'
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+#------------------------------------------------------------
+# Bumps the version counters of `tables` after a write on conn has
+# been committed. Call it right after the commit with every table
+# the transaction changed, including the ones ON DELETE CASCADE
+# reached.
+#
+# All tables go in one statement that is committed straight away,
+# so the counter rows are locked for an instant rather than for
+# the whole write transaction, always in primary key order (no
+# deadlocks), and a bulk write bumps once rather than per row.
+# Bumping after the commit means a reader that sees the new
+# version also sees the new rows; in between, new rows can only go
+# out under the old version, which costs a refetch, never a stale
+# 304.
+def bump_versions(conn, *tables):
+    tables = sorted(set(tables))
+    placeholders = ', '.join(['%s'] * len(tables))
+    try:
+        conn.cursor().execute(f'''
+            UPDATE tableVersions
+            SET version = version + 1
+            WHERE tableName IN ({placeholders});
+        ''', tables)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        current_app.logger.error(f'Could not bump table versions {tables}: {e}')
+
+
+def conditional(*tables, indexes=()):
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET':
+                return view(*args, **kwargs)
+
+            try:
+                etag = make_etag(tables, indexes)
+            except Exception as e:
+                # e.g. a database created before tableVersions existed
+                current_app.logger.warning(f'ETag probe failed for {request.endpoint}: {e}')
+                return view(*args, **kwargs)
+
+            g.etag = etag
+            if request.if_none_match.contains(etag):
+                response = make_response('', 304)
+                response.set_etag(etag)
+                return response
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                response.set_etag(etag)
+            return response
+        return wrapper
+    return decorator
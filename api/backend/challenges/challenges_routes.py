@@ -4,6 +4,8 @@ from flask import jsonify
 from flask import make_response
 from flask import current_app
 from backend.db_connection import db
+from backend.cache.conditional import conditional, bump_versions
+from backend.utils.pagination import BadCursor, wants_all, page_args, page_query, page_response
 
 
 
@@ -11,40 +13,69 @@ challenges_bp = Blueprint('challenges', __name__)
 
 #-----------------------------------------------
 # gets all challenge from the database
-# and returns them to the client
+# and returns them to the client.
+# Paged with ?limit=&next=, or ?all=true for the whole list.
+CHALLENGE_LIST_QUERY = "SELECT * FROM challenges"
+ALL_CHALLENGES_QUERY = "SELECT * FROM challenges ORDER BY createdAt DESC;"
 
 @challenges_bp.route('/all', methods=['GET'])
+@conditional('challenges')
 def get_all_challenges():
-    sql = "SELECT * FROM challenges ORDER BY createdAt DESC;"
     cursor = db.get_db().cursor()
-    cursor.execute(sql)
+    if wants_all():
+        cursor.execute(ALL_CHALLENGES_QUERY)
+        data = cursor.fetchall()
+        return make_response(jsonify(data), 200)
+
+    try:
+        limit, after = page_args()
+    except BadCursor as e:
+        return make_response({'error': str(e)}, 400)
+
+    cursor.execute(*page_query(CHALLENGE_LIST_QUERY, 'createdAt', 'challengeId', after, limit))
     data = cursor.fetchall()
-    return make_response(jsonify(data), 200)
+    return page_response(data, limit, 'createdAt', 'challengeId')
 
 #-----------------------------------------------
 # gets all challenge requests from the database
-# and returns them to the client
+# and returns them to the client, newest first.
+# Paged with ?limit=&next=, or ?all=true for the whole list.
+REQUEST_LIST_QUERY = "SELECT * FROM challengeRequests"
+ALL_REQUESTS_QUERY = ("SELECT * "
+                      "FROM challengeRequests;")
+
 @challenges_bp.route('/all-requests', methods=['GET'])
+@conditional('challengeRequests')
 def get_all_requests():
-    sql = ("SELECT * "
-           "FROM challengeRequests;")
     cursor = db.get_db().cursor()
-    cursor.execute(sql)
-    theData = cursor.fetchall()
+    if wants_all():
+        cursor.execute(ALL_REQUESTS_QUERY)
+        theData = cursor.fetchall()
 
-    response = make_response(jsonify(theData))
-    response.status_code = 200
-    return response
+        response = make_response(jsonify(theData))
+        response.status_code = 200
+        return response
+
+    try:
+        limit, after = page_args()
+    except BadCursor as e:
+        return make_response({'error': str(e)}, 400)
+
+    cursor.execute(*page_query(REQUEST_LIST_QUERY, 'dateSubmitted', 'requestID', after, limit))
+    theData = cursor.fetchall()
+    return page_response(theData, limit, 'dateSubmitted', 'requestID')
 #-----------------------------------------------
 
 # ----- Challenge Requests -----
+NOT_REVIEWED_QUERY = ("SELECT * "
+                      "FROM challengeRequests "
+                      "WHERE status = 'NOT REVIEWED';")
+
 @challenges_bp.route('/requests/not-reviewed', methods=['GET'])
+@conditional('challengeRequests')
 def not_reviewed():
-    sql = ("SELECT * "
-           "FROM challengeRequests "
-           "WHERE status = 'NOT REVIEWED';")
     cursor = db.get_db().cursor()
-    cursor.execute(sql)
+    cursor.execute(NOT_REVIEWED_QUERY)
     theData = cursor.fetchall()
 
 
@@ -53,16 +84,18 @@ def not_reviewed():
     response.status_code = 200
     return response
 
-@challenges_bp.route('/requests/denied', methods=['GET'])
-def denied_requests():
-    sql = """
+DENIED_QUERY = """
         SELECT u.username, cr.requestID, cr.dateSubmitted
         FROM challengeRequests cr
         JOIN users u ON cr.requestedById = u.userId
         WHERE cr.status = 'denied';
     """
+
+@challenges_bp.route('/requests/denied', methods=['GET'])
+@conditional('challengeRequests', 'users')
+def denied_requests():
     cursor = db.get_db().cursor()
-    cursor.execute(sql)
+    cursor.execute(DENIED_QUERY)
     theData = cursor.fetchall()
 
 
@@ -71,108 +104,189 @@ def denied_requests():
     response.status_code = 200
     return response
 
-@challenges_bp.route('/requests/<int:request_id>/approve', methods=['PUT'])
-def approve_request(request_id):
-    try:
-        reviewer_id = 2
-        cursor = db.get_db().cursor()
-
-        cursor.execute("""
-            UPDATE challengeRequests
-            SET status = 'APPROVED', reviewedBy = %s
-            WHERE requestID = %s;
-        """, (reviewer_id, request_id))
+# reviewer recorded by the approve / decline routes
+APPROVER_ID = 2
+DECLINER_ID = 1
+MAX_REVIEW_BATCH = 1000
 
-        cursor.execute("""
-            SELECT description, requestedById
+LOCK_PENDING_QUERY = """
+            SELECT requestID, status
             FROM challengeRequests
-            WHERE requestID = %s;
-        """, (request_id,))
-        req = cursor.fetchone()
-
-        if req is None:
-            db.get_db().rollback()
-            return make_response({'error': 'Request not found'}, 404)
-
-        # Ensure the correct unpacking of the fetched row
-        description, requested_by_id = req if isinstance(req, tuple) else (req['description'], req['requestedById'])
-        if description is None: description = "No description provided"
-        current_app.logger.info(f"Approving request {request_id} with description: {description}")
-
-        cursor.execute("""
-            INSERT INTO challenges (description, approvedById, difficulty, status)
-            VALUES (%s, %s, %s, 'UNCLAIMED');
-        """, (description, reviewer_id, None))
-        challenge_id = cursor.lastrowid
-
-        cursor.execute("""
-            SELECT ingredientId
-            FROM requestIngredients
-            WHERE requestId = %s;
-        """, (request_id,))
-        ingredients = cursor.fetchall()
-
-        for row in ingredients:
-            if isinstance(row, dict):
-                ingredient_id = row["ingredientId"]
-            else:
-                ingredient_id = row[0]
-
-            cursor.execute("""
+            WHERE requestID IN ({placeholders})
+            FOR UPDATE;
+        """
+NEW_CHALLENGES_QUERY = """
+                SELECT challengeId, requestId
+                FROM challenges
+                WHERE requestId IN ({placeholders});
+            """
+
+#-----------------------------------------------
+# Approves and declines many challenge requests in one transaction.
+# Only requests that are still 'NOT REVIEWED' are touched; they are
+# locked first so two admins clearing the queue can't both act on
+# the same one. Approved requests become challenges with one
+# INSERT ... SELECT, and all their ingredients are copied with one
+# more, matched on challenges.requestId. Returns one outcome per id:
+#   {id: {"status": "approved", "challengeId": ...}}, or "declined",
+#   "not_found", "already_reviewed", "conflict" (in both lists)
+def review_requests(conn, approve_ids, decline_ids, approver_id=APPROVER_ID, decliner_id=DECLINER_ID):
+    approve_ids, decline_ids = set(approve_ids), set(decline_ids)
+    outcomes = {i: {'status': 'conflict'} for i in approve_ids & decline_ids}
+    approve_ids -= set(outcomes)
+    decline_ids -= set(outcomes)
+    ids = sorted(approve_ids | decline_ids)
+    if not ids:
+        return outcomes
+
+    cursor = conn.cursor()
+    try:
+        cursor.execute(LOCK_PENDING_QUERY.format(placeholders=', '.join(['%s'] * len(ids))), ids)
+        status = {row['requestID']: row['status'] for row in cursor.fetchall()}
+        for request_id in ids:
+            if request_id not in status:
+                outcomes[request_id] = {'status': 'not_found'}
+            elif status[request_id] != 'NOT REVIEWED':
+                outcomes[request_id] = {'status': 'already_reviewed'}
+        approve = [i for i in sorted(approve_ids) if i not in outcomes]
+        decline = [i for i in sorted(decline_ids) if i not in outcomes]
+
+        if decline:
+            cursor.execute(f"""
+                UPDATE challengeRequests
+                SET status = 'DENIED', reviewedBy = %s
+                WHERE requestID IN ({', '.join(['%s'] * len(decline))});
+            """, [decliner_id] + decline)
+            for request_id in decline:
+                outcomes[request_id] = {'status': 'declined'}
+
+        if approve:
+            placeholders = ', '.join(['%s'] * len(approve))
+            cursor.execute(f"""
+                UPDATE challengeRequests
+                SET status = 'APPROVED', reviewedBy = %s
+                WHERE requestID IN ({placeholders});
+            """, [approver_id] + approve)
+            cursor.execute(f"""
+                INSERT INTO challenges (description, approvedById, difficulty, status, requestId)
+                SELECT COALESCE(description, 'No description provided'), %s, NULL, 'UNCLAIMED', requestID
+                FROM challengeRequests
+                WHERE requestID IN ({placeholders});
+            """, [approver_id] + approve)
+            cursor.execute(f"""
                 INSERT INTO challengeIngredients (challengeId, ingredientId)
-                VALUES (%s, %s);
-            """, (challenge_id, ingredient_id))
+                SELECT c.challengeId, ri.ingredientId
+                FROM challenges c
+                JOIN requestIngredients ri ON ri.requestId = c.requestId
+                WHERE c.requestId IN ({placeholders});
+            """, approve)
+            cursor.execute(NEW_CHALLENGES_QUERY.format(placeholders=placeholders), approve)
+            for row in cursor.fetchall():
+                outcomes[row['requestId']] = {'status': 'approved', 'challengeId': row['challengeId']}
+
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    bump_versions(conn, 'challengeRequests', 'challenges', 'challengeIngredients')
+    return outcomes
+
+def _id_list(data, key):
+    ids = data.get(key) or []
+    if not isinstance(ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+        raise ValueError(f'{key} must be a list of request ids')
+    return ids
 
-        db.get_db().commit()
-        return make_response({'message': f'Request {request_id} approved and challenge {challenge_id} created'}, 200)
+#-----------------------------------------------
+# Batch review of the request queue, e.g.
+#   PUT /c/requests/review  {"approve": [4, 9, 12], "decline": [5]}
+# Everything happens in one transaction; the response has an
+# outcome per request id (see review_requests).
+@challenges_bp.route('/requests/review', methods=['PUT'])
+def review_requests_batch():
+    data = request.get_json() or {}
+    try:
+        approve_ids = _id_list(data, 'approve')
+        decline_ids = _id_list(data, 'decline')
+    except ValueError as e:
+        return make_response({'error': str(e)}, 400)
+    if len(approve_ids) + len(decline_ids) > MAX_REVIEW_BATCH:
+        return make_response({'error': f'at most {MAX_REVIEW_BATCH} requests per batch'}, 400)
 
+    try:
+        outcomes = review_requests(db.get_db(), approve_ids, decline_ids)
+    except Exception as e:
+        current_app.logger.error(f"Error during batch review: {str(e)}")
+        return make_response({'error': str(e)}, 500)
+
+    summary = {}
+    for outcome in outcomes.values():
+        summary[outcome['status']] = summary.get(outcome['status'], 0) + 1
+    response = make_response(jsonify({
+        'results': {str(k): v for k, v in sorted(outcomes.items())},
+        'summary': summary,
+    }))
+    response.status_code = 200
+    return response
+
+# single-request outcomes that aren't a success map to these codes
+_REVIEW_ERRORS = {
+    'not_found': (404, 'Request not found'),
+    'already_reviewed': (409, 'Request was already reviewed'),
+}
+
+@challenges_bp.route('/requests/<int:request_id>/approve', methods=['PUT'])
+def approve_request(request_id):
+    try:
+        outcome = review_requests(db.get_db(), [request_id], [])[request_id]
     except Exception as e:
-        db.get_db().rollback()
         current_app.logger.error(f"Error during approval: {str(e)}")
         return make_response({'error': str(e)}, 500)
 
+    if outcome['status'] in _REVIEW_ERRORS:
+        code, message = _REVIEW_ERRORS[outcome['status']]
+        return make_response({'error': message}, code)
+    return make_response({'message': f"Request {request_id} approved and challenge {outcome['challengeId']} created"}, 200)
+
 
 @challenges_bp.route('/requests/<int:request_id>/decline', methods=['PUT'])
 def decline_request(request_id):
     try:
-        reviewer_id = 1
-        sql = """
-            UPDATE challengeRequests
-            SET status = 'DENIED', reviewedBy = %s
-            WHERE requestID = %s;
-        """
-        cursor = db.get_db().cursor()
-        cursor.execute(sql, (reviewer_id, request_id))
-        db.get_db().commit()
-
-        response = make_response({'message': f'Request {request_id} declined'})
-        response.status_code = 200
-        return response
-
+        outcome = review_requests(db.get_db(), [], [request_id])[request_id]
     except Exception as e:
-        db.get_db().rollback()
         return make_response({'error': str(e)}, 500)
 
+    if outcome['status'] in _REVIEW_ERRORS:
+        code, message = _REVIEW_ERRORS[outcome['status']]
+        return make_response({'error': message}, code)
+    response = make_response({'message': f'Request {request_id} declined'})
+    response.status_code = 200
+    return response
+
+USER_REQUESTS_QUERY = ("SELECT * "
+                       "FROM challengeRequests "
+                       "WHERE requestedById = %s;")
+
 @challenges_bp.route('/requests/user/<int:user_id>', methods=['GET'])
+@conditional('challengeRequests')
 def user_requests(user_id):
-    sql = (f"SELECT * "
-           f"FROM challengeRequests "
-           f"WHERE requestedById = {user_id};")
     cursor = db.get_db().cursor()
-    cursor.execute(sql)
+    cursor.execute(USER_REQUESTS_QUERY, (user_id,))
     theData = cursor.fetchall()
 
     response = make_response(jsonify(theData))
     response.status_code = 200
     return response
 
+ACTIVE_REQUESTS_QUERY = ("SELECT * "
+                         "FROM challengeRequests "
+                         "WHERE status = 'approved';")
+
 @challenges_bp.route('/requests/active', methods=['GET'])
+@conditional('challengeRequests')
 def active_requests():
-    sql = ("SELECT * "
-           "FROM challengeRequests "
-           "WHERE status = 'approved';")
     cursor = db.get_db().cursor()
-    cursor.execute(sql)
+    cursor.execute(ACTIVE_REQUESTS_QUERY)
     theData = cursor.fetchall()
 
     response = make_response(jsonify(theData))
@@ -180,13 +294,15 @@ def active_requests():
     return response
 
 # ----- Challenges Management -----
+AVAILABLE_QUERY = ("SELECT * "
+                   "FROM challenges "
+                   "WHERE status = 'UNCLAIMED';") # never null...
+
 @challenges_bp.route('/available', methods=['GET'])
+@conditional('challenges')
 def available_challenges():
-    sql = ("SELECT * "
-           "FROM challenges "
-           "WHERE status = 'UNCLAIMED';") # never null...
     cursor = db.get_db().cursor()
-    cursor.execute(sql)
+    cursor.execute(AVAILABLE_QUERY)
     theData = cursor.fetchall()
 
     response = make_response(jsonify(theData))
@@ -202,6 +318,7 @@ def claim_challenge(challenge_id):
     cursor = db.get_db().cursor()
     cursor.execute(sql)
     db.get_db().commit()
+    bump_versions(db.get_db(), 'challenges')
 
     response = make_response({'message': f'Challenge {challenge_id} claimed by user {user_id}'})
     response.status_code = 200
@@ -216,6 +333,7 @@ def update_challenge_status(challenge_id):
     cursor = db.get_db().cursor()
     cursor.execute(sql)
     db.get_db().commit()
+    bump_versions(db.get_db(), 'challenges')
 
     response = make_response({'message': f'Challenge {challenge_id} updated to {status}'})
     response.status_code = 200
@@ -236,40 +354,47 @@ def post_challenge():
     cursor = db.get_db().cursor()
     cursor.execute(sql, (description, difficulty, approved_by))
     db.get_db().commit()
+    bump_versions(db.get_db(), 'challenges')
 
     return make_response({'message': 'Challenge created'}, 201)
 
+CHALLENGE_QUERY = "SELECT * FROM challenges WHERE challengeId = %s;"
+
 @challenges_bp.route('/<int:challenge_id>', methods=['GET'])
+@conditional('challenges')
 def get_challenge(challenge_id):
-    sql = f"SELECT * FROM challenges WHERE challengeId = {challenge_id};"
     cursor = db.get_db().cursor()
-    cursor.execute(sql)
+    cursor.execute(CHALLENGE_QUERY, (challenge_id,))
     theData = cursor.fetchall()
 
     response = make_response(jsonify(theData))
     response.status_code = 200
     return response
 
+CHALLENGE_INGREDIENTS_QUERY = ("SELECT i.name "
+                               "FROM challengeIngredients ci JOIN ingredients i ON ci.ingredientId = i.ingredientId "
+                               "WHERE challengeId = %s;")
+
 @challenges_bp.route('/<int:challenge_id>/ingredients', methods=['GET'])
+@conditional('challengeIngredients', 'ingredients')
 def get_challenge_ingredients(challenge_id):
-    sql = (f"SELECT i.name "
-           f"FROM challengeIngredients ci JOIN ingredients i ON ci.ingredientId = i.ingredientId "
-           f"WHERE challengeId = {challenge_id};")
     cursor = db.get_db().cursor()
-    cursor.execute(sql)
+    cursor.execute(CHALLENGE_INGREDIENTS_QUERY, (challenge_id,))
     theData = cursor.fetchall()
 
     response = make_response(jsonify(theData))
     response.status_code = 200
     return response
 
+DIFFICULTY_QUERY = ("SELECT * "
+                    "FROM challenges "
+                    "WHERE difficulty = %s AND status is NULL;")
+
 @challenges_bp.route('/difficulty/<string:level>', methods=['GET'])
+@conditional('challenges')
 def challenges_by_difficulty(level):
-    sql = (f"SELECT * "
-           f"FROM challenges "
-           f"WHERE difficulty = '{level}' AND status is NULL;")
     cursor = db.get_db().cursor()
-    cursor.execute(sql)
+    cursor.execute(DIFFICULTY_QUERY, (level,))
     theData = cursor.fetchall()
 
     response = make_response(jsonify(theData))
@@ -304,6 +429,7 @@ def submit_challenge_request():
             cursor.execute(req_ing_query, (req_id, ing))
 
         db.get_db().commit()
+        bump_versions(db.get_db(), 'challengeRequests', 'requestIngredients')
 
         response = make_response({'message': 'Challenge request submitted'})
         response.status_code = 200
@@ -315,16 +441,18 @@ def submit_challenge_request():
     return response
 
 # gets all ingredients for a challenge request
+REQUEST_INGREDIENTS_QUERY = (
+    "SELECT i.name "
+    "FROM requestIngredients ri "
+    "JOIN ingredients i ON ri.ingredientId = i.ingredientId "
+    "WHERE ri.requestId = %s;"
+)
+
 @challenges_bp.route('/<int:request_id>/req-ingredients', methods=['GET'])
+@conditional('requestIngredients', 'ingredients')
 def get_request_ingredients(request_id):
-    sql = (
-        "SELECT i.name "
-        "FROM requestIngredients ri "
-        "JOIN ingredients i ON ri.ingredientId = i.ingredientId "
-        "WHERE ri.requestId = %s;"
-    )
     cursor = db.get_db().cursor()
-    cursor.execute(sql, (request_id,))
+    cursor.execute(REQUEST_INGREDIENTS_QUERY, (request_id,))
     theData = cursor.fetchall()
 
     response = make_response(jsonify(theData))
@@ -332,15 +460,17 @@ def get_request_ingredients(request_id):
     return response
 
 # gets a specific users challenges
-@challenges_bp.route('/user/<int:user_id>/challenges', methods=['GET'])
-def get_user_challenges(user_id):
-    sql = """
+USER_CHALLENGES_QUERY = """
         SELECT * 
         FROM challenges 
         WHERE studentId = %s;
     """
+
+@challenges_bp.route('/user/<int:user_id>/challenges', methods=['GET'])
+@conditional('challenges')
+def get_user_challenges(user_id):
     cursor = db.get_db().cursor()
-    cursor.execute(sql, (user_id,))
+    cursor.execute(USER_CHALLENGES_QUERY, (user_id,))
     theData = cursor.fetchall()
 
     response = make_response(jsonify(theData))
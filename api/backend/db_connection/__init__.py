@@ -1,10 +1,12 @@
 #------------------------------------------------------------
 # This file creates a shared DB connection resource
 #------------------------------------------------------------
-from flaskext.mysql import MySQL
-from pymysql import cursors
+from backend.db_connection.pool import PooledMySQL, PoolTimeoutError
+from backend.db_connection.timing import TimedDictCursor, TimedSSDictCursor
 
 
 # the parameter instructs the connection to return data 
-# as a dictionary object. 
-db = MySQL(cursorclass=cursors.DictCursor)
\ No newline at end of file
+# as a dictionary object. Connections are borrowed from a
+# pool (see pool.py) instead of being opened per request. The
+# cursor also counts statements for the request metrics (timing.py).
+db = PooledMySQL(cursorclass=TimedDictCursor)
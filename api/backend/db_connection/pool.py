@@ -0,0 +1,319 @@
+#------------------------------------------------------------
+# A small thread-safe connection pool for pymysql plus a
+# drop-in replacement for flaskext.mysql.MySQL that checks
+# connections out of the pool instead of opening a new one
+# for every request.
+#------------------------------------------------------------
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import g
+from flaskext.mysql import MySQL
+
+
+class PoolTimeoutError(Exception):
+    pass
+
+
+class _PooledConnection(object):
+    # wraps a raw connection with the bookkeeping the pool needs
+    def __init__(self, conn):
+        self.conn = conn
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+
+class ConnectionPool(object):
+    def __init__(self, factory, min_size=1, max_size=10, pre_ping=True,
+                 max_lifetime=3600, timeout=10):
+        self.factory = factory
+        self.min_size = min_size
+        self.max_size = max(max_size, 1)
+        self.pre_ping = pre_ping
+        self.max_lifetime = max_lifetime
+        self.timeout = timeout
+
+        self._idle = deque()
+        self._in_use = {}
+        self._size = 0
+        self._warmed = False
+        self._cond = threading.Condition()
+
+        self._checkouts = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._created = 0
+        self._discarded = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+
+    #------------------------------------------------------------
+    # Open connections until min_size is reached. Called lazily on
+    # the first checkout so the API can start before MySQL is up.
+    def warm(self):
+        with self._cond:
+            self._warmed = True
+            missing = self.min_size - self._size
+            self._size += max(missing, 0)
+        for _ in range(max(missing, 0)):
+            try:
+                pooled = _PooledConnection(self.factory())
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                continue
+            with self._cond:
+                self._created += 1
+                self._idle.append(pooled)
+                self._cond.notify()
+
+    def _expired(self, pooled):
+        return self.max_lifetime and time.monotonic() - pooled.created_at > self.max_lifetime
+
+    def _is_alive(self, pooled):
+        if not self.pre_ping:
+            return True
+        try:
+            pooled.conn.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    def _close(self, pooled):
+        try:
+            pooled.conn.close()
+        except Exception:
+            pass
+
+    #------------------------------------------------------------
+    # Hand out an idle connection, open a new one if the pool has
+    # room, or wait up to `timeout` seconds for one to be returned
+    # (the pool's own timeout by default, 0 means don't wait).
+    def checkout(self, timeout=None):
+        if not self._warmed:
+            self.warm()
+
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+        waited = False
+        while True:
+            pooled = None
+            create = False
+            with self._cond:
+                while not self._idle and self._size >= self.max_size:
+                    remaining = timeout - (time.monotonic() - start)
+                    if remaining <= 0:
+                        if timeout:
+                            self._timeouts += 1
+                        raise PoolTimeoutError(
+                            f'no database connection available after {timeout}s '
+                            f'(max_size={self.max_size})')
+                    waited = True
+                    self._cond.wait(remaining)
+                if self._idle:
+                    pooled = self._idle.pop()
+                else:
+                    self._size += 1
+                    create = True
+
+            if create:
+                try:
+                    pooled = _PooledConnection(self.factory())
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._created += 1
+            elif self._expired(pooled) or not self._is_alive(pooled):
+                self._discard(pooled)
+                continue
+
+            elapsed = time.monotonic() - start
+            with self._cond:
+                pooled.last_used = time.monotonic()
+                self._in_use[id(pooled.conn)] = pooled
+                self._checkouts += 1
+                if waited:
+                    self._waits += 1
+                self._wait_time_total += elapsed
+                self._wait_time_max = max(self._wait_time_max, elapsed)
+            return pooled.conn
+
+    #------------------------------------------------------------
+    # Return a connection to the pool. Any open transaction is rolled
+    # back so the next borrower starts from a clean snapshot.
+    def checkin(self, conn):
+        with self._cond:
+            pooled = self._in_use.pop(id(conn), None)
+        if pooled is None:
+            return
+
+        healthy = conn.open
+        if healthy:
+            try:
+                conn.rollback()
+            except Exception:
+                healthy = False
+
+        if not healthy or self._expired(pooled):
+            self._discard(pooled)
+            return
+
+        with self._cond:
+            pooled.last_used = time.monotonic()
+            self._idle.append(pooled)
+            self._cond.notify()
+
+    def _discard(self, pooled):
+        self._close(pooled)
+        with self._cond:
+            self._size -= 1
+            self._discarded += 1
+            self._cond.notify()
+
+    #------------------------------------------------------------
+    # Close every idle connection. Connections that are checked out
+    # are closed when they come back.
+    def close_idle(self):
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+        for pooled in idle:
+            self._discard(pooled)
+
+    #------------------------------------------------------------
+    # Forget every connection without touching the sockets. Used in
+    # a freshly forked worker so it never shares its parent's sockets.
+    def reset(self):
+        with self._cond:
+            self._idle.clear()
+            self._in_use.clear()
+            self._size = 0
+            self._warmed = False
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            checkouts = self._checkouts
+            return {
+                'size': self._size,
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'in_use': len(self._in_use),
+                'idle': len(self._idle),
+                'checkouts': checkouts,
+                'waits': self._waits,
+                'timeouts': self._timeouts,
+                'created': self._created,
+                'discarded': self._discarded,
+                'checkout_latency_avg_ms': (self._wait_time_total / checkouts * 1000) if checkouts else 0.0,
+                'checkout_latency_max_ms': self._wait_time_max * 1000,
+            }
+
+
+#------------------------------------------------------------
+# Same interface as flaskext.mysql.MySQL (db.get_db() still hands
+# back a pymysql connection), but the connection is borrowed from
+# a ConnectionPool for the length of the app context.
+class PooledMySQL(MySQL):
+    def __init__(self, app=None, prefix="mysql", **connect_args):
+        self.pool = None
+        self._workers = None
+        super().__init__(app, prefix, **connect_args)
+
+    def init_app(self, app):
+        super().init_app(app)
+        app.config.setdefault('MYSQL_POOL_MIN_SIZE', 1)
+        app.config.setdefault('MYSQL_POOL_MAX_SIZE', 10)
+        app.config.setdefault('MYSQL_POOL_PRE_PING', True)
+        app.config.setdefault('MYSQL_POOL_MAX_LIFETIME', 3600)
+        app.config.setdefault('MYSQL_POOL_TIMEOUT', 10)
+
+        self.pool = ConnectionPool(
+            self.connect,
+            min_size=app.config['MYSQL_POOL_MIN_SIZE'],
+            max_size=app.config['MYSQL_POOL_MAX_SIZE'],
+            pre_ping=app.config['MYSQL_POOL_PRE_PING'],
+            max_lifetime=app.config['MYSQL_POOL_MAX_LIFETIME'],
+            timeout=app.config['MYSQL_POOL_TIMEOUT'],
+        )
+
+        # requests release through teardown_request (registered by
+        # the parent class); this covers CLI commands and other app
+        # contexts that never see a request.
+        app.teardown_appcontext(self.teardown_request)
+
+    def get_db(self):
+        if 'mysql_dbs' not in g:
+            g.mysql_dbs = {}
+        if self.prefix not in g.mysql_dbs:
+            g.mysql_dbs[self.prefix] = self.pool.checkout()
+        return g.mysql_dbs[self.prefix]
+
+    def teardown_request(self, exception):
+        dbs = g.get('mysql_dbs')
+        if dbs and self.prefix in dbs:
+            self.pool.checkin(dbs.pop(self.prefix))
+
+    #------------------------------------------------------------
+    # Runs independent queries at the same time. Each function gets
+    # a cursor of its own: the first one runs here on the request's
+    # connection, the others on extra connections borrowed from the
+    # pool in worker threads. When the pool has no spare connection
+    # the remaining functions run here one after another instead,
+    # so a busy pool never deadlocks. Returns the results in order.
+    def run_parallel(self, *fns):
+        extra = []
+        for _ in fns[1:]:
+            try:
+                extra.append(self.pool.checkout(timeout=0))
+            except PoolTimeoutError:
+                break
+
+        def run_on(conn, fn):
+            try:
+                return fn(conn.cursor())
+            finally:
+                self.pool.checkin(conn)
+
+        try:
+            executor = self._executor()
+            # each function runs in a copy of this context, so the
+            # request's SQL timer (timing.py) sees its queries too
+            futures = [executor.submit(contextvars.copy_context().run, run_on, conn, fn)
+                       for conn, fn in zip(extra, fns[1:])]
+            extra = []
+        finally:
+            for conn in extra:
+                self.pool.checkin(conn)
+
+        cursor = self.get_db().cursor()
+        results = [fns[0](cursor)]
+        for fn in fns[1 + len(futures):]:
+            results.append(fn(cursor))
+        results[1:1] = [future.result() for future in futures]
+        return results
+
+    #------------------------------------------------------------
+    # Call in a process forked from one that already used the pool
+    # (a gunicorn worker with preload_app): the inherited
+    # connections and worker threads belong to the parent.
+    def after_fork(self):
+        if self.pool is not None:
+            self.pool.reset()
+        self._workers = None
+
+    def _executor(self):
+        if self._workers is None:
+            self._workers = ThreadPoolExecutor(max_workers=self.pool.max_size,
+                                               thread_name_prefix='db-parallel')
+        return self._workers
+
+    def stats(self):
+        return self.pool.stats() if self.pool is not None else {}
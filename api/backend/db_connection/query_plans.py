@@ -0,0 +1,214 @@
+#------------------------------------------------------------
+# Query-plan regression check.
+#
+# QUERIES lists the SQL each route runs (with sample arguments).
+# check_plans() EXPLAINs every one against the connected database
+# and reports a failure whenever a table with at least
+# `threshold` rows is read with a full table scan (type ALL) or
+# needs a filesort. Run it against a seeded database with
+#
+#   flask --app backend_app check-plans [--threshold 1000]
+#
+# which exits with status 1 when any query regresses. Queries
+# that read a whole table on purpose (e.g. the unpaged lists)
+# name that table in `allow`.
+#
+# The entries are built from the route modules' own query
+# constants and builders, so a changed query is checked as it is;
+# a new query only needs its entry added here.
+#------------------------------------------------------------
+from datetime import datetime
+
+import click
+from flask.cli import with_appcontext
+
+from backend.db_connection import db
+from backend.utils.pagination import page_query
+import backend.recipes.recipes_routes as recipes_routes
+import backend.recipes.ratings as ratings
+import backend.recipes.rollups as rollups
+import backend.recipes.similar as similar
+import backend.users.users_routes as users_routes
+import backend.ingredients.ingredient_route as ingredient_route
+import backend.ingredients.substitutions as substitutions
+import backend.challenges.challenges_routes as challenges_routes
+import backend.pantry.pantry_routes as pantry_routes
+import backend.pantry.matcher as matcher
+import backend.pantry.shopping as shopping
+
+_CURSOR = (datetime(2025, 1, 1), 100)
+_PAGE = 50
+_RANGE = ('2020-01-01', '2030-12-31')
+
+
+# an entry for a query with an IN ({placeholders}) list
+def _in(route, query, args, **extra):
+    sql = query.format(placeholders=', '.join(['%s'] * len(args)))
+    return dict(extra, route=route, sql=sql, args=list(args))
+
+
+# the first and the next page of a keyset-paged list
+def _pages(route, query, date_col, id_col):
+    entries = []
+    for label, cursor in (('first page', None), ('next page', _CURSOR)):
+        sql, args = page_query(query, date_col, id_col, cursor, _PAGE)
+        entries.append({'route': f'{route} ({label})', 'sql': sql, 'args': args})
+    return entries
+
+
+# the day / week / month buckets of a rollup series; week and month
+# group on an expression, which sorts the range's rollup rows (one
+# per day), never the recipes or reviews
+def _series(route, builder, table):
+    entries = []
+    for bucket in rollups.BUCKETS:
+        sql, args = builder(bucket, *_RANGE)
+        entry = {'route': f'{route}?bucket={bucket}', 'sql': sql, 'args': args}
+        if bucket != 'day':
+            entry['allow'] = {table}
+        entries.append(entry)
+    return entries
+
+
+_search_sql, _search_args = recipes_routes.search_query('', 'EASY', {'garlic', 'onion'})
+
+QUERIES = [
+    # ---- recipes_routes.py ----
+    *_pages('GET /recipes', recipes_routes.RECIPE_LIST_QUERY, 'r.datePosted', 'r.recipeId'),
+    {'route': 'GET /recipes?all=true', 'allow': {'recipes', 'r'}, 'sql': recipes_routes.ALL_RECIPES_QUERY},
+    {'route': 'GET /recipes/search (required ingredients)', 'sql': _search_sql, 'args': _search_args},
+    _in('GET /recipes (ingredients)', recipes_routes.RECIPE_INGREDIENTS_QUERY, [1, 2, 3]),
+    {'route': 'GET /recipe/<id>', 'sql': recipes_routes.RECIPE_QUERY, 'args': [1]},
+    {'route': 'GET /recipe/<id>/ingredients', 'sql': recipes_routes.SINGLE_RECIPE_INGREDIENTS_QUERY, 'args': [1]},
+    _in('GET /recipe/<id>/ingredients?substitutes=true', recipes_routes.SUBSTITUTE_NAMES_QUERY, [1, 2]),
+    {'route': 'GET /recipe/<id>/full (recipe)', 'sql': recipes_routes.FULL_RECIPE_QUERY, 'args': [1]},
+    {'route': 'GET /recipe/<id>/full (reviews)', 'sql': recipes_routes.NEWEST_REVIEWS_QUERY,
+     'args': [1, recipes_routes.FULL_RECIPE_REVIEW_LIMIT]},
+    {'route': 'GET /recipes/<categoryName>', 'sql': recipes_routes.CATEGORY_RECIPES_QUERY, 'args': ['DINNER']},
+    {'route': 'GET /user/<user_id>/recipes', 'sql': recipes_routes.USER_RECIPES_QUERY, 'args': [1]},
+    {'route': 'GET /recipe/<id>/user', 'sql': recipes_routes.RECIPE_CHEF_QUERY, 'args': [1]},
+    {'route': 'GET /recipe/<id>/reviews', 'sql': recipes_routes.RECIPE_REVIEWS_QUERY, 'args': [1]},
+    _in('GET /recipe/<id>/avg-rating', ratings.RATINGS_QUERY, [1]),
+    {'route': 'GET /recipe/<id>/similar (matrix build)', 'allow': {'recipeIngredients'}, 'sql': similar.PAIRS_QUERY},
+    _in('GET /recipe/<id>/similar (recipes)', recipes_routes.RECIPE_CARDS_QUERY, [1, 2, 3]),
+    {'route': 'GET /recipebycategory', 'sql': recipes_routes.CATEGORY_COUNTS_QUERY},
+    *_series('GET /recipes/posted-over-time', rollups.recipe_series_query, 'recipeDailyRollups'),
+    *_series('GET /reviews/over-time', rollups.review_series_query, 'reviewDailyRollups'),
+    *_pages('GET /reviews', recipes_routes.REVIEW_LIST_QUERY, 'r.datePosted', 'r.reviewId'),
+    {'route': 'GET /reviews?all=true', 'allow': {'reviews', 'r'}, 'sql': recipes_routes.ALL_REVIEWS_QUERY},
+
+    # ---- ingredient_route.py ----
+    {'route': 'GET /ingredients', 'allow': {'ingredients'}, 'sql': ingredient_route.ALL_INGREDIENTS_QUERY},
+    {'route': 'GET /ingredients/<name>', 'sql': ingredient_route.INGREDIENT_BY_NAME_QUERY, 'args': ['Garlic']},
+
+    # ---- users_routes.py ----
+    {'route': 'GET /users', 'allow': {'users'}, 'sql': users_routes.ALL_USERS_QUERY},
+    {'route': 'GET /users/<userId>', 'sql': users_routes.USER_QUERY, 'args': [1]},
+    {'route': 'GET /users/<userId>/profile (recipes)', 'sql': users_routes.PROFILE_RECIPES_QUERY, 'args': [1]},
+    {'route': 'GET /users/<userId>/profile (challenges)', 'sql': users_routes.PROFILE_CHALLENGES_QUERY, 'args': [1]},
+    {'route': 'DELETE /users/<userId> (reviewed recipes)', 'sql': users_routes.REVIEWED_RECIPES_QUERY, 'args': [1]},
+    {'route': 'DELETE /users/<userId> (own recipes)', 'sql': users_routes.OWN_RECIPES_QUERY, 'args': [1]},
+
+    # ---- challenges_routes.py ----
+    *_pages('GET /c/all', challenges_routes.CHALLENGE_LIST_QUERY, 'createdAt', 'challengeId'),
+    {'route': 'GET /c/all?all=true', 'allow': {'challenges'}, 'sql': challenges_routes.ALL_CHALLENGES_QUERY},
+    *_pages('GET /c/all-requests', challenges_routes.REQUEST_LIST_QUERY, 'dateSubmitted', 'requestID'),
+    {'route': 'GET /c/all-requests?all=true', 'allow': {'challengeRequests'},
+     'sql': challenges_routes.ALL_REQUESTS_QUERY},
+    {'route': 'GET /c/requests/not-reviewed', 'sql': challenges_routes.NOT_REVIEWED_QUERY},
+    {'route': 'GET /c/requests/denied', 'sql': challenges_routes.DENIED_QUERY},
+    {'route': 'GET /c/requests/user/<user_id>', 'sql': challenges_routes.USER_REQUESTS_QUERY, 'args': [1]},
+    {'route': 'GET /c/requests/active', 'sql': challenges_routes.ACTIVE_REQUESTS_QUERY},
+    {'route': 'GET /c/available', 'sql': challenges_routes.AVAILABLE_QUERY},
+    {'route': 'GET /c/<challenge_id>', 'sql': challenges_routes.CHALLENGE_QUERY, 'args': [1]},
+    {'route': 'GET /c/<challenge_id>/ingredients', 'sql': challenges_routes.CHALLENGE_INGREDIENTS_QUERY,
+     'args': [1]},
+    {'route': 'GET /c/difficulty/<level>', 'sql': challenges_routes.DIFFICULTY_QUERY, 'args': ['EASY']},
+    {'route': 'GET /c/<request_id>/req-ingredients', 'sql': challenges_routes.REQUEST_INGREDIENTS_QUERY,
+     'args': [1]},
+    {'route': 'GET /c/user/<user_id>/challenges', 'sql': challenges_routes.USER_CHALLENGES_QUERY, 'args': [1]},
+    _in('PUT /c/requests/review (lock pending)', challenges_routes.LOCK_PENDING_QUERY, [1, 2]),
+    _in('PUT /c/requests/review (new challenges)', challenges_routes.NEW_CHALLENGES_QUERY, [1, 2]),
+
+    # ---- pantry_routes.py ----
+    {'route': 'POST /pantry/match (matcher build)', 'allow': {'recipeIngredients'}, 'sql': matcher.PAIRS_QUERY},
+    {'route': 'POST /pantry/match (ingredient costs)', 'allow': {'ingredients'}, 'sql': matcher.COSTS_QUERY},
+    {'route': 'POST /pantry/match (substitution graph)', 'allow': {'substitutions'},
+     'sql': substitutions.EDGES_QUERY},
+    _in('POST /pantry/match (recipes)', pantry_routes.MATCHED_RECIPES_QUERY, [1, 2]),
+    _in('POST /pantry/match (missing ingredients)', pantry_routes.MISSING_INGREDIENTS_QUERY, [1, 2]),
+    _in('POST /shopping-list', shopping.ROWS_QUERY, [1, 2]),
+]
+
+def _table_sizes(cursor):
+    cursor.execute('''
+        SELECT TABLE_NAME AS name, TABLE_ROWS AS estimate
+        FROM information_schema.TABLES
+        WHERE TABLE_SCHEMA = DATABASE();
+    ''')
+    return {row['name']: row['estimate'] or 0 for row in cursor.fetchall()}
+
+
+def _row_count(cursor, table, sizes, cache):
+    # TABLE_ROWS is only an estimate (and may be stale), so count
+    # exactly once the estimate says the table could be big enough
+    if table not in cache:
+        if sizes.get(table, 0) * 2 < cache['__threshold__']:
+            cache[table] = sizes.get(table, 0)
+        else:
+            cursor.execute(f'SELECT COUNT(*) AS n FROM `{table}`;')
+            cache[table] = cursor.fetchone()['n']
+    return cache[table]
+
+
+#------------------------------------------------------------
+# EXPLAINs every query in QUERIES. Returns a list of
+# (route, problem) tuples; an empty list means every plan is fine.
+def check_plans(cursor, threshold=1000, queries=None):
+    sizes = _table_sizes(cursor)
+    counts = {'__threshold__': threshold}
+    problems = []
+
+    for entry in queries or QUERIES:
+        cursor.execute('EXPLAIN ' + entry['sql'], entry.get('args'))
+        allowed = entry.get('allow', set())
+        for step in cursor.fetchall():
+            alias = step.get('table') or ''
+            if alias.startswith('<'):
+                # derived tables and unions are checked through their parts
+                continue
+            if alias in allowed:
+                continue
+            real_table = alias if alias in sizes else _real_table(entry['sql'], alias)
+            if _row_count(cursor, real_table, sizes, counts) < threshold:
+                continue
+            extra = step.get('Extra') or ''
+            if step.get('type') == 'ALL':
+                problems.append((entry['route'], f'full table scan on {real_table} ({alias})'))
+            if 'Using filesort' in extra:
+                problems.append((entry['route'], f'filesort on {real_table} ({alias})'))
+    return problems
+
+
+def _real_table(sql, alias):
+    # maps an alias from the EXPLAIN output back to its table name
+    words = sql.replace('\n', ' ').replace(',', ' ').split()
+    for i, word in enumerate(words[:-1]):
+        following = words[i + 1]
+        if following == alias or (following.upper() == 'AS' and i + 2 < len(words) and words[i + 2] == alias):
+            return word
+    return alias
+
+
+@click.command('check-plans')
+@click.option('--threshold', default=1000, show_default=True,
+              help='Only flag tables with at least this many rows.')
+@with_appcontext
+def check_plans_command(threshold):
+    """EXPLAIN every route query and fail on full scans or filesorts."""
+    problems = check_plans(db.get_db().cursor(), threshold)
+    for route, problem in problems:
+        click.echo(f'FAIL  {route}: {problem}')
+    if problems:
+        raise SystemExit(1)
+    click.echo(f'all {len(QUERIES)} query plans ok (threshold {threshold} rows)')
@@ -0,0 +1,52 @@
+#------------------------------------------------------------
+# Counts SQL statements and the time spent in them for the
+# current request (see backend/metrics).
+#
+# The request middleware puts a SQLTimer in `current_timer`; the
+# cursor classes below add every execute() to whatever timer is
+# set. It is a context variable, so run_parallel copies it into
+# its worker threads and their queries count for the request too.
+# Outside a request (CLI commands) no timer is set and nothing is
+# recorded.
+#------------------------------------------------------------
+import contextvars
+import threading
+import time
+
+from pymysql import cursors
+
+current_timer = contextvars.ContextVar('sql_timer', default=None)
+
+
+class SQLTimer(object):
+    def __init__(self):
+        self.statements = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self.statements += 1
+            self.seconds += seconds
+
+
+class _Timed(object):
+    def execute(self, query, args=None):
+        timer = current_timer.get()
+        if timer is None:
+            return super().execute(query, args)
+        started = time.perf_counter()
+        try:
+            return super().execute(query, args)
+        finally:
+            timer.add(time.perf_counter() - started)
+
+
+# buffered: the time includes reading the rows
+class TimedDictCursor(_Timed, cursors.DictCursor):
+    pass
+
+
+# unbuffered: only the time until the first rows arrive
+class TimedSSDictCursor(_Timed, cursors.SSDictCursor):
+    pass
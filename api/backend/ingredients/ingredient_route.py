@@ -1,20 +1,33 @@
 from flask import Blueprint, request, jsonify, make_response, current_app
+import click
 from backend.db_connection import db
+from backend.cache.conditional import conditional, bump_versions
+from backend.cache import cache
+from backend.ingredients.trigram import ingredient_trigrams
+from backend.ingredients.suggest import ingredient_suggester, MAX_SUGGESTIONS
+from backend.ingredients.resolve import name_key, ingredients_by_name, create_ingredients, ingredients_added
+from backend.ingredients.substitutions import benchmark as substitution_benchmark, DEFAULT_DEPTH
 
 # ------------------------------------------------------------
 # Create a new Blueprint object for ingredients
 ingredients = Blueprint('ingredients', __name__)
 
+MAX_FUZZY_RESULTS = 50
+MAX_RESOLVE_NAMES = 500
+
 # ------------------------------------------------------------
 # Gets all ingredients from the database
-@ingredients.route('/ingredients', methods=['GET'])
-def get_all_ingredients():
-    query = '''
+ALL_INGREDIENTS_QUERY = '''
             SELECT *
             FROM ingredients;
             '''
+
+@ingredients.route('/ingredients', methods=['GET'])
+@conditional('ingredients')
+@cache.cached(tags=('ingredients',))
+def get_all_ingredients():
     cursor = db.get_db().cursor()
-    cursor.execute(query)
+    cursor.execute(ALL_INGREDIENTS_QUERY)
     theData = cursor.fetchall()
 
     response = make_response(jsonify(theData))
@@ -37,6 +50,10 @@ def add_ingredient():
     cursor = db.get_db().cursor()
     cursor.execute(query, (name,))
     db.get_db().commit()
+    bump_versions(db.get_db(), 'ingredients')
+    cache.invalidate('ingredients')
+    ingredient_trigrams.refresh_ingredient(cursor, cursor.lastrowid)
+    ingredient_suggester.invalidate()
 
     return make_response(jsonify({'message': 'Ingredient added successfully'}), 201)
 
@@ -58,22 +75,151 @@ def update_ingredient(id):
     cursor = db.get_db().cursor()
     cursor.execute(query, (name, id))
     db.get_db().commit()
+    bump_versions(db.get_db(), 'ingredients')
+    cache.invalidate('ingredients', 'recipes')
+    ingredient_trigrams.refresh_ingredient(cursor, id)
+    ingredient_suggester.invalidate()
 
     return make_response(jsonify({'message': 'Ingredient updated successfully'}), 200)
 
+# ------------------------------------------------------------
+# Ingredient autocomplete, e.g.
+#   GET /ingredients/suggest?q=chi&limit=10&rank=usage
+# Returns up to `limit` ingredients (default 10) with a word that
+# starts with q, alphabetically, or with rank=usage the ones used in
+# the most recipes first. Each row has ingredientId, name and
+# recipeCount.
+@ingredients.route('/ingredients/suggest', methods=['GET'])
+def suggest_ingredients():
+    q = request.args.get('q', '')
+    by_usage = request.args.get('rank', 'name') == 'usage'
+    try:
+        limit = max(1, min(int(request.args.get('limit', 10)), MAX_SUGGESTIONS))
+    except ValueError:
+        return make_response({'error': 'limit must be an integer'}, 400)
+
+    ingredient_suggester.ensure_built(db.get_db().cursor())
+    theData = ingredient_suggester.suggest(q, limit, by_usage)
+
+    response = make_response(jsonify(theData))
+    response.status_code = 200
+    return response
+
+# ------------------------------------------------------------
+# POST /ingredients/resolve
+# Maps a list of ingredient names to ids in one round trip, e.g.
+#   {"names": ["Tomato", "basil"], "create": true}
+# Names are matched the way MySQL compares them (case-insensitive).
+# With "create": true, names that don't exist yet are inserted with
+# a single multi-row INSERT in the same transaction.
+# Returns {"ids": {name: ingredientId}, "missing": [...], "created": [...]}
+# where the keys are the names exactly as they were sent.
+@ingredients.route('/ingredients/resolve', methods=['POST'])
+def resolve_ingredients():
+    data = request.get_json() or {}
+    names = data.get('names')
+    if not isinstance(names, list) or not all(isinstance(n, str) for n in names):
+        return make_response({'error': 'names must be a list of strings'}, 400)
+    if len(names) > MAX_RESOLVE_NAMES:
+        return make_response({'error': f'at most {MAX_RESOLVE_NAMES} names per request'}, 400)
+    create = bool(data.get('create', False))
+
+    # one entry per distinct name, keyed the way the database compares them
+    wanted = {}
+    for name in names:
+        if name.strip():
+            wanted.setdefault(name_key(name), name.strip())
+
+    conn = db.get_db()
+    cursor = conn.cursor()
+    found = ingredients_by_name(cursor, list(wanted.values()))
+
+    created = []
+    missing = [wanted[key] for key in wanted if key not in found]
+    if create and missing:
+        try:
+            rows = create_ingredients(cursor, missing)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        found.update(rows)
+        created = [name for name in missing if name_key(name) in rows]
+        missing = [name for name in missing if name_key(name) not in rows]
+        ingredients_added(rows.values())
+
+    ids = {}
+    for name in names:
+        row = found.get(name_key(name))
+        if row is not None:
+            ids[name] = row['ingredientId']
+
+    response = make_response(jsonify({'ids': ids, 'missing': missing, 'created': created}))
+    response.status_code = 200
+    return response
+
+# ------------------------------------------------------------
+# Typo-tolerant ingredient lookup, e.g.
+#   GET /ingredients/fuzzy?q=tomatos&limit=5
+# Returns up to `limit` ingredients (default 5) whose names share
+# enough character trigrams with q, best match first, each with a
+# similarity score between 0 and 1.
+@ingredients.route('/ingredients/fuzzy', methods=['GET'])
+def fuzzy_ingredient_lookup():
+    q = request.args.get('q', '')
+    try:
+        limit = max(1, min(int(request.args.get('limit', 5)), MAX_FUZZY_RESULTS))
+    except ValueError:
+        return make_response({'error': 'limit must be an integer'}, 400)
+
+    cursor = db.get_db().cursor()
+    ingredient_trigrams.ensure_built(cursor)
+
+    theData = []
+    for row, score in ingredient_trigrams.lookup(q, limit):
+        match = dict(row)
+        match['score'] = round(score, 4)
+        theData.append(match)
+
+    response = make_response(jsonify(theData))
+    response.status_code = 200
+    return response
+
 # ------------------------------------------------------------
 # gets an ingredient id by name
-@ingredients.route('/ingredients/<name>', methods=['GET'])
-def get_ingredient_by_name(name):
-    query = '''
+INGREDIENT_BY_NAME_QUERY = '''
             SELECT *
             FROM ingredients
             WHERE name = %s;
             '''
+
+@ingredients.route('/ingredients/<name>', methods=['GET'])
+@conditional('ingredients')
+def get_ingredient_by_name(name):
     cursor = db.get_db().cursor()
-    cursor.execute(query, (name,))
+    cursor.execute(INGREDIENT_BY_NAME_QUERY, (name,))
     theData = cursor.fetchall()
 
     response = make_response(jsonify(theData))
     response.status_code = 200
-    return response
\ No newline at end of file
+    return response
+
+
+# ------------------------------------------------------------
+# Times building the substitution graph and its pantry lookups on
+# synthetic data:
+#   flask --app backend_app ingredients bench-substitutions --edges 20000 --depth 3
+@ingredients.cli.command('bench-substitutions')
+@click.option('--ingredients', 'n_ingredients', default=2000, show_default=True)
+@click.option('--edges', 'n_edges', default=20000, show_default=True, help='substitution rows')
+@click.option('--recipes', 'n_recipes', default=100000, show_default=True)
+@click.option('--depth', default=DEFAULT_DEPTH, show_default=True)
+@click.option('--min-recipes', default=2, show_default=True, help='recipes an edge needs to be global')
+@click.option('--pantry-size', default=30, show_default=True)
+@click.option('--queries', default=200, show_default=True)
+def bench_substitutions_command(n_ingredients, n_edges, n_recipes, depth, min_recipes, pantry_size, queries):
+    result = substitution_benchmark(n_ingredients, n_edges, n_recipes, depth, min_recipes, pantry_size, queries)
+    click.echo(f"{result['edges']} edges, {result['closurePairs']} global closure pairs (depth {depth}), "
+               f"{result['recipes']} recipes with edges; built in {result['build_ms']:.0f} ms")
+    click.echo(f"{result['queries']} pantries of {pantry_size}: p50 {result['p50_ms']:.2f} ms, "
+               f"p95 {result['p95_ms']:.2f} ms, p99 {result['p99_ms']:.2f} ms, max {result['max_ms']:.2f} ms")
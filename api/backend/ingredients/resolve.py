@@ -0,0 +1,55 @@
+#------------------------------------------------------------
+# Bulk ingredient name -> row resolution, shared by
+# POST /ingredients/resolve and the recipe importer. Names are
+# matched the way MySQL compares them (case-insensitive), so
+# results are keyed by the lowercased, stripped name.
+#------------------------------------------------------------
+from backend.cache import cache
+from backend.cache.conditional import bump_versions
+from backend.db_connection import db
+from backend.ingredients.trigram import ingredient_trigrams
+from backend.ingredients.suggest import ingredient_suggester
+
+
+def name_key(name):
+    return name.strip().lower()
+
+
+# looks up many ingredients with one IN query
+def ingredients_by_name(cursor, names):
+    if not names:
+        return {}
+    placeholders = ', '.join(['%s'] * len(names))
+    cursor.execute(f'''
+        SELECT ingredientId, name, cost
+        FROM ingredients
+        WHERE name IN ({placeholders});
+    ''', names)
+    return {name_key(row['name']): row for row in cursor.fetchall()}
+
+
+#------------------------------------------------------------
+# Inserts the given names with one multi-row INSERT (names that
+# already exist are left alone) and returns the rows for all of
+# them. Runs in the caller's transaction; call ingredients_added()
+# once it has been committed.
+def create_ingredients(cursor, names):
+    if not names:
+        return {}
+    cursor.execute(f'''
+        INSERT INTO ingredients (name)
+        VALUES {', '.join(['(%s)'] * len(names))}
+        ON DUPLICATE KEY UPDATE name = name;
+    ''', names)
+    return ingredients_by_name(cursor, names)
+
+
+# tells the caches and in-memory indexes about committed new rows
+def ingredients_added(rows):
+    rows = list(rows)
+    if not rows:
+        return
+    bump_versions(db.get_db(), 'ingredients')
+    cache.invalidate('ingredients')
+    ingredient_trigrams.add_rows(rows)
+    ingredient_suggester.invalidate()
@@ -0,0 +1,283 @@
+#------------------------------------------------------------
+# Ingredient substitution graph, loaded from the substitutions
+# table (originalIngredientId, subIngredientId, recipeId, ...).
+#
+# An edge X -> Y means "Y can stand in for X". Every row is an edge
+# for its own recipe; an edge seen in at least min_recipes recipes
+# is also global and applies to every recipe. Chains are followed
+# up to `depth` edges (X -> Y -> Z makes Z a depth-2 substitute for
+# X), and those transitive closures are precomputed in both
+# directions when the graph is built, so a request only does
+# dictionary lookups:
+#   substitutes(X, recipe)  what can replace X (in that recipe)
+#   covered(pantry)         which missing ingredients the pantry
+#                           can replace anywhere
+#   recipe_covered(pantry)  the extra ones it can replace only in
+#                           particular recipes
+#
+# The table is small next to recipeIngredients, so a change is
+# picked up by rebuilding the whole graph: invalidate() after a
+# write to rebuild on next use, refresh() to rebuild right away, or
+# after max_age seconds.
+#------------------------------------------------------------
+import threading
+import time
+from collections import defaultdict, deque
+
+import numpy as np
+
+from backend.utils.generation import Generation
+
+DEFAULT_DEPTH = 2
+# an edge from a single recipe stays that recipe's own; with 1 every
+# one-off substitution would apply to every recipe
+DEFAULT_MIN_RECIPES = 2
+
+EDGES_QUERY = '''
+            SELECT originalIngredientId, subIngredientId, recipeId, quantity, unit
+            FROM substitutions;
+        '''
+
+
+# everything reachable from start in at most `depth` edges of
+# adjacency (plus `extra`, a recipe's own edges), with its depth
+def _closure(adjacency, start, depth, extra=None):
+    # breadth-first, so each node gets its shortest depth
+    found = {}
+    queue = deque([(start, 0)])
+    while queue:
+        node, d = queue.popleft()
+        if d == depth:
+            continue
+        neighbours = adjacency.get(node, ())
+        if extra and node in extra:
+            neighbours = set(neighbours) | set(extra[node])
+        for nxt in neighbours:
+            if nxt != start and nxt not in found:
+                found[nxt] = d + 1
+                queue.append((nxt, d + 1))
+    return found
+
+
+class _Graph(object):
+    # an immutable snapshot of the edges and their closures
+    def __init__(self, rows, depth, min_recipes):
+        self.depth = depth
+        support = defaultdict(set)
+        self.recipe_edges = defaultdict(dict)    # recipeId -> {original: {sub: (quantity, unit)}}
+        for row in rows:
+            original, sub, recipe_id = row['originalIngredientId'], row['subIngredientId'], row['recipeId']
+            if original == sub:
+                continue
+            support[(original, sub)].add(recipe_id)
+            self.recipe_edges[recipe_id].setdefault(original, {})[sub] = (row['quantity'], row['unit'])
+        self.edges = len(support)
+
+        adjacency = defaultdict(set)
+        for (original, sub), recipes in support.items():
+            if len(recipes) >= min_recipes:
+                adjacency[original].add(sub)
+
+        # global closures: original -> {sub: depth} and sub -> {original: depth}
+        self.closure = {node: _closure(adjacency, node, depth) for node in adjacency}
+        self.reverse = defaultdict(dict)
+        for original, subs in self.closure.items():
+            for sub, d in subs.items():
+                self.reverse[sub][original] = d
+
+        # a recipe can also follow its own (non-global) edges. For
+        # each such edge a -> b, whatever reaches a within d1 edges
+        # reaches b at d1 + 1 and b's own closure after that; only
+        # what beats the global closure is kept, indexed by sub in
+        # recipe_reverse for pantry lookups
+        self.recipe_closure = {}
+        self.recipe_reverse = defaultdict(list)  # sub -> [(recipeId, original, depth)]
+        for recipe_id, edges in self.recipe_edges.items():
+            own = {original: [sub for sub in subs if sub not in adjacency.get(original, ())]
+                   for original, subs in edges.items()}
+            own = {original: subs for original, subs in own.items() if subs}
+            if not own:
+                continue
+            extra = defaultdict(dict)
+            for original, subs in own.items():
+                sources = [(original, 0)] + [(node, d) for node, d in self.reverse.get(original, {}).items()
+                                             if d < depth]
+                for sub in subs:
+                    tail = [(sub, 0)] + list(_closure(adjacency, sub, depth - 1, own).items())
+                    for node, d1 in sources:
+                        known = self.closure.get(node, {})
+                        for target, d2 in tail:
+                            d = d1 + 1 + d2
+                            if d <= depth and target != node and d < known.get(target, depth + 1) \
+                                    and d < extra[node].get(target, depth + 1):
+                                extra[node][target] = d
+            for node, added in extra.items():
+                for sub, d in added.items():
+                    self.recipe_reverse[sub].append((recipe_id, node, d))
+            if extra:
+                self.recipe_closure[recipe_id] = dict(extra)
+
+        # a popular substitute can appear in thousands of recipes, so
+        # each posting list is kept as (recipes, originals, depths) arrays
+        self.recipe_reverse = {sub: tuple(np.array(column, dtype=np.int64) for column in zip(*entries))
+                               for sub, entries in self.recipe_reverse.items()}
+
+
+class SubstitutionGraph(object):
+    def __init__(self, depth=DEFAULT_DEPTH, min_recipes=DEFAULT_MIN_RECIPES, max_age=600):
+        self.depth = depth
+        self.min_recipes = min_recipes
+        self.max_age = max_age
+        self._rebuilding = threading.Lock()
+        self._graph = None
+        self._stale = False
+        self.built_at = None
+        self.generation = Generation()
+
+    @property
+    def ready(self):
+        return (self.built_at is not None and not self._stale
+                and time.monotonic() - self.built_at < self.max_age)
+
+    def stats(self):
+        graph = self._graph
+        return {
+            'edges': graph.edges if graph is not None else 0,
+            'ingredients': len(graph.closure) if graph is not None else 0,
+            'closurePairs': sum(len(subs) for subs in graph.closure.values()) if graph is not None else 0,
+            'recipes': len(graph.recipe_edges) if graph is not None else 0,
+            'depth': self.depth,
+        }
+
+    #------------------------------------------------------------
+    # Building
+
+    def build_from_rows(self, rows):
+        self._graph = _Graph(rows, self.depth, self.min_recipes)
+        self._stale = False
+        self.built_at = time.monotonic()
+        self.generation.reset()
+
+    def build(self, cursor):
+        cursor.execute(EDGES_QUERY)
+        self.build_from_rows(cursor.fetchall())
+
+    def ensure_built(self, cursor):
+        if self.ready:
+            return
+        acquired = self._rebuilding.acquire(blocking=self.built_at is None)
+        if not acquired:
+            return
+        try:
+            if not self.ready:
+                self.build(cursor)
+        finally:
+            self._rebuilding.release()
+
+    def invalidate(self):
+        self._stale = True
+
+    # rebuilds now, after any rebuild already in progress
+    def refresh(self, cursor):
+        with self._rebuilding:
+            self.build(cursor)
+
+    #------------------------------------------------------------
+    # Lookups
+
+    # Everything that can replace ingredient_id, nearest first, as
+    # dicts with ingredientId, depth and, for an edge stated for
+    # recipe_id itself, that recipe's quantity and unit
+    def substitutes(self, ingredient_id, recipe_id=None):
+        graph = self._graph
+        if graph is None:
+            return []
+        found = dict(graph.closure.get(ingredient_id, {}))
+        if recipe_id is not None:
+            found.update(graph.recipe_closure.get(recipe_id, {}).get(ingredient_id, {}))
+        direct = graph.recipe_edges.get(recipe_id, {}).get(ingredient_id, {}) if recipe_id is not None else {}
+        result = []
+        for sub, d in sorted(found.items(), key=lambda item: (item[1], item[0])):
+            entry = {'ingredientId': sub, 'depth': d}
+            if sub in direct:
+                entry['quantity'], entry['unit'] = direct[sub]
+            result.append(entry)
+        return result
+
+    # {original: (sub, depth)} for every ingredient not in `pantry`
+    # that something in it can replace in any recipe
+    def covered(self, pantry):
+        graph = self._graph
+        found = {}
+        if graph is None:
+            return found
+        for sub in pantry:
+            for original, d in graph.reverse.get(sub, {}).items():
+                if original not in pantry and (original not in found or d < found[original][1]):
+                    found[original] = (sub, d)
+        return found
+
+    # The replacements that only hold within particular recipes, as
+    # parallel arrays (recipeIds, originals, subs, depths) with one
+    # entry, the nearest, per recipe and missing original
+    def recipe_covered(self, pantry):
+        graph = self._graph
+        empty = np.zeros(0, dtype=np.int64)
+        parts = [(sub, graph.recipe_reverse[sub]) for sub in pantry
+                 if graph is not None and sub in graph.recipe_reverse]
+        if not parts:
+            return empty, empty, empty, empty
+        recipes = np.concatenate([part[0] for _, part in parts])
+        originals = np.concatenate([part[1] for _, part in parts])
+        depths = np.concatenate([part[2] for _, part in parts])
+        subs = np.concatenate([np.full(len(part[0]), sub, dtype=np.int64) for sub, part in parts])
+
+        keep = ~np.isin(originals, np.fromiter(pantry, dtype=np.int64))
+        recipes, originals, subs, depths = recipes[keep], originals[keep], subs[keep], depths[keep]
+        order = np.lexsort((depths, originals, recipes))
+        recipes, originals, subs, depths = recipes[order], originals[order], subs[order], depths[order]
+        first = np.ones(len(recipes), dtype=bool)
+        first[1:] = (recipes[1:] != recipes[:-1]) | (originals[1:] != originals[:-1])
+        return recipes[first], originals[first], subs[first], depths[first]
+
+
+substitution_graph = SubstitutionGraph()
+
+
+#------------------------------------------------------------
+# Synthetic substitution rows for benchmarks: n_edges rows over
+# n_ingredients with a Zipf-like popularity, spread across
+# n_recipes recipes, so popular swaps repeat and become global.
+def synthetic_rows(n_ingredients, n_edges, n_recipes, rng):
+    popularity = 1.0 / np.arange(1, n_ingredients + 1)
+    popularity /= popularity.sum()
+    originals = rng.choice(n_ingredients, n_edges, p=popularity) + 1
+    subs = rng.choice(n_ingredients, n_edges, p=popularity) + 1
+    recipes = rng.integers(1, n_recipes + 1, n_edges)
+    return [{'originalIngredientId': int(o), 'subIngredientId': int(s), 'recipeId': int(r), 'quantity': 1, 'unit': 'g'}
+            for o, s, r in zip(originals, subs, recipes)]
+
+
+# Times a graph build and pantry lookups on synthetic rows
+def benchmark(n_ingredients=2000, n_edges=20000, n_recipes=100000, depth=DEFAULT_DEPTH, min_recipes=2,
+              pantry_size=30, queries=200, seed=0):
+    rng = np.random.default_rng(seed)
+    popularity = 1.0 / np.arange(1, n_ingredients + 1)
+    popularity /= popularity.sum()
+    rows = synthetic_rows(n_ingredients, n_edges, n_recipes, rng)
+
+    graph = SubstitutionGraph(depth=depth, min_recipes=min_recipes)
+    started = time.perf_counter()
+    graph.build_from_rows(rows)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    latencies = []
+    for _ in range(queries):
+        pantry = set((rng.choice(n_ingredients, pantry_size, replace=False, p=popularity) + 1).tolist())
+        started = time.perf_counter()
+        graph.covered(pantry)
+        graph.recipe_covered(pantry)
+        latencies.append((time.perf_counter() - started) * 1000)
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return dict(graph.stats(), build_ms=build_ms, queries=queries, pantry_size=pantry_size,
+                p50_ms=float(p50), p95_ms=float(p95), p99_ms=float(p99), max_ms=float(max(latencies)))
@@ -0,0 +1,124 @@
+#------------------------------------------------------------
+# In-memory autocomplete over ingredient names.
+#
+# Every word of every normalized name is a key in one sorted list
+# ("chicken breast" is filed under "chicken breast" and "breast"),
+# so a prefix lookup is a bisect to the first match followed by a
+# short walk. Each ingredient also carries the number of recipes
+# that use it, for popularity ranking. One- and two-letter prefixes
+# match too much of the catalog to rank on the fly, so their
+# most-used ingredients are picked once at build time.
+#
+# Ingredient writes only mark the index stale. It is rebuilt on the
+# next lookup (or once it is older than max_age seconds, to pick up
+# other workers' writes) while other requests keep reading the old
+# copy.
+#------------------------------------------------------------
+import bisect
+import heapq
+import threading
+import time
+from collections import defaultdict
+
+from backend.ingredients.trigram import normalize
+
+MAX_SUGGESTIONS = 50
+SHORT_PREFIX = 2
+
+_SUGGEST_QUERY = '''
+    SELECT i.ingredientId, i.name, COUNT(ri.recipeId) AS recipeCount
+    FROM ingredients i
+    LEFT JOIN recipeIngredients ri ON ri.ingredientId = i.ingredientId
+    GROUP BY i.ingredientId, i.name;
+'''
+
+
+class IngredientSuggester(object):
+    def __init__(self, max_age=600):
+        self.max_age = max_age
+        self._rebuilding = threading.Lock()
+        # (sorted [(key, ingredientId)],
+        #  {ingredientId: row},
+        #  {short prefix: [ingredientId, most used first]})
+        self._state = ([], {}, {})
+        self.built_at = None
+        self._stale = False
+
+    @property
+    def ready(self):
+        return (self.built_at is not None and not self._stale
+                and time.monotonic() - self.built_at < self.max_age)
+
+    def build(self, cursor):
+        cursor.execute(_SUGGEST_QUERY)
+        rows = {row['ingredientId']: row for row in cursor.fetchall()}
+
+        keys = []
+        short = defaultdict(set)
+        for ingredient_id, row in rows.items():
+            words = normalize(row['name']).split()
+            for i in range(len(words)):
+                key = ' '.join(words[i:])
+                keys.append((key, ingredient_id))
+                for length in range(1, SHORT_PREFIX + 1):
+                    short[key[:length]].add(ingredient_id)
+        keys.sort()
+
+        popular = {}
+        for prefix, ids in short.items():
+            popular[prefix] = heapq.nlargest(MAX_SUGGESTIONS, ids,
+                                             key=lambda i: (rows[i]['recipeCount'], -i))
+
+        # swap everything in at once; readers never see a half-built index
+        self._state = (keys, rows, popular)
+        self._stale = False
+        self.built_at = time.monotonic()
+
+    def ensure_built(self, cursor):
+        if self.ready:
+            return
+        acquired = self._rebuilding.acquire(blocking=self.built_at is None)
+        if not acquired:
+            return
+        try:
+            if not self.ready:
+                self.build(cursor)
+        finally:
+            self._rebuilding.release()
+
+    def invalidate(self):
+        self._stale = True
+
+    #------------------------------------------------------------
+    # Returns up to `limit` rows whose name has a word starting with
+    # `prefix`, alphabetically by the matching word, or with
+    # by_usage=True the ones used in the most recipes first.
+    def suggest(self, prefix, limit=10, by_usage=False):
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        keys, rows, popular = self._state
+        limit = min(limit, MAX_SUGGESTIONS)
+
+        if by_usage and len(prefix) <= SHORT_PREFIX:
+            return [rows[i] for i in popular.get(prefix, [])[:limit]]
+
+        start = bisect.bisect_left(keys, (prefix,))
+        seen = set()
+        matches = []
+        for i in range(start, len(keys)):
+            key, ingredient_id = keys[i]
+            if not key.startswith(prefix):
+                break
+            if ingredient_id not in seen:
+                seen.add(ingredient_id)
+                matches.append(rows[ingredient_id])
+                if not by_usage and len(matches) >= limit:
+                    break
+
+        if by_usage:
+            return heapq.nlargest(limit, matches, key=lambda row: (row['recipeCount'], -row['ingredientId']))
+        return matches
+
+
+ingredient_suggester = IngredientSuggester()
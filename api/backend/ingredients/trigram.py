@@ -0,0 +1,133 @@
+#------------------------------------------------------------
+# In-memory character-trigram index over ingredient names, used
+# for typo-tolerant lookups ("tomatos" -> "Tomato").
+#
+# A name is lowercased, stripped to letters/digits/spaces, padded
+# with spaces and cut into overlapping 3-character pieces. Each
+# trigram has a posting list of the ingredients that contain it,
+# so a lookup only counts shared trigrams over those lists and
+# never compares the query to every name. Candidates are scored
+# with the Jaccard similarity of the two trigram sets.
+#
+# add_ingredient / update_ingredient refresh single entries; the
+# index is built on first use and rebuilt once it is older than
+# max_age seconds so other workers' writes show up.
+#------------------------------------------------------------
+import heapq
+import re
+import threading
+import time
+from collections import defaultdict
+
+_CLEAN = re.compile(r'[^a-z0-9 ]+')
+
+
+def normalize(name):
+    return ' '.join(_CLEAN.sub(' ', (name or '').lower()).split())
+
+
+def trigrams(name):
+    text = f'  {normalize(name)} '
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TrigramIndex(object):
+    def __init__(self, max_age=600):
+        self.max_age = max_age
+        self._lock = threading.RLock()
+        self._rebuilding = threading.Lock()
+        self._postings = defaultdict(set)   # trigram -> {ingredientId}
+        self._grams = {}                    # ingredientId -> set of trigrams
+        self._rows = {}                     # ingredientId -> row
+        self.built_at = None
+
+    @property
+    def ready(self):
+        return self.built_at is not None and time.monotonic() - self.built_at < self.max_age
+
+    def build(self, cursor):
+        cursor.execute('SELECT ingredientId, name, cost FROM ingredients;')
+        rows = cursor.fetchall()
+        postings = defaultdict(set)
+        grams = {}
+        for row in rows:
+            grams[row['ingredientId']] = trigrams(row['name'])
+            for gram in grams[row['ingredientId']]:
+                postings[gram].add(row['ingredientId'])
+        with self._lock:
+            self._postings = postings
+            self._grams = grams
+            self._rows = {row['ingredientId']: row for row in rows}
+            self.built_at = time.monotonic()
+
+    def ensure_built(self, cursor):
+        if self.ready:
+            return
+        acquired = self._rebuilding.acquire(blocking=self.built_at is None)
+        if not acquired:
+            return
+        try:
+            if not self.ready:
+                self.build(cursor)
+        finally:
+            self._rebuilding.release()
+
+    # re-reads one ingredient from the database and replaces its entry
+    def refresh_ingredient(self, cursor, ingredient_id):
+        if self.built_at is None:
+            return
+        cursor.execute('SELECT ingredientId, name, cost FROM ingredients WHERE ingredientId = %s;',
+                       (ingredient_id,))
+        row = cursor.fetchone()
+        with self._lock:
+            self._discard(int(ingredient_id))
+            if row is not None:
+                self._put(row)
+
+    # adds rows that were just read or written, without a round trip
+    def add_rows(self, rows):
+        if self.built_at is None:
+            return
+        with self._lock:
+            for row in rows:
+                self._discard(row['ingredientId'])
+                self._put(row)
+
+    def _put(self, row):
+        self._rows[row['ingredientId']] = row
+        self._grams[row['ingredientId']] = trigrams(row['name'])
+        for gram in self._grams[row['ingredientId']]:
+            self._postings[gram].add(row['ingredientId'])
+
+    def _discard(self, ingredient_id):
+        for gram in self._grams.pop(ingredient_id, ()):
+            posting = self._postings.get(gram)
+            if posting is not None:
+                posting.discard(ingredient_id)
+                if not posting:
+                    del self._postings[gram]
+        self._rows.pop(ingredient_id, None)
+
+    #------------------------------------------------------------
+    # Returns up to `limit` (row, score) pairs for `name`, best
+    # first, with score in (0, 1]; 1.0 means the same trigrams.
+    def lookup(self, name, limit=5, min_score=0.25):
+        query = trigrams(name)
+        if not normalize(name):
+            return []
+        with self._lock:
+            shared = defaultdict(int)
+            for gram in query:
+                for ingredient_id in self._postings.get(gram, ()):
+                    shared[ingredient_id] += 1
+
+            scored = []
+            for ingredient_id, common in shared.items():
+                score = common / (len(query) + len(self._grams[ingredient_id]) - common)
+                if score >= min_score:
+                    scored.append((score, ingredient_id))
+            best = heapq.nlargest(limit, scored)
+            return [(self._rows[ingredient_id], score) for score, ingredient_id in best]
+
+
+ingredient_trigrams = TrigramIndex()
@@ -0,0 +1,160 @@
+#------------------------------------------------------------
+# This file creates the shared request metrics resource.
+#
+# metrics.init_app(app) hooks every request and records, per
+# (blueprint, route rule, method):
+#   - a count per status code
+#   - a latency histogram
+#   - response bytes
+#   - SQL statements and the time spent in them (see
+#     backend/db_connection/timing.py)
+# plus a gauge of requests in flight. GET /metrics serves them in
+# Prometheus text format, followed by the stats() of the pool, the
+# cache and the in-memory indexes (add_collector).
+#
+# Routes are labelled by their rule ("/recipe/<int:id>"), never the
+# raw path, so the number of series stays bounded. Recording is a
+# few perf_counter() calls and one lock per request.
+#
+# Each gunicorn worker keeps its own numbers. When METRICS_DIR is
+# set, workers also write them there (at most every
+# METRICS_FLUSH_INTERVAL seconds) and /metrics reports the sum over
+# all workers, whichever one answers the scrape; the component
+# stats are always those of the answering worker.
+#------------------------------------------------------------
+import bisect
+import os
+import threading
+import time
+
+from flask import Response, g, request
+
+from backend.db_connection.timing import SQLTimer, current_timer
+from backend.metrics import prometheus
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _RouteStats(object):
+    __slots__ = ('statuses', 'buckets', 'seconds', 'bytes_out', 'statements', 'sql_seconds')
+
+    def __init__(self, n_buckets):
+        self.statuses = {}
+        self.buckets = [0] * (n_buckets + 1)
+        self.seconds = 0.0
+        self.bytes_out = 0
+        self.statements = 0
+        self.sql_seconds = 0.0
+
+
+class RequestMetrics(object):
+    def __init__(self, app=None, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.directory = None
+        self.flush_interval = 5
+        self._lock = threading.Lock()
+        self._routes = {}
+        self._in_flight = 0
+        self._flushed_at = 0.0
+        self._collectors = []
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('METRICS_ENABLED', True)
+        app.config.setdefault('METRICS_DIR', None)
+        app.config.setdefault('METRICS_FLUSH_INTERVAL', 5)
+        if not app.config['METRICS_ENABLED']:
+            return
+
+        self.directory = app.config['METRICS_DIR']
+        self.flush_interval = app.config['METRICS_FLUSH_INTERVAL']
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+        app.before_request(self._start)
+        app.after_request(self._record)
+        app.teardown_request(self._finish)
+        app.add_url_rule('/metrics', 'metrics', self.view)
+
+    # name -> fn returning a dict of numbers, rendered as
+    # pantrypal_<name>_<key>; keys in `counters` are counters
+    def add_collector(self, name, fn, counters=()):
+        self._collectors.append((name, fn, tuple(counters)))
+
+    #------------------------------------------------------------
+    # Request hooks
+
+    def _start(self):
+        g.metrics_started = time.perf_counter()
+        g.metrics_timer = SQLTimer()
+        current_timer.set(g.metrics_timer)
+        with self._lock:
+            self._in_flight += 1
+
+    def _record(self, response):
+        started = g.get('metrics_started')
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        rule = request.url_rule
+        key = (request.blueprint or '', rule.rule if rule is not None else '<unmatched>', request.method)
+        timer = g.metrics_timer
+        bytes_out = 0 if response.is_streamed else (response.content_length or 0)
+        bucket = bisect.bisect_left(self.buckets, elapsed)
+
+        with self._lock:
+            stats = self._routes.get(key)
+            if stats is None:
+                stats = self._routes[key] = _RouteStats(len(self.buckets))
+            stats.statuses[response.status_code] = stats.statuses.get(response.status_code, 0) + 1
+            stats.buckets[bucket] += 1
+            stats.seconds += elapsed
+            stats.bytes_out += bytes_out
+            stats.statements += timer.statements
+            stats.sql_seconds += timer.seconds
+        return response
+
+    def _finish(self, exception):
+        if g.pop('metrics_started', None) is None:
+            return
+        current_timer.set(None)
+        with self._lock:
+            self._in_flight -= 1
+        if self.directory and time.monotonic() - self._flushed_at >= self.flush_interval:
+            self.flush()
+
+    #------------------------------------------------------------
+    # Reporting
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'inFlight': self._in_flight,
+                'routes': [[blueprint, route, method,
+                            {str(status): count for status, count in stats.statuses.items()},
+                            list(stats.buckets), stats.seconds, stats.bytes_out,
+                            stats.statements, stats.sql_seconds]
+                           for (blueprint, route, method), stats in sorted(self._routes.items())],
+            }
+
+    def flush(self):
+        self._flushed_at = time.monotonic()
+        prometheus.write_snapshot(self.directory, self.snapshot())
+
+    def render(self):
+        if self.directory:
+            self.flush()
+            snapshot = prometheus.collect(self.directory)
+        else:
+            snapshot = self.snapshot()
+        lines = prometheus.render(snapshot, self.buckets)
+        for name, fn, counters in self._collectors:
+            lines.extend(prometheus.render_stats(name, fn(), counters))
+        return '\n'.join(lines) + '\n'
+
+    def view(self):
+        return Response(self.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+metrics = RequestMetrics()
@@ -0,0 +1,193 @@
+#------------------------------------------------------------
+# Prometheus text format (version 0.0.4) for the request metrics,
+# and the files that let several gunicorn workers report as one.
+#
+# A snapshot is a plain dict that survives a JSON round trip:
+#   {"inFlight": n,
+#    "routes": [[blueprint, route, method, {status: count},
+#                [count per bucket..., count over the last bucket],
+#                seconds, bytesOut, statements, sqlSeconds], ...]}
+# With a metrics directory each worker writes its snapshot to
+# <pid>.json; merging sums every file. When a worker exits, the
+# gunicorn master folds its file into retired.json (retire()), so
+# the counters never go backwards when workers are recycled.
+#------------------------------------------------------------
+import json
+import os
+import re
+
+RETIRED = 'retired.json'
+
+_CAMEL = re.compile(r'(?<!^)(?=[A-Z])')
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{name}="{_label(value)}"' for name, value in labels.items()) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+#------------------------------------------------------------
+# Snapshots
+
+def empty_snapshot():
+    return {'inFlight': 0, 'routes': []}
+
+
+def merge(snapshots):
+    routes = {}
+    in_flight = 0
+    for snapshot in snapshots:
+        in_flight += snapshot.get('inFlight', 0)
+        for blueprint, route, method, statuses, buckets, seconds, bytes_out, statements, sql_seconds \
+                in snapshot['routes']:
+            key = (blueprint, route, method)
+            if key not in routes:
+                routes[key] = [{}, [0] * len(buckets), 0.0, 0, 0, 0.0]
+            entry = routes[key]
+            for status, count in statuses.items():
+                entry[0][str(status)] = entry[0].get(str(status), 0) + count
+            entry[1] = [a + b for a, b in zip(entry[1], buckets)]
+            entry[2] += seconds
+            entry[3] += bytes_out
+            entry[4] += statements
+            entry[5] += sql_seconds
+    return {'inFlight': in_flight,
+            'routes': [list(key) + entry for key, entry in sorted(routes.items())]}
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write(path, snapshot):
+    # write-then-rename, so a reader never sees half a file
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(snapshot, f)
+    os.replace(tmp, path)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def write_snapshot(directory, snapshot):
+    _write(os.path.join(directory, f'{os.getpid()}.json'), snapshot)
+
+
+# Every worker's snapshot plus the retired totals, merged. The
+# in-flight gauge only counts workers that are still running.
+def collect(directory):
+    snapshots = []
+    for name in os.listdir(directory):
+        if not name.endswith('.json'):
+            continue
+        snapshot = _read(os.path.join(directory, name))
+        if snapshot is None:
+            continue
+        if name != RETIRED and not _alive(int(name[:-len('.json')])):
+            snapshot['inFlight'] = 0
+        snapshots.append(snapshot)
+    return merge(snapshots)
+
+
+# Called by the gunicorn master (child_exit) for a worker that has
+# gone: adds its counters to retired.json and removes its file.
+def retire(directory, pid):
+    path = os.path.join(directory, f'{pid}.json')
+    snapshot = _read(path)
+    if snapshot is not None:
+        snapshot['inFlight'] = 0
+        retired = _read(os.path.join(directory, RETIRED)) or empty_snapshot()
+        _write(os.path.join(directory, RETIRED), merge([retired, snapshot]))
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+#------------------------------------------------------------
+# Rendering
+
+def render(snapshot, bounds, prefix='pantrypal'):
+    lines = []
+
+    def family(name, kind, help_text):
+        lines.append(f'# HELP {prefix}_{name} {help_text}')
+        lines.append(f'# TYPE {prefix}_{name} {kind}')
+
+    routes = snapshot['routes']
+
+    family('http_requests_total', 'counter', 'Requests handled, by route and status.')
+    for blueprint, route, method, statuses, _, _, _, _, _ in routes:
+        for status, count in sorted(statuses.items()):
+            lines.append(f'{prefix}_http_requests_total'
+                         f'{_labels(blueprint=blueprint, route=route, method=method, status=status)} {count}')
+
+    family('http_request_duration_seconds', 'histogram', 'Time from routing a request to its response.')
+    for blueprint, route, method, _, buckets, seconds, _, _, _ in routes:
+        total = 0
+        for bound, count in zip(list(bounds) + [float('inf')], buckets):
+            total += count
+            lines.append(f'{prefix}_http_request_duration_seconds_bucket'
+                         f'{_labels(blueprint=blueprint, route=route, method=method, le=_number(bound))} {total}')
+        labels = _labels(blueprint=blueprint, route=route, method=method)
+        lines.append(f'{prefix}_http_request_duration_seconds_sum{labels} {_number(seconds)}')
+        lines.append(f'{prefix}_http_request_duration_seconds_count{labels} {total}')
+
+    family('http_response_bytes_total', 'counter', 'Response body bytes sent (streamed bodies not included).')
+    for blueprint, route, method, _, _, _, bytes_out, _, _ in routes:
+        lines.append(f'{prefix}_http_response_bytes_total'
+                     f'{_labels(blueprint=blueprint, route=route, method=method)} {bytes_out}')
+
+    family('db_statements_total', 'counter', 'SQL statements executed while handling requests.')
+    for blueprint, route, method, _, _, _, _, statements, _ in routes:
+        lines.append(f'{prefix}_db_statements_total'
+                     f'{_labels(blueprint=blueprint, route=route, method=method)} {statements}')
+
+    family('db_seconds_total', 'counter', 'Time spent in SQL statements while handling requests.')
+    for blueprint, route, method, _, _, _, _, _, sql_seconds in routes:
+        lines.append(f'{prefix}_db_seconds_total'
+                     f'{_labels(blueprint=blueprint, route=route, method=method)} {_number(sql_seconds)}')
+
+    family('http_requests_in_flight', 'gauge', 'Requests being handled right now.')
+    lines.append(f'{prefix}_http_requests_in_flight {snapshot["inFlight"]}')
+    return lines
+
+
+# One metric per numeric value of a component's stats() dict, e.g.
+# db_pool {"in_use": 2} -> pantrypal_db_pool_in_use 2. Keys listed
+# in `counters` are counters (and get a _total suffix), the rest
+# gauges.
+def render_stats(name, stats, counters=(), prefix='pantrypal'):
+    lines = []
+    for key, value in sorted(stats.items()):
+        if isinstance(value, bool):
+            value = int(value)
+        if not isinstance(value, (int, float)):
+            continue
+        metric = f'{prefix}_{name}_{_CAMEL.sub("_", key).lower()}'
+        if key in counters:
+            metric += '_total'
+        lines.append(f'# TYPE {metric} {"counter" if key in counters else "gauge"}')
+        lines.append(f'{metric} {_number(value)}')
+    return lines
@@ -0,0 +1,372 @@
+#------------------------------------------------------------
+# "What can I cook?" ranking: every recipe scored by how much of
+# it a pantry covers.
+#
+# Each recipe's required ingredients are packed once into CSC
+# arrays (for every ingredient, the rows of the recipes using it),
+# next to each recipe's required count, split by cost class. A
+# pantry query gathers the postings of the pantry's ingredients and
+# counts them per recipe with one np.bincount, so the whole catalog
+# is scored with a handful of array operations:
+#   coverage     present / required
+#   missing      required - present
+#   missingCost  the priciest cost class among the missing ones
+#
+# Kept current like the similar-recipes matrix (backend/recipes/
+# similar.py): changed or deleted recipes are switched off in the
+# arrays and held in a small overlay until the next rebuild.
+#------------------------------------------------------------
+import threading
+import time
+
+import numpy as np
+
+from backend.ingredients.substitutions import SubstitutionGraph, synthetic_rows
+
+# ingredients.cost, cheapest first; index 0 is "unknown" (NULL)
+COST_CLASSES = (None, 'CHEAP', 'MODERATE', 'EXPENSIVE')
+_COST_RANK = {cost: rank for rank, cost in enumerate(COST_CLASSES)}
+
+OVERLAY_REBUILD_RATIO = 0.05
+OVERLAY_REBUILD_MIN = 500
+
+PAIRS_QUERY = 'SELECT recipeId, ingredientId FROM recipeIngredients;'
+COSTS_QUERY = 'SELECT ingredientId, cost FROM ingredients WHERE cost IS NOT NULL;'
+
+
+class _Packed(object):
+    # an immutable snapshot of recipe -> required ingredients
+    def __init__(self, recipe_ids, ingredient_ids, costs):
+        # dedupe (recipe, ingredient) pairs through one packed int64 key
+        pairs = np.unique((np.asarray(recipe_ids, dtype=np.int64).reshape(-1) << 32)
+                          | np.asarray(ingredient_ids, dtype=np.int64).reshape(-1))
+        self.recipe_ids, rows = np.unique(pairs >> 32, return_inverse=True)
+        self.ingredient_ids, cols = np.unique(pairs & 0xFFFFFFFF, return_inverse=True)
+        n_rows, n_cols = len(self.recipe_ids), len(self.ingredient_ids)
+        self.row_of = {int(r): i for i, r in enumerate(self.recipe_ids)}
+        self.col_of = {int(c): j for j, c in enumerate(self.ingredient_ids)}
+        self.costs = dict(costs)
+
+        # cost class of every column, and required counts per recipe
+        # and cost class (n_rows x 4)
+        self.col_cost = np.array([_COST_RANK.get(self.costs.get(int(c))) or 0 for c in self.ingredient_ids],
+                                 dtype=np.int64)
+        self.required_by_cost = np.bincount(rows * len(COST_CLASSES) + self.col_cost[cols],
+                                            minlength=n_rows * len(COST_CLASSES)
+                                            ).reshape(n_rows, len(COST_CLASSES)).astype(np.int32)
+        self.required = self.required_by_cost.sum(axis=1)
+
+        # CSC: column j's recipes are col_rows[col_ptr[j]:col_ptr[j + 1]]
+        order = np.lexsort((rows, cols))
+        self.col_rows = rows[order].astype(np.int32)
+        self.col_ptr = np.zeros(n_cols + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cols, minlength=n_cols), out=self.col_ptr[1:])
+
+        # CSR, to list a returned recipe's missing ingredients
+        order = np.lexsort((cols, rows))
+        self.row_cols = cols[order].astype(np.int32)
+        self.row_ptr = np.zeros(n_rows + 1, dtype=np.int64)
+        np.cumsum(self.required, out=self.row_ptr[1:])
+
+        # row * n_cols + col for every entry, in CSR (so sorted) order
+        self.keys = np.repeat(np.arange(n_rows, dtype=np.int64), self.required) * n_cols + self.row_cols
+
+        self.alive = np.ones(n_rows, dtype=bool)
+
+    # rows and columns of the (recipeId, ingredientId) pairs that are
+    # in the matrix, with the positions of those pairs in the input
+    def locate(self, recipe_ids, ingredient_ids):
+        if not len(self.keys) or not len(recipe_ids):
+            return _EMPTY, _EMPTY, _EMPTY
+        rows = np.searchsorted(self.recipe_ids, recipe_ids)
+        cols = np.searchsorted(self.ingredient_ids, ingredient_ids)
+        rows, cols = np.minimum(rows, len(self.recipe_ids) - 1), np.minimum(cols, len(self.ingredient_ids) - 1)
+        known = (self.recipe_ids[rows] == recipe_ids) & (self.ingredient_ids[cols] == ingredient_ids)
+        keys = rows * len(self.ingredient_ids) + cols
+        at = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+        found = np.flatnonzero(known & (self.keys[at] == keys))
+        return rows[found], cols[found], found
+
+    def row_ingredients(self, row):
+        return self.ingredient_ids[self.row_cols[self.row_ptr[row]:self.row_ptr[row + 1]]].tolist()
+
+    # present counts per recipe and cost class for a pantry
+    def present_by_cost(self, pantry):
+        cols = np.array([self.col_of[i] for i in pantry if i in self.col_of], dtype=np.int64)
+        n = len(self.recipe_ids) * len(COST_CLASSES)
+        if not len(cols):
+            return np.zeros((len(self.recipe_ids), len(COST_CLASSES)), dtype=np.int64)
+        starts, lengths = self.col_ptr[cols], self.col_ptr[cols + 1] - self.col_ptr[cols]
+        offsets = np.repeat(starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+        positions = np.arange(lengths.sum()) + offsets
+        keys = self.col_rows[positions].astype(np.int64) * len(COST_CLASSES) + np.repeat(self.col_cost[cols], lengths)
+        return np.bincount(keys, minlength=n).reshape(-1, len(COST_CLASSES))
+
+
+class PantryMatcher(object):
+    def __init__(self, max_age=600):
+        self.max_age = max_age
+        self._lock = threading.RLock()
+        self._rebuilding = threading.Lock()
+        self._packed = None
+        self._overlay = {}       # recipeId -> frozenset of ingredientIds
+        # (recipeId, ingredientIds) for every update made while a
+        # rebuild runs, replayed onto the new arrays before the swap
+        self._pending = None
+        self._stale = False
+        self.built_at = None
+
+    @property
+    def ready(self):
+        return (self.built_at is not None and not self._stale
+                and time.monotonic() - self.built_at < self.max_age)
+
+    def stats(self):
+        packed = self._packed
+        return {
+            'recipes': int(packed.alive.sum()) + len(self._overlay) if packed is not None else 0,
+            'ingredients': len(packed.ingredient_ids) if packed is not None else 0,
+            'nnz': len(packed.col_rows) if packed is not None else 0,
+            'overlay': len(self._overlay),
+        }
+
+    #------------------------------------------------------------
+    # Building and incremental updates
+
+    # Swaps in arrays for the given pairs. Updates recorded since
+    # build() started reading them are replayed onto the new arrays
+    # under the same lock as the swap (see similar.py).
+    def build_from_pairs(self, recipe_ids, ingredient_ids, costs):
+        packed = _Packed(recipe_ids, ingredient_ids, costs)
+        with self._lock:
+            self._packed = packed
+            self._overlay = {}
+            self._stale = False
+            self.built_at = time.monotonic()
+            for recipe_id, recipe_ingredient_ids in self._pending or ():
+                self._apply(recipe_id, recipe_ingredient_ids)
+            self._pending = None
+
+    def build(self, cursor):
+        with self._lock:
+            self._pending = []
+        try:
+            cursor.execute(PAIRS_QUERY)
+            pairs = cursor.fetchall()
+            cursor.execute(COSTS_QUERY)
+            costs = {row['ingredientId']: row['cost'] for row in cursor.fetchall()}
+            self.build_from_pairs([p['recipeId'] for p in pairs], [p['ingredientId'] for p in pairs], costs)
+        except Exception:
+            with self._lock:
+                self._pending = None
+            raise
+
+    def ensure_built(self, cursor):
+        if self.ready:
+            return
+        acquired = self._rebuilding.acquire(blocking=self.built_at is None)
+        if not acquired:
+            return
+        try:
+            if not self.ready:
+                self.build(cursor)
+        finally:
+            self._rebuilding.release()
+
+    def invalidate(self):
+        self._stale = True
+
+    # re-reads one recipe's ingredients after it was added or changed
+    def refresh_recipe(self, cursor, recipe_id):
+        if self._packed is None and self._pending is None:
+            return
+        cursor.execute('SELECT ingredientId FROM recipeIngredients WHERE recipeId = %s;', (recipe_id,))
+        ingredient_ids = frozenset(row['ingredientId'] for row in cursor.fetchall())
+        with self._lock:
+            self._record(int(recipe_id), ingredient_ids)
+
+    def remove_recipe(self, recipe_id):
+        with self._lock:
+            self._record(int(recipe_id), frozenset())
+
+    def _record(self, recipe_id, ingredient_ids):
+        self._apply(recipe_id, ingredient_ids)
+        if self._pending is not None:
+            self._pending.append((recipe_id, ingredient_ids))
+
+    def _apply(self, recipe_id, ingredient_ids):
+        if self._packed is None:
+            return
+        self._remove(recipe_id)
+        if ingredient_ids:
+            self._overlay[recipe_id] = ingredient_ids
+        limit = max(OVERLAY_REBUILD_MIN, OVERLAY_REBUILD_RATIO * len(self._packed.recipe_ids))
+        if len(self._overlay) > limit:
+            self._stale = True
+
+    def _remove(self, recipe_id):
+        self._overlay.pop(recipe_id, None)
+        row = self._packed.row_of.get(recipe_id)
+        if row is not None:
+            self._packed.alive[row] = False
+
+    #------------------------------------------------------------
+    # Querying
+
+    # Ranks recipes by how much of them `pantry` (ingredient ids)
+    # covers: highest coverage first, then fewest missing, then
+    # fewest substitutions, then cheapest missing cost class. Only
+    # recipes with at least min_coverage and at most max_missing
+    # missing are returned. With a SubstitutionGraph in
+    # `substitutions`, an ingredient the pantry can stand in for
+    # counts as covered. Each result is a dict with recipeId,
+    # coverage, required, present, substituted, missing, missingCost,
+    # missingIngredients and substitutions.
+    def match(self, pantry, limit=20, min_coverage=0.0, max_missing=None, substitutions=None):
+        pantry = frozenset(int(i) for i in pantry)
+        with self._lock:
+            packed = self._packed
+            if packed is None:
+                return []
+            overlay = dict(self._overlay)
+            alive = packed.alive.copy()
+
+        have_by_cost = packed.present_by_cost(pantry)
+        present = have_by_cost.sum(axis=1)
+        substituted = np.zeros(len(packed.recipe_ids), dtype=np.int64)
+        covered, local = {}, _NO_LOCAL
+        if substitutions is not None:
+            covered = substitutions.covered(pantry)
+            local = substitutions.recipe_covered(pantry)
+            sub_by_cost = packed.present_by_cost(covered)
+            # replacements that hold only in particular recipes count
+            # where the recipe needs the original
+            sub_rows, sub_cols, found = packed.locate(local[0], local[1])
+            extra = ~np.isin(local[1][found], np.fromiter(covered, dtype=np.int64, count=len(covered)))
+            sub_by_cost += np.bincount(sub_rows[extra] * len(COST_CLASSES) + packed.col_cost[sub_cols[extra]],
+                                       minlength=sub_by_cost.size).reshape(sub_by_cost.shape)
+            substituted = sub_by_cost.sum(axis=1)
+            have_by_cost = have_by_cost + sub_by_cost
+        have = present + substituted
+        coverage = have / np.maximum(packed.required, 1)
+
+        keep = alive & (have > 0) & (coverage >= min_coverage)
+        if max_missing is not None:
+            keep &= packed.required - have <= max_missing
+        rows = np.flatnonzero(keep)
+
+        # only rows that can reach the top `limit` on coverage need
+        # the full sort; ties with the cut-off are kept
+        if len(rows) > limit:
+            cutoff = np.partition(coverage[rows], len(rows) - limit)[len(rows) - limit]
+            rows = rows[coverage[rows] >= cutoff]
+        missing_by_cost = packed.required_by_cost[rows] - have_by_cost[rows]
+        missing = missing_by_cost.sum(axis=1)
+        missing_cost = np.where(missing_by_cost > 0, np.arange(len(COST_CLASSES)), 0).max(axis=1)
+
+        # many recipes can tie at the cut-off, so put them in final
+        # order with one lexsort (last key first) and keep `limit`
+        order = np.lexsort((packed.recipe_ids[rows], missing_cost, substituted[rows], missing, -coverage[rows]))[:limit]
+        candidates = [(float(coverage[rows[i]]), int(missing[i]), int(substituted[rows[i]]), int(missing_cost[i]),
+                       int(packed.recipe_ids[rows[i]]), rows[i]) for i in order]
+
+        # recipes added since the last build are scored directly
+        local_overlay = _local_map(local, overlay)
+        for recipe_id, required in overlay.items():
+            swaps = _swaps(sorted(required), pantry, covered, local_overlay.get(recipe_id, {}))
+            have = len(required & pantry) + len(swaps)
+            ratio = have / len(required)
+            lacking = len(required) - have
+            if have and ratio >= min_coverage and (max_missing is None or lacking <= max_missing):
+                cost = max((_COST_RANK.get(packed.costs.get(i)) or 0 for i in required - pantry if i not in swaps),
+                           default=0)
+                candidates.append((ratio, lacking, len(swaps), cost, recipe_id, required))
+
+        candidates.sort(key=lambda c: (-c[0], c[1], c[2], c[3], c[4]))
+        candidates = candidates[:limit]
+        local_top = _local_map(local, [c[4] for c in candidates])
+        results = []
+        for ratio, lacking, n_swaps, cost, recipe_id, source in candidates:
+            required = packed.row_ingredients(source) if not isinstance(source, frozenset) else sorted(source)
+            swaps = _swaps(required, pantry, covered, local_top.get(recipe_id, {}))
+            results.append({
+                'recipeId': recipe_id,
+                'coverage': round(ratio, 4),
+                'required': len(required),
+                'present': len(required) - lacking - len(swaps),
+                'substituted': len(swaps),
+                'missing': lacking,
+                'missingCost': COST_CLASSES[cost],
+                'missingIngredients': [i for i in required if i not in pantry and i not in swaps],
+                'substitutions': [{'ingredientId': i, 'substituteId': sub, 'depth': depth}
+                                  for i, (sub, depth) in swaps.items()],
+            })
+        return results
+
+
+_EMPTY = np.zeros(0, dtype=np.int64)
+_NO_LOCAL = (_EMPTY, _EMPTY, _EMPTY, _EMPTY)
+
+
+# {recipeId: {original: (sub, depth)}} from recipe_covered() arrays,
+# for just the given recipes
+def _local_map(local, recipe_ids):
+    recipes, originals, subs, depths = local
+    found = {}
+    if not len(recipes) or not recipe_ids:
+        return found
+    for i in np.flatnonzero(np.isin(recipes, np.fromiter(recipe_ids, dtype=np.int64))):
+        found.setdefault(int(recipes[i]), {})[int(originals[i])] = (int(subs[i]), int(depths[i]))
+    return found
+
+
+# {original: (sub, depth)} for the required ingredients missing from
+# the pantry that a substitute covers, nearest substitute first
+def _swaps(required, pantry, covered, local):
+    swaps = {}
+    for i in required:
+        if i in pantry:
+            continue
+        options = [option for option in (covered.get(i), local.get(i)) if option is not None]
+        if options:
+            swaps[i] = min(options, key=lambda option: option[1])
+    return swaps
+
+
+pantry_matcher = PantryMatcher()
+
+
+#------------------------------------------------------------
+# Times pantry queries on a synthetic catalog (see
+# backend/recipes/similar.py benchmark for the data shape): each
+# query is a pantry of pantry_size ingredients drawn by popularity.
+# With substitution_edges, queries also follow a synthetic
+# substitution graph of that many rows.
+def benchmark(n_recipes=100000, n_ingredients=2000, per_recipe=9, pantry_size=30, queries=200, limit=20,
+              substitution_edges=0, seed=0):
+    rng = np.random.default_rng(seed)
+    popularity = 1.0 / np.arange(1, n_ingredients + 1)
+    popularity /= popularity.sum()
+    recipe_ids = np.repeat(np.arange(1, n_recipes + 1), per_recipe)
+    ingredient_ids = rng.choice(n_ingredients, n_recipes * per_recipe, p=popularity) + 1
+    costs = {i: COST_CLASSES[c] for i, c in zip(range(1, n_ingredients + 1), rng.integers(0, len(COST_CLASSES), n_ingredients))}
+
+    matcher = PantryMatcher()
+    started = time.perf_counter()
+    matcher.build_from_pairs(recipe_ids, ingredient_ids, costs)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    graph = None
+    if substitution_edges:
+        graph = SubstitutionGraph(min_recipes=2)
+        graph.build_from_rows(synthetic_rows(n_ingredients, substitution_edges, n_recipes, rng))
+
+    latencies = []
+    for _ in range(queries):
+        pantry = rng.choice(n_ingredients, pantry_size, replace=False, p=popularity) + 1
+        started = time.perf_counter()
+        matcher.match(pantry.tolist(), limit, substitutions=graph)
+        latencies.append((time.perf_counter() - started) * 1000)
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return dict(matcher.stats(), build_ms=build_ms, queries=queries, pantry_size=pantry_size,
+                p50_ms=float(p50), p95_ms=float(p95), p99_ms=float(p99), max_ms=float(max(latencies)))
@@ -0,0 +1,156 @@
+from flask import Blueprint, request, jsonify, make_response
+import click
+from backend.db_connection import db
+from backend.pantry.matcher import pantry_matcher, benchmark as pantry_benchmark
+from backend.ingredients.substitutions import substitution_graph
+from backend.pantry.shopping import fetch_rows, build_list
+
+# ------------------------------------------------------------
+# Create a new Blueprint object for pantry matching
+pantry = Blueprint('pantry', __name__)
+
+MAX_MATCHES = 100
+MAX_PANTRY_SIZE = 1000
+MAX_SHOPPING_RECIPES = 200
+
+MATCHED_RECIPES_QUERY = '''
+        SELECT r.recipeId, r.title, r.description, r.difficulty, r.calories, r.chefId, r.datePosted, r.prepTime, r.servings, u.username as chefName
+        FROM recipes r JOIN users u ON r.chefId = u.userId
+        WHERE r.recipeId IN ({placeholders});
+    '''
+MISSING_INGREDIENTS_QUERY = '''
+            SELECT ingredientId, name, cost
+            FROM ingredients
+            WHERE ingredientId IN ({placeholders});
+        '''
+
+# ------------------------------------------------------------
+# "What can I cook?": ranks every recipe by how much of it the
+# user's pantry covers, e.g.
+#   POST /pantry/match
+#   {"ingredients": [3, 7, 12], "limit": 20, "minCoverage": 0.5, "maxMissing": 3}
+# Returns the best `limit` recipes (default 20), each with its
+# coverage (fraction of its ingredients in the pantry), required,
+# present and missing counts, missingCost (the priciest cost class
+# among the missing ingredients, null if none is known) and the
+# missing ingredients themselves.
+# Unless "substitutes" is false, an ingredient that something in
+# the pantry can stand in for (see backend/ingredients/
+# substitutions.py) counts as covered; those are listed under
+# "substitutions" as {ingredientId, substituteId, depth}.
+@pantry.route('/pantry/match', methods=['POST'])
+def match_pantry():
+    data = request.get_json(silent=True) or {}
+    try:
+        ingredient_ids = [int(i) for i in data.get('ingredients') or []]
+        limit = max(1, min(int(data.get('limit', 20)), MAX_MATCHES))
+        min_coverage = float(data.get('minCoverage', 0))
+        max_missing = data.get('maxMissing')
+        max_missing = int(max_missing) if max_missing is not None else None
+        use_substitutes = bool(data.get('substitutes', True))
+    except (TypeError, ValueError):
+        return make_response({'error': 'ingredients must be ingredient ids; limit, minCoverage and maxMissing numbers'}, 400)
+    if not ingredient_ids:
+        return make_response({'error': 'ingredients is required'}, 400)
+    if len(ingredient_ids) > MAX_PANTRY_SIZE:
+        return make_response({'error': f'at most {MAX_PANTRY_SIZE} ingredients per pantry'}, 400)
+
+    cursor = db.get_db().cursor()
+    pantry_matcher.ensure_built(cursor)
+    graph = None
+    if use_substitutes:
+        substitution_graph.ensure_built(cursor)
+        graph = substitution_graph
+    matches = pantry_matcher.match(ingredient_ids, limit, min_coverage, max_missing, graph)
+    if not matches:
+        return make_response(jsonify([]), 200)
+
+    ids = [match['recipeId'] for match in matches]
+    placeholders = ', '.join(['%s'] * len(ids))
+    cursor.execute(MATCHED_RECIPES_QUERY.format(placeholders=placeholders), ids)
+    rows = {row['recipeId']: row for row in cursor.fetchall()}
+
+    # names and costs of every missing or substituted ingredient in one query
+    missing_ids = sorted({i for match in matches for i in match['missingIngredients']}
+                         | {i for match in matches for swap in match['substitutions']
+                            for i in (swap['ingredientId'], swap['substituteId'])})
+    names = {}
+    if missing_ids:
+        placeholders = ', '.join(['%s'] * len(missing_ids))
+        cursor.execute(MISSING_INGREDIENTS_QUERY.format(placeholders=placeholders), missing_ids)
+        names = {row['ingredientId']: row for row in cursor.fetchall()}
+
+    theData = []
+    for match in matches:
+        if match['recipeId'] not in rows:
+            continue
+        row = rows[match['recipeId']]
+        row.update(match)
+        row['missingIngredients'] = [names[i] for i in match['missingIngredients'] if i in names]
+        for swap in row['substitutions']:
+            swap['name'] = names.get(swap['ingredientId'], {}).get('name')
+            swap['substituteName'] = names.get(swap['substituteId'], {}).get('name')
+        theData.append(row)
+
+    response = make_response(jsonify(theData))
+    response.status_code = 200
+    return response
+
+# ------------------------------------------------------------
+# Aggregated shopping list for several recipes, e.g.
+#   POST /shopping-list
+#   {"recipes": [{"recipeId": 1, "servings": 4}, {"recipeId": 7}],
+#    "pantry": [3, 12]}
+# or, with the same target servings for every recipe,
+#   {"recipeIds": [1, 7, 9], "servings": 2}
+# Each recipe is scaled to its target servings (as written when
+# none is given), units are converted to g / ml / pc where possible
+# and quantities are summed per ingredient. Ingredients listed in
+# "pantry" are left off. See backend/pantry/shopping.py for the
+# response layout.
+@pantry.route('/shopping-list', methods=['POST'])
+def shopping_list():
+    data = request.get_json(silent=True) or {}
+    try:
+        if 'recipes' in data:
+            plan = [(int(entry['recipeId']), float(entry['servings']) if entry.get('servings') is not None else None)
+                    for entry in data['recipes']]
+        else:
+            servings = float(data['servings']) if data.get('servings') is not None else None
+            plan = [(int(recipe_id), servings) for recipe_id in data.get('recipeIds') or []]
+        pantry_ids = [int(i) for i in data.get('pantry') or []]
+    except (KeyError, TypeError, ValueError):
+        return make_response({'error': 'recipes must be objects with a recipeId and optional servings'}, 400)
+    if not plan:
+        return make_response({'error': 'recipes or recipeIds is required'}, 400)
+    if len(plan) > MAX_SHOPPING_RECIPES:
+        return make_response({'error': f'at most {MAX_SHOPPING_RECIPES} recipes per list'}, 400)
+    if any(servings is not None and servings <= 0 for _, servings in plan):
+        return make_response({'error': 'servings must be positive'}, 400)
+
+    cursor = db.get_db().cursor()
+    rows = fetch_rows(cursor, sorted({recipe_id for recipe_id, _ in plan}))
+    theData = build_list(rows, plan, pantry_ids)
+
+    response = make_response(jsonify(theData))
+    response.status_code = 200
+    return response
+
+# ------------------------------------------------------------
+# Times /pantry/match queries on a synthetic catalog:
+#   flask --app backend_app pantry bench-match --recipes 100000
+@pantry.cli.command('bench-match')
+@click.option('--recipes', 'n_recipes', default=100000, show_default=True)
+@click.option('--ingredients', 'n_ingredients', default=2000, show_default=True)
+@click.option('--per-recipe', default=9, show_default=True, help='ingredients per recipe')
+@click.option('--pantry-size', default=30, show_default=True)
+@click.option('--queries', default=200, show_default=True)
+@click.option('--limit', default=20, show_default=True)
+@click.option('--substitution-edges', default=0, show_default=True,
+              help='also follow a synthetic substitution graph with this many rows')
+def bench_match_command(n_recipes, n_ingredients, per_recipe, pantry_size, queries, limit, substitution_edges):
+    result = pantry_benchmark(n_recipes, n_ingredients, per_recipe, pantry_size, queries, limit, substitution_edges)
+    click.echo(f"{result['recipes']} recipes, {result['ingredients']} ingredients, {result['nnz']} entries; "
+               f"built in {result['build_ms']:.0f} ms")
+    click.echo(f"{result['queries']} pantries of {pantry_size}: p50 {result['p50_ms']:.2f} ms, "
+               f"p95 {result['p95_ms']:.2f} ms, p99 {result['p99_ms']:.2f} ms, max {result['max_ms']:.2f} ms")
@@ -0,0 +1,122 @@
+#------------------------------------------------------------
+# Shopping list for a set of recipes (e.g. a week's meal plan).
+#
+# All the recipes' ingredient rows come back from one query and are
+# turned into columns. Each recipe gets a scale factor (target
+# servings / its own servings), every unit is mapped to a canonical
+# one (backend/utils/units.py), and the scaled, converted amounts
+# are summed per (ingredient, canonical unit) with np.bincount. An
+# ingredient measured both by weight and by volume keeps one amount
+# of each, since converting between the two would need its density.
+#------------------------------------------------------------
+from collections import defaultdict
+
+import numpy as np
+
+from backend.utils.units import normalize_units, display_amount
+
+COST_CLASSES = ('CHEAP', 'MODERATE', 'EXPENSIVE')
+
+ROWS_QUERY = '''
+        SELECT ri.recipeId, r.title, r.servings AS recipeServings, ri.ingredientId, i.name, i.cost, ri.quantity, ri.unit
+        FROM recipeIngredients ri
+        JOIN recipes r ON r.recipeId = ri.recipeId
+        JOIN ingredients i ON i.ingredientId = ri.ingredientId
+        WHERE ri.recipeId IN ({placeholders});
+    '''
+
+
+def fetch_rows(cursor, recipe_ids):
+    placeholders = ', '.join(['%s'] * len(recipe_ids))
+    cursor.execute(ROWS_QUERY.format(placeholders=placeholders), list(recipe_ids))
+    return cursor.fetchall()
+
+
+#------------------------------------------------------------
+# Builds the list. `plan` is a list of (recipeId, servings) pairs;
+# servings None means the recipe as written, and a recipe listed
+# twice is cooked twice. Ingredients in `pantry` (ids) are left off
+# the list and counted under "inPantry". Returns
+#   {"items": [{ingredientId, name, cost, amounts: [{quantity, unit}],
+#               recipeIds}],
+#    "recipes": [{recipeId, title, servings, scale}],
+#    "costSummary": {CHEAP, MODERATE, EXPENSIVE, unknown},
+#    "inPantry": n, "missingRecipes": [...], "unscaledRecipes": [...]}
+# where missingRecipes are the planned ids with no ingredient rows
+# (unknown recipes, or ones without ingredients) and unscaledRecipes
+# the ones asked for by servings that don't say how many they serve;
+# those are listed as written, once per plan entry.
+def build_list(rows, plan, pantry=()):
+    servings_given = defaultdict(float)
+    times_given = defaultdict(int)
+    as_written = defaultdict(int)
+    for recipe_id, servings in plan:
+        if servings is None:
+            as_written[recipe_id] += 1
+        else:
+            servings_given[recipe_id] += servings
+            times_given[recipe_id] += 1
+    planned = sorted(set(servings_given) | set(as_written))
+
+    n = len(rows)
+    recipe = np.fromiter((row['recipeId'] for row in rows), dtype=np.int64, count=n)
+    base = np.fromiter((row['recipeServings'] or 0 for row in rows), dtype=np.float64, count=n)
+    ingredient = np.fromiter((row['ingredientId'] for row in rows), dtype=np.int64, count=n)
+    quantity = np.fromiter((row['quantity'] or 0 for row in rows), dtype=np.float64, count=n)
+    canonical, factor = normalize_units([row['unit'] for row in rows])
+
+    # scale per row from its recipe's plan entries; without a base
+    # servings count there is nothing to scale by
+    given = np.fromiter((servings_given.get(r, 0.0) for r in planned), dtype=np.float64, count=len(planned))
+    given_times = np.fromiter((times_given.get(r, 0) for r in planned), dtype=np.float64, count=len(planned))
+    written = np.fromiter((as_written.get(r, 0) for r in planned), dtype=np.float64, count=len(planned))
+    at = np.searchsorted(np.array(planned, dtype=np.int64), recipe)
+    scale = np.where(base > 0, given[at] / np.where(base > 0, base, 1), given_times[at]) + written[at]
+    unscaled = set(recipe[(base <= 0) & (given_times[at] > 0)].tolist())
+    amount = quantity * scale * factor
+
+    recipes_out = {}
+    for i in np.unique(recipe, return_index=True)[1]:
+        row = rows[i]
+        recipes_out[row['recipeId']] = {'recipeId': row['recipeId'], 'title': row['title'],
+                                        'servings': row['recipeServings'], 'scale': round(float(scale[i]), 4)}
+
+    # leave out what the pantry already has
+    have = np.isin(ingredient, np.fromiter(pantry, dtype=np.int64))
+    in_pantry = len(np.unique(ingredient[have]))
+    keep = ~have
+    ingredient, canonical, amount, recipe, kept_rows = (ingredient[keep], canonical[keep], amount[keep],
+                                                        recipe[keep], np.flatnonzero(keep))
+
+    # sum per (ingredient, canonical unit)
+    units, unit_code = np.unique(canonical.astype(str), return_inverse=True)
+    keys, line = np.unique(ingredient * len(units) + unit_code, return_inverse=True)
+    totals = np.bincount(line, weights=amount, minlength=len(keys))
+    first = np.unique(line, return_index=True)[1]
+
+    items = {}
+    for k, i in enumerate(first):
+        row = rows[kept_rows[i]]
+        item = items.setdefault(row['ingredientId'], {
+            'ingredientId': row['ingredientId'], 'name': row['name'], 'cost': row['cost'],
+            'amounts': [], 'recipeIds': set(),
+        })
+        shown, unit = display_amount(float(totals[k]), units[unit_code[i]])
+        item['amounts'].append({'quantity': round(shown, 2), 'unit': unit})
+    for ingredient_id, recipe_id in set(zip(ingredient.tolist(), recipe.tolist())):
+        items[ingredient_id]['recipeIds'].add(recipe_id)
+
+    items = sorted(items.values(), key=lambda item: item['name'].lower())
+    cost_summary = {cost: 0 for cost in COST_CLASSES + ('unknown',)}
+    for item in items:
+        item['recipeIds'] = sorted(item['recipeIds'])
+        cost_summary[item['cost'] or 'unknown'] += 1
+
+    return {
+        'items': items,
+        'recipes': [recipes_out[r] for r in planned if r in recipes_out],
+        'costSummary': cost_summary,
+        'inPantry': in_pantry,
+        'missingRecipes': [r for r in planned if r not in recipes_out],
+        'unscaledRecipes': [r for r in planned if r in unscaled],
+    }
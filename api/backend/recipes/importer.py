@@ -0,0 +1,274 @@
+#------------------------------------------------------------
+# Bulk recipe import from NDJSON, one recipe per line:
+#
+#   {"chefId": 3, "title": "Shakshuka", "description": "...",
+#    "instructions": "...", "prepTime": 25, "servings": 2,
+#    "difficulty": "EASY", "calories": 420,
+#    "ingredients": [{"name": "Tomato", "quantity": 4, "unit": "whole"}],
+#    "categories": ["Breakfast", {"name": "Vegetarian", "description": "..."}]}
+#
+# Lines are read lazily and written in batches, one transaction
+# per batch: the batch's ingredient names are resolved with one
+# IN query (missing ones created with one multi-row INSERT), the
+# recipes go in with one multi-row INSERT and their ingredients and
+# categories with executemany, and the report rollups are updated
+# for the whole batch at once. If anything in a batch fails it is
+# rolled back and retried one recipe per transaction, so a bad
+# line only costs that line and the run carries on.
+#------------------------------------------------------------
+import json
+import time
+
+from backend.ingredients.resolve import name_key, ingredients_by_name, create_ingredients
+from backend.recipes.rollups import add_recipes
+
+IMPORT_BATCH_SIZE = 500
+MAX_REPORTED_FAILURES = 1000
+DIFFICULTIES = ('EASY', 'MEDIUM', 'HARD')
+
+_RECIPE_COLUMNS = ('chefId', 'title', 'description', 'instructions', 'prepTime', 'servings', 'difficulty', 'calories')
+
+
+class ImportRowError(ValueError):
+    pass
+
+
+#------------------------------------------------------------
+# Parsing and validation
+
+def _number(record, field, cast, required=True):
+    value = record.get(field)
+    if value is None or value == '':
+        if required:
+            raise ImportRowError(f'{field} is required')
+        return None
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        raise ImportRowError(f'{field} must be a number')
+
+
+def _text(record, field, max_length=None, required=True):
+    value = record.get(field)
+    if value is None or (isinstance(value, str) and not value.strip()):
+        if required:
+            raise ImportRowError(f'{field} is required')
+        return None
+    if not isinstance(value, str):
+        raise ImportRowError(f'{field} must be a string')
+    if max_length and len(value) > max_length:
+        raise ImportRowError(f'{field} is longer than {max_length} characters')
+    return value
+
+
+# turns one NDJSON line into a normalized recipe dict
+def parse_line(line):
+    if isinstance(line, bytes):
+        line = line.decode('utf-8')
+    try:
+        record = json.loads(line)
+    except ValueError as e:
+        raise ImportRowError(f'invalid JSON: {e}')
+    if not isinstance(record, dict):
+        raise ImportRowError('each line must be a JSON object')
+
+    recipe = {
+        'chefId': _number(record, 'chefId', int),
+        'title': _text(record, 'title', 50),
+        'description': _text(record, 'description'),
+        'instructions': _text(record, 'instructions', required=False),
+        'prepTime': _number(record, 'prepTime', int),
+        'servings': _number(record, 'servings', float),
+        'difficulty': _text(record, 'difficulty', required=False),
+        'calories': _number(record, 'calories', int, required=False),
+    }
+    if recipe['difficulty'] is not None:
+        recipe['difficulty'] = recipe['difficulty'].upper()
+        if recipe['difficulty'] not in DIFFICULTIES:
+            raise ImportRowError(f'difficulty must be one of {", ".join(DIFFICULTIES)}')
+
+    # recipeIngredients is keyed on (recipeId, ingredientId), so a
+    # repeated ingredient keeps its last quantity and unit
+    ingredients = {}
+    for item in record.get('ingredients') or []:
+        if not isinstance(item, dict):
+            raise ImportRowError('ingredients must be objects with name, quantity and unit')
+        name = _text(item, 'name', 50)
+        ingredients[name_key(name)] = {
+            'name': name.strip(),
+            'quantity': _number(item, 'quantity', float),
+            'unit': _text(item, 'unit', 255),
+        }
+    recipe['ingredients'] = list(ingredients.values())
+
+    categories = []
+    for item in record.get('categories') or []:
+        if isinstance(item, str):
+            item = {'name': item}
+        if not isinstance(item, dict):
+            raise ImportRowError('categories must be names or objects with a name')
+        categories.append((_text(item, 'name', 50), _text(item, 'description', required=False)))
+    recipe['categories'] = categories
+    return recipe
+
+
+#------------------------------------------------------------
+# Writing
+
+# resolves every ingredient name used by the batch in one query,
+# creating the missing ones if allowed; returns key -> ingredientId
+def _resolve(cursor, recipes, create):
+    names = {}
+    for recipe in recipes:
+        for item in recipe['ingredients']:
+            names.setdefault(name_key(item['name']), item['name'])
+    found = ingredients_by_name(cursor, list(names.values()))
+    missing = [names[key] for key in names if key not in found]
+    created = {}
+    if missing and create:
+        created = create_ingredients(cursor, missing)
+        found.update(created)
+    return {key: row['ingredientId'] for key, row in found.items()}, created
+
+
+# inserts all recipes with one multi-row INSERT and returns their ids
+def _insert_recipes(cursor, recipes):
+    row = '(' + ', '.join(['%s'] * len(_RECIPE_COLUMNS)) + ')'
+    args = [recipe[column] for recipe in recipes for column in _RECIPE_COLUMNS]
+    cursor.execute(f'''
+        INSERT INTO recipes ({', '.join(_RECIPE_COLUMNS)})
+        VALUES {', '.join([row] * len(recipes))};
+    ''', args)
+
+    # InnoDB hands one multi-row INSERT a consecutive block of ids
+    # starting at lastrowid; check it instead of trusting it, since
+    # that depends on innodb_autoinc_lock_mode
+    first = cursor.lastrowid
+    ids = list(range(first, first + len(recipes)))
+    if len(recipes) > 1:
+        cursor.execute('''
+            SELECT recipeId, title FROM recipes
+            WHERE recipeId BETWEEN %s AND %s ORDER BY recipeId;
+        ''', (ids[0], ids[-1]))
+        titles = [r['title'] for r in cursor.fetchall()]
+        if titles != [recipe['title'] for recipe in recipes]:
+            raise RuntimeError('recipe ids were not allocated consecutively')
+    return ids
+
+
+def _write(cursor, recipes, create):
+    ingredient_ids, created = _resolve(cursor, recipes, create)
+    recipe_ids = _insert_recipes(cursor, recipes)
+
+    ingredient_rows = []
+    category_rows = []
+    for recipe_id, recipe in zip(recipe_ids, recipes):
+        for item in recipe['ingredients']:
+            ingredient_id = ingredient_ids.get(name_key(item['name']))
+            if ingredient_id is None:
+                raise ImportRowError(f'unknown ingredient {item["name"]!r}')
+            ingredient_rows.append((recipe_id, ingredient_id, item['quantity'], item['unit']))
+        for name, description in recipe['categories']:
+            category_rows.append((recipe_id, name, description))
+
+    if ingredient_rows:
+        cursor.executemany('''
+            INSERT INTO recipeIngredients (recipeId, ingredientId, quantity, unit)
+            VALUES (%s, %s, %s, %s)
+        ''', ingredient_rows)
+    if category_rows:
+        cursor.executemany('''
+            INSERT INTO categories (recipeId, categoryName, description)
+            VALUES (%s, %s, %s)
+        ''', category_rows)
+    add_recipes(cursor, recipe_ids)
+    return recipe_ids, created
+
+
+#------------------------------------------------------------
+# Writes one batch of (line number, recipe) pairs. Returns the new
+# recipe ids, the newly created ingredient rows and the failures.
+def import_batch(conn, batch, create_ingredients=True):
+    cursor = conn.cursor()
+    try:
+        recipe_ids, created = _write(cursor, [recipe for _, recipe in batch], create_ingredients)
+        conn.commit()
+        return recipe_ids, list(created.values()), []
+    except Exception:
+        conn.rollback()
+        if len(batch) == 1:
+            raise
+
+    # something in the batch is bad: redo it a recipe at a time
+    recipe_ids, created, failures = [], [], []
+    for line_no, recipe in batch:
+        try:
+            ids, rows, _ = import_batch(conn, [(line_no, recipe)], create_ingredients)
+            recipe_ids += ids
+            created += rows
+        except Exception as e:
+            failures.append({'line': line_no, 'error': str(e)})
+    return recipe_ids, created, failures
+
+
+#------------------------------------------------------------
+# Imports every line from `lines` (an iterable of str or bytes)
+# in batches of batch_size and yields one report per batch:
+#   {"batch", "rows", "imported", "failed", "seconds", "rowsPerSecond",
+#    "recipeIds", "createdIngredients", "failures": [{"line", "error"}]}
+def import_recipes(conn, lines, batch_size=IMPORT_BATCH_SIZE, create_ingredients=True):
+    batch = []
+    invalid = []
+    number = 0
+    batch_no = 0
+    started = time.monotonic()
+
+    def flush():
+        recipe_ids, created, failures = import_batch(conn, batch, create_ingredients) if batch else ([], [], [])
+        failures = sorted(invalid + failures, key=lambda f: f['line'])
+        seconds = time.monotonic() - started
+        rows = len(batch) + len(invalid)
+        return {
+            'batch': batch_no,
+            'rows': rows,
+            'imported': len(recipe_ids),
+            'failed': len(failures),
+            'seconds': round(seconds, 3),
+            'rowsPerSecond': round(rows / seconds, 1) if seconds else None,
+            'recipeIds': recipe_ids,
+            'createdIngredients': created,
+            'failures': failures,
+        }
+
+    for line_no, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            batch.append((line_no, parse_line(line)))
+        except ImportRowError as e:
+            invalid.append({'line': line_no, 'error': str(e)})
+
+        number += 1
+        if number == batch_size:
+            batch_no += 1
+            yield flush()
+            batch, invalid, number = [], [], 0
+            started = time.monotonic()
+
+    if number:
+        batch_no += 1
+        yield flush()
+
+
+# folds the per-batch reports into totals for the whole run
+def summarize(reports):
+    summary = {'batches': 0, 'rows': 0, 'imported': 0, 'failed': 0, 'seconds': 0.0, 'failures': []}
+    for report in reports:
+        summary['batches'] += 1
+        for key in ('rows', 'imported', 'failed', 'seconds'):
+            summary[key] += report[key]
+        room = MAX_REPORTED_FAILURES - len(summary['failures'])
+        summary['failures'] += report['failures'][:max(room, 0)]
+    summary['seconds'] = round(summary['seconds'], 3)
+    summary['rowsPerSecond'] = round(summary['rows'] / summary['seconds'], 1) if summary['seconds'] else None
+    return summary
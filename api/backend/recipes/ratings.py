@@ -0,0 +1,121 @@
+#------------------------------------------------------------
+# Helpers for the recipeRatings summary table (count, sum and a
+# 0-5 star histogram per recipe; reviews.rating allows 0, and a 0
+# counts toward the average like any other rating). add_review / delete_review
+# keep it current inside their own transaction, so rating views
+# read one row instead of running AVG() over reviews.
+#------------------------------------------------------------
+
+RATING_BATCH_SIZE = 500
+
+_SUMMARY_SELECT = '''
+    SELECT recipeId, COUNT(rating) AS ratingCount, COALESCE(SUM(rating), 0) AS ratingSum,
+           COALESCE(SUM(rating = 0), 0) AS stars0,
+           COALESCE(SUM(rating = 1), 0) AS stars1, COALESCE(SUM(rating = 2), 0) AS stars2,
+           COALESCE(SUM(rating = 3), 0) AS stars3, COALESCE(SUM(rating = 4), 0) AS stars4,
+           COALESCE(SUM(rating = 5), 0) AS stars5
+    FROM reviews
+'''
+
+RATINGS_QUERY = '''
+            SELECT recipeId, ratingCount, ratingSum, stars0, stars1, stars2, stars3, stars4, stars5
+            FROM recipeRatings
+            WHERE recipeId IN ({placeholders});
+        '''
+
+
+def _stars(rating):
+    # one-hot histogram bucket for a single rating
+    return [1 if int(rating) == n else 0 for n in range(0, 6)]
+
+
+#------------------------------------------------------------
+# Adds one rating to a recipe's summary (creates the row if needed)
+def add_rating(cursor, recipe_id, rating):
+    if rating is None:
+        return
+    cursor.execute('''
+        INSERT INTO recipeRatings (recipeId, ratingCount, ratingSum, stars0, stars1, stars2, stars3, stars4, stars5)
+        VALUES (%s, 1, %s, %s, %s, %s, %s, %s, %s) AS new
+        ON DUPLICATE KEY UPDATE
+            ratingCount = recipeRatings.ratingCount + 1,
+            ratingSum = recipeRatings.ratingSum + new.ratingSum,
+            stars0 = recipeRatings.stars0 + new.stars0,
+            stars1 = recipeRatings.stars1 + new.stars1,
+            stars2 = recipeRatings.stars2 + new.stars2,
+            stars3 = recipeRatings.stars3 + new.stars3,
+            stars4 = recipeRatings.stars4 + new.stars4,
+            stars5 = recipeRatings.stars5 + new.stars5;
+    ''', [recipe_id, rating] + _stars(rating))
+
+
+#------------------------------------------------------------
+# Takes one rating back out of a recipe's summary
+def remove_rating(cursor, recipe_id, rating):
+    if rating is None:
+        return
+    cursor.execute('''
+        UPDATE recipeRatings
+        SET ratingCount = ratingCount - 1,
+            ratingSum = ratingSum - %s,
+            stars0 = stars0 - %s,
+            stars1 = stars1 - %s,
+            stars2 = stars2 - %s,
+            stars3 = stars3 - %s,
+            stars4 = stars4 - %s,
+            stars5 = stars5 - %s
+        WHERE recipeId = %s;
+    ''', [rating] + _stars(rating) + [recipe_id])
+
+
+#------------------------------------------------------------
+# Recomputes summaries from the reviews table. With no ids every
+# summary is rebuilt from scratch.
+def refresh_ratings(cursor, recipe_ids=None):
+    if recipe_ids is None:
+        cursor.execute('DELETE FROM recipeRatings;')
+        cursor.execute(f'''
+            INSERT INTO recipeRatings (recipeId, ratingCount, ratingSum, stars0, stars1, stars2, stars3, stars4, stars5)
+            {_SUMMARY_SELECT}
+            GROUP BY recipeId;
+        ''')
+        return
+
+    recipe_ids = list(dict.fromkeys(recipe_ids))
+    for start in range(0, len(recipe_ids), RATING_BATCH_SIZE):
+        chunk = recipe_ids[start:start + RATING_BATCH_SIZE]
+        placeholders = ', '.join(['%s'] * len(chunk))
+        cursor.execute(f'DELETE FROM recipeRatings WHERE recipeId IN ({placeholders});', chunk)
+        cursor.execute(f'''
+            INSERT INTO recipeRatings (recipeId, ratingCount, ratingSum, stars0, stars1, stars2, stars3, stars4, stars5)
+            {_SUMMARY_SELECT}
+            WHERE recipeId IN ({placeholders})
+            GROUP BY recipeId;
+        ''', chunk)
+
+
+def format_summary(recipe_id, row):
+    count = row['ratingCount'] if row else 0
+    total = row['ratingSum'] if row else 0
+    return {
+        'recipeId': recipe_id,
+        'ratingCount': count,
+        'avg_rating': (total / count) if count else None,
+        'histogram': {str(n): (row[f'stars{n}'] if row else 0) for n in range(0, 6)},
+    }
+
+
+#------------------------------------------------------------
+# Loads the summaries for many recipes (in chunks) and returns a
+# map of recipeId -> summary. Recipes without reviews get an
+# empty summary with avg_rating None.
+def fetch_ratings(cursor, recipe_ids):
+    recipe_ids = list(dict.fromkeys(recipe_ids))
+    rows = {}
+    for start in range(0, len(recipe_ids), RATING_BATCH_SIZE):
+        chunk = recipe_ids[start:start + RATING_BATCH_SIZE]
+        placeholders = ', '.join(['%s'] * len(chunk))
+        cursor.execute(RATINGS_QUERY.format(placeholders=placeholders), chunk)
+        for row in cursor.fetchall():
+            rows[row['recipeId']] = row
+    return {recipe_id: format_summary(recipe_id, rows.get(recipe_id)) for recipe_id in recipe_ids}
@@ -3,7 +3,22 @@ from flask import request
 from flask import jsonify
 from flask import make_response
 from flask import current_app
+from flask import Response, stream_with_context
+import click
 from backend.db_connection import db
+from backend.cache.conditional import conditional, bump_versions
+from backend.cache import cache
+from backend.utils.pagination import BadCursor, wants_all, page_args, page_query, page_response
+from backend.utils.streaming import stream_format, stream_query
+from backend.search.index import recipe_index
+from backend.recipes.ratings import add_rating, remove_rating, refresh_ratings, fetch_ratings, format_summary
+from backend.recipes.importer import IMPORT_BATCH_SIZE, import_recipes, summarize
+from backend.recipes.rollups import add_recipes, remove_recipes, add_reviews, remove_reviews, rebuild_rollups, recipe_series, review_series
+from backend.utils.timeseries import series_args, downsample, iso_dates
+from backend.recipes.similar import similar_recipes, benchmark as similar_benchmark
+from backend.pantry.matcher import pantry_matcher
+from backend.ingredients.substitutions import substitution_graph
+from backend.ingredients.resolve import ingredients_added
 
 #------------------------------------------------------------
 # Create a new Blueprint object, which is a collection of 
@@ -13,63 +28,234 @@ recipes = Blueprint('recipes', __name__)
 
 #------------------------------------------------------------
 # Get all the recipes from the database, package them up,
-# and return them to the client
-@recipes.route('/recipes', methods=['GET'])
-def get_recipes():
-    query = '''
+# and return them to the client. Results are paged with
+# ?limit=&next= (see backend/utils/pagination.py); pass
+# ?all=true for the whole list in one response, or
+# ?stream=json|ndjson to stream the whole list row by row.
+# The SQL of this and the other routes lives in module constants
+# so the query-plan check (backend/db_connection/query_plans.py)
+# EXPLAINs exactly what the routes run.
+RECIPE_LIST_QUERY = '''
         SELECT r.recipeId, r.title, r.description, r.difficulty, r.calories, r.chefId, r.datePosted, r.prepTime, r.servings,r.instructions, u.username as chefName
         FROM recipes r JOIN users u ON r.chefId = u.userId
-        ORDER BY r.datePosted DESC;
     '''
-    
+ALL_RECIPES_QUERY = RECIPE_LIST_QUERY + ' ORDER BY r.datePosted DESC;'
+
+@recipes.route('/recipes', methods=['GET'])
+@conditional('recipes', 'users')
+@cache.cached(tags=('recipes', 'users'))
+def get_recipes():
+    fmt = stream_format()
+    if fmt:
+        return stream_query(ALL_RECIPES_QUERY, fmt=fmt)
+
     # get a cursor object from the database
     cursor = db.get_db().cursor()
 
-    # use cursor to query the database for a list of products
-    cursor.execute(query)
+    if wants_all():
+        # use cursor to query the database for a list of products
+        cursor.execute(ALL_RECIPES_QUERY)
+
+        # fetch all the data from the cursor
+        # The cursor will return the data as a 
+        # Python Dictionary
+        theData = cursor.fetchall()
+
+        # Create a HTTP Response object and add results of the query to it
+        # after "jasonify"-ing it.
+        response = make_response(jsonify(theData))
+        # set the proper HTTP Status code of 200 (meaning all good)
+        response.status_code = 200
+        # send the response back to the client
+        return response
 
-    # fetch all the data from the cursor
-    # The cursor will return the data as a 
-    # Python Dictionary
+    try:
+        limit, after = page_args()
+    except BadCursor as e:
+        return make_response({'error': str(e)}, 400)
+
+    cursor.execute(*page_query(RECIPE_LIST_QUERY, 'r.datePosted', 'r.recipeId', after, limit))
+    theData = cursor.fetchall()
+
+    return page_response(theData, limit, 'datePosted', 'recipeId')
+
+#------------------------------------------------------------
+# Searches recipes by title text, difficulty and a set of
+# required ingredients, and returns only the matches with their
+# ingredients embedded. e.g.
+#   GET /recipes/search?q=pasta&difficulty=EASY&ingredient=Garlic&ingredient=Basil
+# The required-ingredient check is a set containment over the
+# recipeIngredients table (GROUP BY recipeId HAVING COUNT = k), so
+# the whole search is two queries no matter how big the catalog is.
+@recipes.route('/recipes/search', methods=['GET'])
+@conditional('recipes', 'users', 'recipeIngredients', 'ingredients')
+def search_recipes():
+    search = request.args.get('q', '').strip()
+    difficulty = request.args.get('difficulty', '').strip().upper()
+    required = {name.strip().lower() for name in request.args.getlist('ingredient') if name.strip()}
+
+    cursor = db.get_db().cursor()
+    cursor.execute(*search_query(search, difficulty, required))
     theData = cursor.fetchall()
 
-    # Create a HTTP Response object and add results of the query to it
-    # after "jasonify"-ing it.
+    by_recipe = fetch_ingredients_for_recipes(cursor, [r['recipeId'] for r in theData])
+    for r in theData:
+        r['ingredients'] = by_recipe.get(r['recipeId'], [])
+
     response = make_response(jsonify(theData))
-    # set the proper HTTP Status code of 200 (meaning all good)
     response.status_code = 200
-    # send the response back to the client
     return response
 
+# the search SQL and its arguments, as (sql, args)
+def search_query(search, difficulty, required):
+    query = '''
+        SELECT r.recipeId, r.title, r.description, r.difficulty, r.calories, r.chefId, r.datePosted, r.prepTime, r.servings,r.instructions, u.username as chefName
+        FROM recipes r JOIN users u ON r.chefId = u.userId
+        WHERE 1 = 1
+    '''
+    args = []
+
+    if required:
+        placeholders = ', '.join(['%s'] * len(required))
+        query += f'''
+        AND r.recipeId IN (
+            SELECT ri.recipeId
+            FROM recipeIngredients ri
+            JOIN ingredients i ON i.ingredientId = ri.ingredientId
+            WHERE i.name IN ({placeholders})
+            GROUP BY ri.recipeId
+            HAVING COUNT(DISTINCT ri.ingredientId) = %s
+        )
+        '''
+        args.extend(sorted(required))
+        args.append(len(required))
+
+    if difficulty and difficulty != 'ALL':
+        query += ' AND r.difficulty = %s '
+        args.append(difficulty)
+
+    # the free-text box matches the title or any ingredient name,
+    # same as the old client-side filter on the home page
+    if search:
+        like = f'%{search}%'
+        query += '''
+        AND (r.title LIKE %s OR EXISTS (
+            SELECT 1
+            FROM recipeIngredients ri2
+            JOIN ingredients i2 ON i2.ingredientId = ri2.ingredientId
+            WHERE ri2.recipeId = r.recipeId AND i2.name LIKE %s
+        ))
+        '''
+        args.extend([like, like])
+
+    query += ' ORDER BY r.datePosted DESC;'
+    return query, args
+
+
+#------------------------------------------------------------
+# Loads the ingredient rows for many recipes and groups them by
+# recipeId. Ids are sent in chunks of INGREDIENT_BATCH_SIZE so a
+# huge list never turns into one enormous IN (...) statement.
+INGREDIENT_BATCH_SIZE = 500
+RECIPE_INGREDIENTS_QUERY = '''
+                SELECT ri.recipeId, i.name, i.cost, ri.quantity, ri.unit
+                FROM ingredients i
+                JOIN recipeIngredients ri ON i.ingredientId = ri.ingredientId
+                WHERE ri.recipeId IN ({placeholders});
+                '''
+
+def fetch_ingredients_for_recipes(cursor, recipe_ids):
+    recipe_ids = list(dict.fromkeys(recipe_ids))
+    ingredients_by_recipe = {recipe_id: [] for recipe_id in recipe_ids}
+
+    for start in range(0, len(recipe_ids), INGREDIENT_BATCH_SIZE):
+        chunk = recipe_ids[start:start + INGREDIENT_BATCH_SIZE]
+        placeholders = ', '.join(['%s'] * len(chunk))
+        cursor.execute(RECIPE_INGREDIENTS_QUERY.format(placeholders=placeholders), chunk)
+        for row in cursor.fetchall():
+            recipe_id = row.pop('recipeId')
+            ingredients_by_recipe.setdefault(recipe_id, []).append(row)
+    return ingredients_by_recipe
+
 #------------------------------------------------------------
 # Gets a single recipe from the database by id, packages it up,
 # and return it to the client
 #------------------------------------------------------------
-@recipes.route('/recipe/<id>', methods=['GET'])
-def get_recipe (id):
-
-    query = f'''SELECT *
+RECIPE_QUERY = '''SELECT *
             FROM recipes 
-            WHERE recipeId = {str(id)} 
+            WHERE recipeId = %s
         '''
-    
-    # logging the query for debugging purposes.  
-    # The output will appear in the Docker logs output
-    # This line has nothing to do with actually executing the query...
-        # It is only for debugging purposes. 
-        
-    current_app.logger.info(f'GET /recipes/<id> query={query}')
 
+@recipes.route('/recipe/<id>', methods=['GET'])
+@conditional('recipes')
+def get_recipe (id):
     # get the database connection, execute the query, and 
     # fetch the results as a Python Dictionary
     cursor = db.get_db().cursor()
-    cursor.execute(query)
+    cursor.execute(RECIPE_QUERY, (id,))
     theData = cursor.fetchall()
-        
-    # Another example of logging for debugging purposes.
-    # You can see if the data you're getting back is what you expect. 
-    current_app.logger.info(f'GET /recipes/<id> Result of query = {theData}')
-        
+
+    response = make_response(jsonify(theData))
+    response.status_code = 200
+    return response
+
+#------------------------------------------------------------
+# Everything the recipe page needs in one response: the recipe,
+# a chef summary, the ingredients, the rating summary and the
+# newest reviews. Three queries, run at the same time on separate
+# pooled connections when the pool has room (see run_parallel).
+FULL_RECIPE_REVIEW_LIMIT = 20
+MAX_SIMILAR = 50
+
+FULL_RECIPE_QUERY = '''
+            SELECT r.*, u.userId AS chef_userId, u.username AS chef_username,
+                   u.firstName AS chef_firstName, u.lastName AS chef_lastName,
+                   rr.ratingCount, rr.ratingSum, rr.stars0, rr.stars1, rr.stars2, rr.stars3, rr.stars4,
+                   rr.stars5
+            FROM recipes r
+            JOIN users u ON r.chefId = u.userId
+            LEFT JOIN recipeRatings rr ON rr.recipeId = r.recipeId
+            WHERE r.recipeId = %s;
+        '''
+NEWEST_REVIEWS_QUERY = '''
+            SELECT u.username, r.*
+            FROM reviews r
+            JOIN users u ON r.userId = u.userId
+            WHERE r.recipeId = %s
+            ORDER BY r.datePosted DESC, r.reviewId DESC
+            LIMIT %s;
+        '''
+
+@recipes.route('/recipe/<int:id>/full', methods=['GET'])
+@conditional('recipes', 'users', 'recipeIngredients', 'ingredients', 'recipeRatings', 'reviews')
+def get_recipe_full(id):
+    def recipe_with_chef(cursor):
+        cursor.execute(FULL_RECIPE_QUERY, (id,))
+        return cursor.fetchone()
+
+    def ingredients(cursor):
+        return fetch_ingredients_for_recipes(cursor, [id])[id]
+
+    def newest_reviews(cursor):
+        cursor.execute(NEWEST_REVIEWS_QUERY, (id, FULL_RECIPE_REVIEW_LIMIT))
+        return cursor.fetchall()
+
+    row, ingredient_rows, review_rows = db.run_parallel(recipe_with_chef, ingredients, newest_reviews)
+    if row is None:
+        return make_response({'error': f'Recipe {id} not found'}, 404)
+
+    chef = {key[len('chef_'):]: row.pop(key) for key in list(row) if key.startswith('chef_')}
+    rating_columns = ('ratingCount', 'ratingSum', 'stars0', 'stars1', 'stars2', 'stars3', 'stars4', 'stars5')
+    rating_row = {key: row.pop(key) for key in rating_columns}
+    rating = format_summary(id, rating_row if rating_row['ratingCount'] is not None else None)
+
+    theData = {
+        'recipe': row,
+        'chef': chef,
+        'ingredients': ingredient_rows,
+        'rating': rating,
+        'reviews': review_rows,
+    }
     response = make_response(jsonify(theData))
     response.status_code = 200
     return response
@@ -78,37 +264,140 @@ def get_recipe (id):
 # Gets all ingredients for a single  recipe from the database by id,
 # packages it up, and return it to the client
 #------------------------------------------------------------
-@recipes.route('/recipe/<id>/ingredients', methods=['GET'])
-def get_recipe_ingredients(id):
-    query = f'''
-            SELECT i.name, i.cost, ri.quantity, ri.unit
+# With ?substitutes=true each ingredient also lists what can stand
+# in for it in this recipe (nearest first, with the chain length as
+# depth); adding &have=4,9,12 marks the ones in the user's pantry.
+#------------------------------------------------------------
+SINGLE_RECIPE_INGREDIENTS_QUERY = '''
+            SELECT i.ingredientId, i.name, i.cost, ri.quantity, ri.unit
             FROM ingredients i
             JOIN recipeIngredients ri ON i.ingredientId = ri.ingredientId
-            WHERE ri.recipeId = {str(id)};
+            WHERE ri.recipeId = %s;
+            '''
+SUBSTITUTE_NAMES_QUERY = '''
+                SELECT ingredientId, name, cost
+                FROM ingredients
+                WHERE ingredientId IN ({placeholders});
             '''
+
+@recipes.route('/recipe/<id>/ingredients', methods=['GET'])
+@conditional('recipes', 'recipeIngredients', 'ingredients', 'substitutions', indexes=(substitution_graph,))
+def get_recipe_ingredients(id):
     cursor = db.get_db().cursor()
-    cursor.execute(query)
+    cursor.execute(SINGLE_RECIPE_INGREDIENTS_QUERY, (id,))
     theData = cursor.fetchall()
 
+    if request.args.get('substitutes', '').lower() in ('1', 'true', 'yes'):
+        have = {int(i) for i in request.args.get('have', '').split(',') if i.strip().isdigit()}
+        substitution_graph.ensure_built(cursor)
+        for row in theData:
+            row['substitutes'] = substitution_graph.substitutes(row['ingredientId'], int(id))
+        sub_ids = sorted({sub['ingredientId'] for row in theData for sub in row['substitutes']})
+        if sub_ids:
+            placeholders = ', '.join(['%s'] * len(sub_ids))
+            cursor.execute(SUBSTITUTE_NAMES_QUERY.format(placeholders=placeholders), sub_ids)
+            names = {row['ingredientId']: row for row in cursor.fetchall()}
+            for row in theData:
+                for sub in row['substitutes']:
+                    sub['name'] = names.get(sub['ingredientId'], {}).get('name')
+                    sub['cost'] = names.get(sub['ingredientId'], {}).get('cost')
+                    if have:
+                        sub['inPantry'] = sub['ingredientId'] in have
+
     response = make_response(jsonify(theData))
     response.status_code = 200
     return response
 
 
+#------------------------------------------------------------
+# Records that one ingredient can stand in for another in this
+# recipe, e.g.
+#   POST /recipe/1/substitutions
+#   {"originalIngredientId": 32, "subIngredientId": 39, "quantity": 300, "unit": "g"}
+@recipes.route('/recipe/<int:id>/substitutions', methods=['POST'])
+def add_substitution(id):
+    data = request.get_json(silent=True) or {}
+    try:
+        original = int(data['originalIngredientId'])
+        sub = int(data['subIngredientId'])
+        quantity = float(data['quantity'])
+        unit = str(data['unit'])
+    except (KeyError, TypeError, ValueError):
+        return make_response({'error': 'originalIngredientId, subIngredientId, quantity and unit are required'}, 400)
+    if original == sub:
+        return make_response({'error': 'an ingredient cannot substitute for itself'}, 400)
+
+    # check the foreign keys first so unknown ids are a 404/400, not
+    # an IntegrityError
+    cursor = db.get_db().cursor()
+    cursor.execute('''
+        SELECT (SELECT COUNT(*) FROM recipes WHERE recipeId = %s) AS recipes,
+               (SELECT COUNT(*) FROM ingredients WHERE ingredientId IN (%s, %s)) AS ingredients;
+    ''', (id, original, sub))
+    found = cursor.fetchone()
+    if not found['recipes']:
+        return make_response({'error': f'Recipe {id} not found'}, 404)
+    if found['ingredients'] < 2:
+        return make_response({'error': 'originalIngredientId and subIngredientId must be existing ingredients'}, 400)
+
+    cursor.execute('''
+        INSERT INTO substitutions (originalIngredientId, subIngredientId, recipeId, quantity, unit)
+        VALUES (%s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE quantity = VALUES(quantity), unit = VALUES(unit);
+    ''', (original, sub, id, quantity, unit))
+    db.get_db().commit()
+    bump_versions(db.get_db(), 'substitutions')
+    # rebuilt on next use, by one thread while the others keep
+    # answering from the current graph, instead of inside this request
+    substitution_graph.invalidate()
+
+    return make_response(jsonify({'message': 'Substitution added successfully'}), 201)
+
+
+#------------------------------------------------------------
+# Gets the ingredients for many recipes in one call and returns
+# a map of recipeId -> ingredient rows. Ids can be passed as
+#   GET  /recipes/ingredients?ids=1,2,3
+#   POST /recipes/ingredients  {"recipeIds": [1, 2, 3]}
+# (use POST for long lists that would not fit in a URL)
+@recipes.route('/recipes/ingredients', methods=['GET', 'POST'])
+@conditional('recipes', 'recipeIngredients', 'ingredients')
+def get_ingredients_for_recipes():
+    if request.method == 'POST':
+        raw_ids = (request.get_json(silent=True) or {}).get('recipeIds', [])
+    else:
+        raw_ids = [i for i in request.args.get('ids', '').split(',') if i.strip()]
+
+    try:
+        recipe_ids = [int(i) for i in raw_ids]
+    except (TypeError, ValueError):
+        return make_response({'error': 'recipe ids must be integers'}, 400)
+
+    cursor = db.get_db().cursor()
+    theData = fetch_ingredients_for_recipes(cursor, recipe_ids)
+
+    response = make_response(jsonify({str(k): v for k, v in theData.items()}))
+    response.status_code = 200
+    return response
+
+
 #------------------------------------------------------------
 # Gets all recipies in a single category from the database
 # by category name, packages it up, and return it to the client
 #------------------------------------------------------------
-@recipes.route('/recipes/<categoryName>', methods=['GET']) # must put categoty name in quotes
-def get_recipes_by_category(categoryName):
-    query = f'''
+CATEGORY_RECIPES_QUERY = '''
             SELECT *
             FROM  recipes r
             JOIN categories c ON r.recipeId = c.recipeId
-            where c.categoryName = {str(categoryName)};
+            where c.categoryName = %s;
             '''
+
+# the name used to have to be sent in quotes; quoted or not works
+@recipes.route('/recipes/<categoryName>', methods=['GET'])
+@conditional('recipes', 'categories')
+def get_recipes_by_category(categoryName):
     cursor = db.get_db().cursor()
-    cursor.execute(query)
+    cursor.execute(CATEGORY_RECIPES_QUERY, (categoryName.strip('\'"'),))
     theData = cursor.fetchall()
 
     response = make_response(jsonify(theData))
@@ -145,7 +434,12 @@ def add_new_recipe():
     # executing and committing the insert statement 
     cursor = db.get_db().cursor()
     cursor.execute(query)
+    recipe_id = cursor.lastrowid
+    add_recipes(cursor, [recipe_id])
     db.get_db().commit()
+    bump_versions(db.get_db(), 'recipes')
+    cache.invalidate('recipes')
+    recipe_index.refresh_recipe(cursor, recipe_id)
     
     response = make_response("Successfully added recipe")
     response.status_code = 200
@@ -182,8 +476,15 @@ def update_recipe_post():
             '''
 
     cursor = db.get_db().cursor()
+    # the date, chef or difficulty may change, so the recipe leaves
+    # the rollups under its old values and comes back under the new
+    remove_recipes(cursor, [recipeId])
     r = cursor.execute(query)
+    add_recipes(cursor, [recipeId])
     db.get_db().commit()
+    bump_versions(db.get_db(), 'recipes')
+    cache.invalidate('recipes')
+    recipe_index.refresh_recipe(cursor, recipeId)
     return f'recipe added!'
 
 # ------------------------------------------------------------
@@ -195,21 +496,33 @@ def delete_recipe(id):
             WHERE recipeId = {str(id)};
             '''
     cursor = db.get_db().cursor()
+    remove_recipes(cursor, [id])
+    remove_reviews(cursor, 'recipeId = %s', [id])
     cursor.execute(query)
     db.get_db().commit()
+    bump_versions(db.get_db(), 'recipes', 'recipeIngredients', 'categories', 'reviews', 'recipeRatings',
+                  'substitutions')
+    cache.invalidate('recipes', 'reviews')
+    recipe_index.remove_recipe(id)
+    similar_recipes.remove_recipe(id)
+    pantry_matcher.remove_recipe(id)
+    # the recipe's substitutions go with it
+    substitution_graph.invalidate()
     return "Recipe Deleted!"
 
 # ------------------------------------------------------------
 # Gets all recipes from a user by user_id
-@recipes.route('/user/<user_id>/recipes', methods=['GET'])
-def get_recipes_by_user(user_id):
-    query = f'''
+USER_RECIPES_QUERY = '''
             SELECT *
             FROM recipes
-            WHERE chefId = {str(user_id)};
+            WHERE chefId = %s;
             '''
+
+@recipes.route('/user/<user_id>/recipes', methods=['GET'])
+@conditional('recipes')
+def get_recipes_by_user(user_id):
     cursor = db.get_db().cursor()
-    cursor.execute(query)
+    cursor.execute(USER_RECIPES_QUERY, (user_id,))
     theData = cursor.fetchall()
 
     response = make_response(jsonify(theData))
@@ -218,16 +531,18 @@ def get_recipes_by_user(user_id):
 
 # ------------------------------------------------------------
 # Gets the user of the provided recipe id
-@recipes.route('/recipe/<id>/user', methods=['GET'])
-def get_user_by_recipe(id):
-    query = f'''
+RECIPE_CHEF_QUERY = '''
             SELECT u.*
             FROM recipes r
             JOIN users u ON r.chefId = u.userId
-            WHERE r.recipeId = {str(id)};
+            WHERE r.recipeId = %s;
             '''
+
+@recipes.route('/recipe/<id>/user', methods=['GET'])
+@conditional('recipes', 'users')
+def get_user_by_recipe(id):
     cursor = db.get_db().cursor()
-    cursor.execute(query)
+    cursor.execute(RECIPE_CHEF_QUERY, (id,))
     theData = cursor.fetchall()
 
     response = make_response(jsonify(theData))
@@ -236,17 +551,19 @@ def get_user_by_recipe(id):
 
 # ------------------------------------------------------------
 # Gets all reviews for the recipe with the provided id
-@recipes.route('/recipe/<id>/reviews', methods=['GET'])
-def get_reviews_by_recipe(id):
-    query = f'''
+RECIPE_REVIEWS_QUERY = '''
             SELECT u.username, r.*
             FROM reviews r
             JOIN users u ON r.userId = u.userId
             JOIN recipes rec ON r.recipeId = rec.recipeId
-            WHERE rec.recipeId = {str(id)};
+            WHERE rec.recipeId = %s;
             '''
+
+@recipes.route('/recipe/<id>/reviews', methods=['GET'])
+@conditional('reviews', 'users', 'recipes')
+def get_reviews_by_recipe(id):
     cursor = db.get_db().cursor()
-    cursor.execute(query)
+    cursor.execute(RECIPE_REVIEWS_QUERY, (id,))
     theData = cursor.fetchall()
 
     response = make_response(jsonify(theData))
@@ -270,34 +587,214 @@ def add_review(id):
         '''
         cursor = db.get_db().cursor()
         cursor.execute(query, (userId, recipeId, rating, description))
+        review_id = cursor.lastrowid
+        # keep the rating summary and report rollups in step, in the
+        # same transaction
+        add_rating(cursor, recipeId, rating)
+        add_reviews(cursor, 'reviewId = %s', [review_id])
         db.get_db().commit()
+        bump_versions(db.get_db(), 'reviews', 'recipeRatings')
+        cache.invalidate('reviews')
 
         response = make_response("Successfully added review")
         response.status_code = 200
         return response
     except Exception as e:
+        db.get_db().rollback()
         current_app.logger.error(f"Error adding review: {e}")
         response = make_response("Failed to add review")
         response.status_code = 500
         return response
     
 # ------------------------------------------------------------
-# Gets the average rating for the recipe with the provided id
-@recipes.route('/recipe/<id>/avg-rating', methods=['GET'])
+# Recipes that share the most (and the rarest) ingredients with
+# this one, by TF-IDF weighted cosine similarity, e.g.
+#   GET /recipe/12/similar?k=5
+# Returns the best k recipes (default 10) with their score.
+RECIPE_CARDS_QUERY = '''
+        SELECT r.recipeId, r.title, r.description, r.difficulty, r.calories, r.chefId, r.datePosted, r.prepTime, r.servings, u.username as chefName
+        FROM recipes r JOIN users u ON r.chefId = u.userId
+        WHERE r.recipeId IN ({placeholders});
+    '''
+
+@recipes.route('/recipe/<int:id>/similar', methods=['GET'])
+@conditional('recipes', 'users', 'recipeIngredients', indexes=(similar_recipes,))
+def get_similar_recipes(id):
+    try:
+        k = max(1, min(int(request.args.get('k', 10)), MAX_SIMILAR))
+    except ValueError:
+        return make_response({'error': 'k must be an integer'}, 400)
+
+    cursor = db.get_db().cursor()
+    similar_recipes.ensure_built(cursor)
+    hits = similar_recipes.similar(id, k)
+    if hits is None:
+        return make_response({'error': 'Recipe not found or has no ingredients'}, 404)
+    if not hits:
+        return make_response(jsonify([]), 200)
+
+    ids = [recipe_id for recipe_id, _ in hits]
+    placeholders = ', '.join(['%s'] * len(ids))
+    cursor.execute(RECIPE_CARDS_QUERY.format(placeholders=placeholders), ids)
+    rows = {row['recipeId']: row for row in cursor.fetchall()}
+
+    theData = []
+    for recipe_id, score in hits:
+        if recipe_id in rows:
+            row = rows[recipe_id]
+            row['score'] = round(score, 4)
+            theData.append(row)
+
+    response = make_response(jsonify(theData))
+    response.status_code = 200
+    return response
+
+# ------------------------------------------------------------
+# Times /recipe/<id>/similar queries on a synthetic catalog:
+#   flask --app backend_app recipes bench-similar --recipes 100000
+@recipes.cli.command('bench-similar')
+@click.option('--recipes', 'n_recipes', default=100000, show_default=True)
+@click.option('--ingredients', 'n_ingredients', default=2000, show_default=True)
+@click.option('--per-recipe', default=9, show_default=True, help='ingredients per recipe')
+@click.option('--queries', default=1000, show_default=True)
+@click.option('-k', default=10, show_default=True)
+@click.option('--tfidf/--binary', default=True, show_default=True)
+def bench_similar_command(n_recipes, n_ingredients, per_recipe, queries, k, tfidf):
+    result = similar_benchmark(n_recipes, n_ingredients, per_recipe, queries, k, tfidf)
+    click.echo(f"{result['recipes']} recipes, {result['ingredients']} ingredients, {result['nnz']} entries; "
+               f"built in {result['build_ms']:.0f} ms")
+    click.echo(f"{result['queries']} queries (k={k}): p50 {result['p50_ms']:.2f} ms, "
+               f"p95 {result['p95_ms']:.2f} ms, p99 {result['p99_ms']:.2f} ms, max {result['max_ms']:.2f} ms")
+
+# ------------------------------------------------------------
+# Gets the average rating for the recipe with the provided id,
+# along with the number of ratings and a 0-5 star histogram.
+# Read from the recipeRatings summary, not from reviews.
+@recipes.route('/recipe/<int:id>/avg-rating', methods=['GET'])
+@conditional('recipeRatings')
 def get_average_rating(id):
-    query = f'''
-            SELECT AVG(rating) as avg_rating
-            FROM reviews
-            WHERE recipeId = {str(id)};
-            '''
     cursor = db.get_db().cursor()
-    cursor.execute(query)
-    theData = cursor.fetchall()
+    theData = [fetch_ratings(cursor, [id])[id]]
 
     response = make_response(jsonify(theData))
     response.status_code = 200
     return response
 
+# ------------------------------------------------------------
+# Gets the rating summaries for many recipes in one call so list
+# views can show stars without a request per recipe.
+#   GET  /recipes/ratings?ids=1,2,3
+#   POST /recipes/ratings  {"recipeIds": [1, 2, 3]}
+@recipes.route('/recipes/ratings', methods=['GET', 'POST'])
+@conditional('recipeRatings')
+def get_ratings_for_recipes():
+    if request.method == 'POST':
+        raw_ids = (request.get_json(silent=True) or {}).get('recipeIds', [])
+    else:
+        raw_ids = [i for i in request.args.get('ids', '').split(',') if i.strip()]
+
+    try:
+        recipe_ids = [int(i) for i in raw_ids]
+    except (TypeError, ValueError):
+        return make_response({'error': 'recipe ids must be integers'}, 400)
+
+    cursor = db.get_db().cursor()
+    theData = fetch_ratings(cursor, recipe_ids)
+
+    response = make_response(jsonify({str(k): v for k, v in theData.items()}))
+    response.status_code = 200
+    return response
+
+# ------------------------------------------------------------
+# Recomputes every rating summary from the reviews table:
+#   flask --app backend_app recipes rebuild-ratings
+@recipes.cli.command('rebuild-ratings')
+def rebuild_ratings_command():
+    cursor = db.get_db().cursor()
+    refresh_ratings(cursor)
+    db.get_db().commit()
+    bump_versions(db.get_db(), 'recipeRatings')
+    click.echo('recipe rating summaries rebuilt')
+
+# ------------------------------------------------------------
+# Recomputes the Reports page rollups from the recipes table
+# (also the backfill after restoring a dump):
+#   flask --app backend_app recipes rebuild-rollups
+@recipes.cli.command('rebuild-rollups')
+def rebuild_rollups_command():
+    cursor = db.get_db().cursor()
+    rebuild_rollups(cursor)
+    db.get_db().commit()
+    # the report routes read the rollups under these tables' versions
+    bump_versions(db.get_db(), 'recipes', 'reviews')
+    cache.invalidate('recipes', 'reviews')
+    click.echo('recipe rollups rebuilt')
+
+# ------------------------------------------------------------
+# Bulk recipe import. The request body is NDJSON, one recipe per
+# line (see backend/recipes/importer.py for the format), e.g.
+#   curl -X POST --data-binary @recipes.ndjson \
+#        -H 'Content-Type: application/x-ndjson' \
+#        'http://localhost:4000/recipes/import?batch_size=500'
+# The body is read as it arrives and written in batch_size
+# transactions. The response streams one NDJSON report per batch
+# (rows, imported, failed, seconds, rowsPerSecond, failures) and
+# ends with a {"summary": ...} line. Lines that fail are reported
+# and skipped; the rest of the run carries on. Missing ingredients
+# are created unless create_ingredients=false.
+@recipes.route('/recipes/import', methods=['POST'])
+def import_recipes_ndjson():
+    try:
+        batch_size = max(1, int(request.args.get('batch_size', IMPORT_BATCH_SIZE)))
+    except ValueError:
+        return make_response({'error': 'batch_size must be an integer'}, 400)
+    create = request.args.get('create_ingredients', 'true').lower() not in ('0', 'false', 'no')
+    conn = db.get_db()
+    dumps = current_app.json.dumps
+
+    def generate():
+        reports = []
+        for report in import_recipes(conn, request.stream, batch_size, create):
+            _imported(report)
+            reports.append(report)
+            yield dumps(report) + '\n'
+        yield dumps({'summary': summarize(reports)}) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+# keeps caches and in-memory indexes current after an import batch,
+# then drops the per-row lists so long runs don't pile them up
+def _imported(report):
+    if report.pop('recipeIds'):
+        bump_versions(db.get_db(), 'recipes', 'recipeIngredients', 'categories')
+        cache.invalidate('recipes')
+        recipe_index.invalidate()
+        similar_recipes.invalidate()
+        pantry_matcher.invalidate()
+    ingredients_added(report.pop('createdIngredients'))
+
+# ------------------------------------------------------------
+# Same import from the command line:
+#   flask --app backend_app recipes import-recipes recipes.ndjson --batch-size 1000
+@recipes.cli.command('import-recipes')
+@click.argument('source', type=click.File('r'))
+@click.option('--batch-size', default=IMPORT_BATCH_SIZE, show_default=True, help='recipes per transaction')
+@click.option('--create-ingredients/--no-create-ingredients', default=True, show_default=True,
+              help='create ingredients that do not exist yet')
+def import_recipes_command(source, batch_size, create_ingredients):
+    reports = []
+    for report in import_recipes(db.get_db(), source, batch_size, create_ingredients):
+        _imported(report)
+        reports.append(report)
+        click.echo(f"batch {report['batch']}: {report['imported']}/{report['rows']} imported, "
+                   f"{report['failed']} failed, {report['seconds']}s ({report['rowsPerSecond']} rows/s)")
+        for failure in report['failures']:
+            click.echo(f"  line {failure['line']}: {failure['error']}")
+
+    summary = summarize(reports)
+    click.echo(f"done: {summary['imported']}/{summary['rows']} imported, {summary['failed']} failed "
+               f"in {summary['seconds']}s ({summary['rowsPerSecond']} rows/s)")
+
 # ------------------------------------------------------------
 # Submits a new recipe and all of its recipeIngredients
 @recipes.route('/recipe/add', methods=['POST'])
@@ -323,7 +820,11 @@ def submit_recipe():
         cursor = db.get_db().cursor()
         cursor.execute(query, (chefId, title, description, instructions, prepTime, servings, difficulty, calories))
         recipe_id = cursor.lastrowid  # Get the last inserted recipeId
+        add_recipes(cursor, [recipe_id])
         db.get_db().commit()
+        bump_versions(db.get_db(), 'recipes')
+        cache.invalidate('recipes')
+        recipe_index.refresh_recipe(cursor, recipe_id)
     except Exception as e:
         current_app.logger.error(f"Error inserting recipe: {e}")
         db.get_db().rollback()
@@ -341,6 +842,9 @@ def submit_recipe():
             '''
             cursor.execute(query, (recipe_id, ingredient['ingredientId'], ingredient['quantity'], ingredient['unit']))
         db.get_db().commit()
+        bump_versions(db.get_db(), 'recipeIngredients')
+        similar_recipes.refresh_recipe(cursor, recipe_id)
+        pantry_matcher.refresh_recipe(cursor, recipe_id)
         response = make_response({'message': 'Recipe submitted successfully'})
         response.status_code = 200
     except Exception as e:
@@ -350,61 +854,162 @@ def submit_recipe():
         return response
     return response
 # ------------------------------------------------------------
+# all-time totals kept by backend/recipes/rollups.py
+CATEGORY_COUNTS_QUERY = '''
+            SELECT recipeCount AS count, dimKey AS categoryName
+            FROM recipeRollupTotals
+            WHERE dimension = 'category' AND recipeCount > 0
+            ORDER BY dimKey
+            '''
+
 @recipes.route('/recipebycategory', methods=['GET']) 
+@conditional('recipes', 'categories')
+@cache.cached(tags=('recipes',))
 def get_num_recipes_by_category():
-    query = f'''
-            SELECT COUNT(*) AS count, c.categoryName
-            FROM  recipes r
-            JOIN categories c ON r.recipeId = c.recipeId
-            GROUP BY c.categoryName
-            '''
     cursor = db.get_db().cursor()
-    cursor.execute(query)
+    cursor.execute(CATEGORY_COUNTS_QUERY)
     theData = cursor.fetchall()
 
     response = make_response(jsonify(theData))
     response.status_code = 200
     return response
 
+# ------------------------------------------------------------
+# Recipes posted over time, read from the daily rollups, e.g.
+#   GET /recipes/posted-over-time?bucket=week&start=2024-01-01&end=2024-12-31&max_points=200
+# Returns [{date, count}] oldest first, one point per bucket that
+# has recipes (see backend/utils/timeseries.py for the arguments).
 @recipes.route('/recipes/posted-over-time', methods=['GET'])
+@conditional('recipes')
+@cache.cached(tags=('recipes',))
 def recipes_over_time():
-    sql = """
-        SELECT DATE(datePosted) AS date, COUNT(*) AS count
-        FROM recipes
-        GROUP BY DATE(datePosted)
-        ORDER BY date ASC;
-    """
+    try:
+        bucket, start, end, max_points = series_args()
+    except ValueError as e:
+        return make_response({'error': str(e)}, 400)
+
     cursor = db.get_db().cursor()
-    cursor.execute(sql)
-    results = cursor.fetchall()
-    return jsonify(results)
+    results = downsample(recipe_series(cursor, bucket, start, end), max_points, bucket)
+    return jsonify(iso_dates(results))
 
-@recipes.route('/reviews', methods=['GET'])
-def get_all_reviews():
-    sql = """
+# ------------------------------------------------------------
+# Review volume and average rating over time, same arguments as
+# /recipes/posted-over-time. Returns [{date, count, avgRating}].
+@recipes.route('/reviews/over-time', methods=['GET'])
+@conditional('reviews')
+@cache.cached(tags=('reviews',))
+def reviews_over_time():
+    try:
+        bucket, start, end, max_points = series_args()
+    except ValueError as e:
+        return make_response({'error': str(e)}, 400)
+
+    cursor = db.get_db().cursor()
+    return jsonify(review_points(review_series(cursor, bucket, start, end), max_points, bucket))
+
+def review_points(rows, max_points, bucket='day'):
+    rows = downsample(rows, max_points, bucket, ('count', 'ratingCount', 'ratingSum'))
+    theData = [{
+        'date': row['date'],
+        'count': row['count'],
+        'avgRating': round(row['ratingSum'] / row['ratingCount'], 2) if row['ratingCount'] else None,
+    } for row in rows]
+    return iso_dates(theData)
+
+# ------------------------------------------------------------
+# Everything the reports page draws in one response:
+#   GET /reports/dashboard?bucket=week&start=...&end=...&max_points=200
+# returns {recipesOverTime, reviewsOverTime, recipesByCategory},
+# each as the matching route above would. The three queries run at
+# the same time on separate pooled connections (see run_parallel).
+@recipes.route('/reports/dashboard', methods=['GET'])
+@conditional('recipes', 'reviews', 'categories')
+@cache.cached(tags=('recipes', 'reviews'))
+def reports_dashboard():
+    try:
+        bucket, start, end, max_points = series_args()
+    except ValueError as e:
+        return make_response({'error': str(e)}, 400)
+
+    def by_category(cursor):
+        cursor.execute(CATEGORY_COUNTS_QUERY)
+        return cursor.fetchall()
+
+    recipe_rows, review_rows, category_rows = db.run_parallel(
+        lambda cursor: recipe_series(cursor, bucket, start, end),
+        lambda cursor: review_series(cursor, bucket, start, end),
+        by_category)
+
+    theData = {
+        'recipesOverTime': iso_dates(downsample(recipe_rows, max_points, bucket)),
+        'reviewsOverTime': review_points(review_rows, max_points, bucket),
+        'recipesByCategory': category_rows,
+    }
+    response = make_response(jsonify(theData))
+    response.status_code = 200
+    return response
+
+# ------------------------------------------------------------
+# Gets every review, newest first. Paged with ?limit=&next=,
+# ?all=true for the whole list, or ?stream=json|ndjson to
+# stream the whole list row by row.
+REVIEW_LIST_QUERY = """
         SELECT r.reviewId, r.userId, u.username, r.recipeId, rc.title AS recipeTitle,
                r.rating, r.description, r.datePosted, r.upVotes, r.downVotes
         FROM reviews r
         JOIN users u ON r.userId = u.userId
         JOIN recipes rc ON r.recipeId = rc.recipeId
-        ORDER BY r.datePosted DESC;
     """
+ALL_REVIEWS_QUERY = REVIEW_LIST_QUERY + ' ORDER BY r.datePosted DESC;'
+
+@recipes.route('/reviews', methods=['GET'])
+@conditional('reviews', 'users', 'recipes')
+def get_all_reviews():
+    fmt = stream_format()
+    if fmt:
+        return stream_query(ALL_REVIEWS_QUERY, fmt=fmt)
     
     cursor = db.get_db().cursor()
-    cursor.execute(sql)
+
+    if wants_all():
+        cursor.execute(ALL_REVIEWS_QUERY)
+        theData = cursor.fetchall()
+
+        response = make_response(jsonify(theData))
+        response.status_code = 200
+        return response
+
+    try:
+        limit, after = page_args()
+    except BadCursor as e:
+        return make_response({'error': str(e)}, 400)
+
+    cursor.execute(*page_query(REVIEW_LIST_QUERY, 'r.datePosted', 'r.reviewId', after, limit))
     theData = cursor.fetchall()
 
-    response = make_response(jsonify(theData))
-    response.status_code = 200
-    return response
+    return page_response(theData, limit, 'datePosted', 'reviewId')
 
 @recipes.route('/reviews/<reviewId>/delete', methods=['DELETE'])
 def delete_review(reviewId):
-    query = f'''
+    cursor = db.get_db().cursor()
+    # lock the review so its rating is taken out of the summary once
+    cursor.execute('''
+            SELECT recipeId, rating
+            FROM reviews
+            WHERE reviewId = %s
+            FOR UPDATE;
+            ''', (reviewId,))
+    review = cursor.fetchone()
+    remove_reviews(cursor, 'reviewId = %s', [reviewId])
+
+    query = '''
             DELETE FROM reviews
-            WHERE reviewId = {str(reviewId)};
+            WHERE reviewId = %s;
             '''
-    cursor = db.get_db().cursor()
-    cursor.execute(query)
+    cursor.execute(query, (reviewId,))
+    if review is not None:
+        remove_rating(cursor, review['recipeId'], review['rating'])
     db.get_db().commit()
+    bump_versions(db.get_db(), 'reviews', 'recipeRatings')
+    cache.invalidate('reviews')
     return "Recipe Deleted!"
@@ -0,0 +1,190 @@
+#------------------------------------------------------------
+# Helpers for the rollups behind the Reports page: recipe counts
+# (recipeDailyRollups / recipeRollupTotals, migration 003) and
+# review counts and ratings (reviewDailyRollups, migration 004).
+# Every route that inserts, updates or deletes recipes or reviews
+# applies the change here inside its own transaction: add_* after
+# the rows exist, remove_* while they (and their categories) still
+# do. Report queries then read counts per day or per key instead
+# of grouping the recipes and reviews tables on every view.
+#------------------------------------------------------------
+
+ROLLUP_BATCH_SIZE = 500
+DIMENSIONS = ('all', 'category', 'difficulty', 'chef')
+
+# SQL that maps a rollup day to the first day of its bucket
+BUCKETS = {
+    'day': 'day',
+    'week': 'DATE_SUB(day, INTERVAL WEEKDAY(day) DAY)',
+    'month': 'DATE_SUB(day, INTERVAL DAYOFMONTH(day) - 1 DAY)',
+}
+
+# one (day, dimension, dimKey, recipeCount) row per group, for the
+# recipes matching {where}; {sign} is 1 to add and -1 to subtract
+_DELTA_SELECT = '''
+    SELECT DATE(datePosted) AS day, 'all' AS dimension, '' AS dimKey, {sign} * COUNT(*) AS recipeCount
+    FROM recipes {where}
+    GROUP BY DATE(datePosted)
+    UNION ALL
+    SELECT DATE(r.datePosted), 'category', c.categoryName, {sign} * COUNT(*)
+    FROM recipes r JOIN categories c ON c.recipeId = r.recipeId {where_r}
+    GROUP BY DATE(r.datePosted), c.categoryName
+    UNION ALL
+    SELECT DATE(datePosted), 'difficulty', COALESCE(difficulty, ''), {sign} * COUNT(*)
+    FROM recipes {where}
+    GROUP BY DATE(datePosted), COALESCE(difficulty, '')
+    UNION ALL
+    SELECT DATE(datePosted), 'chef', chefId, {sign} * COUNT(*)
+    FROM recipes {where}
+    GROUP BY DATE(datePosted), chefId
+'''
+
+
+def _apply(cursor, recipe_ids, sign):
+    recipe_ids = list(dict.fromkeys(recipe_ids))
+    for start in range(0, len(recipe_ids), ROLLUP_BATCH_SIZE):
+        chunk = recipe_ids[start:start + ROLLUP_BATCH_SIZE]
+        placeholders = ', '.join(['%s'] * len(chunk))
+        delta = _DELTA_SELECT.format(
+            sign=sign,
+            where=f'WHERE recipeId IN ({placeholders})',
+            where_r=f'WHERE r.recipeId IN ({placeholders})',
+        )
+        # the same ids fill every branch of the UNION
+        args = chunk * 4
+        cursor.execute(f'''
+            INSERT INTO recipeDailyRollups (day, dimension, dimKey, recipeCount)
+            SELECT * FROM ({delta}) AS new
+            ON DUPLICATE KEY UPDATE recipeCount = recipeDailyRollups.recipeCount + new.recipeCount;
+        ''', args)
+        cursor.execute(f'''
+            INSERT INTO recipeRollupTotals (dimension, dimKey, recipeCount)
+            SELECT * FROM (
+                SELECT dimension, dimKey, SUM(recipeCount) AS recipeCount
+                FROM ({delta}) AS delta
+                GROUP BY dimension, dimKey
+            ) AS new
+            ON DUPLICATE KEY UPDATE recipeCount = recipeRollupTotals.recipeCount + new.recipeCount;
+        ''', args)
+
+
+#------------------------------------------------------------
+# Counts newly inserted recipes (call after their categories
+# are in, so those are counted too)
+def add_recipes(cursor, recipe_ids):
+    _apply(cursor, recipe_ids, 1)
+
+
+# Takes recipes back out of the counts; call before deleting or
+# changing them, while their rows and categories still exist
+def remove_recipes(cursor, recipe_ids):
+    _apply(cursor, recipe_ids, -1)
+
+
+#------------------------------------------------------------
+# Review rollups. Reviews are picked with a WHERE condition on the
+# reviews table (e.g. 'recipeId = %s'), since deleting a recipe or
+# a user removes their reviews by cascade.
+_REVIEW_DELTA = '''
+    SELECT DATE(datePosted) AS day, {sign} * COUNT(*) AS reviewCount,
+           {sign} * COUNT(rating) AS ratingCount, {sign} * COALESCE(SUM(rating), 0) AS ratingSum
+    FROM reviews
+    WHERE {where}
+    GROUP BY DATE(datePosted)
+'''
+
+
+def _apply_reviews(cursor, where, args, sign):
+    cursor.execute(f'''
+        INSERT INTO reviewDailyRollups (day, reviewCount, ratingCount, ratingSum)
+        SELECT * FROM ({_REVIEW_DELTA.format(sign=sign, where=where)}) AS new
+        ON DUPLICATE KEY UPDATE
+            reviewCount = reviewDailyRollups.reviewCount + new.reviewCount,
+            ratingCount = reviewDailyRollups.ratingCount + new.ratingCount,
+            ratingSum = reviewDailyRollups.ratingSum + new.ratingSum;
+    ''', args)
+
+
+def add_reviews(cursor, where, args):
+    _apply_reviews(cursor, where, args, 1)
+
+
+def remove_reviews(cursor, where, args):
+    _apply_reviews(cursor, where, args, -1)
+
+
+#------------------------------------------------------------
+# Time series, aggregated into day / week / month buckets between
+# two optional dates (inclusive). Returns rows ordered by date:
+#   recipes: {date, count}
+#   reviews: {date, count, ratingCount, ratingSum}
+def _range(start, end):
+    where, args = [], []
+    if start is not None:
+        where.append('day >= %s')
+        args.append(start)
+    if end is not None:
+        where.append('day <= %s')
+        args.append(end)
+    return ''.join(f' AND {w}' for w in where), args
+
+
+# the series SQL and its arguments, as (sql, args); query_plans
+# EXPLAINs these too
+def recipe_series_query(bucket='day', start=None, end=None):
+    where, args = _range(start, end)
+    return f'''
+        SELECT {BUCKETS[bucket]} AS date, CAST(SUM(recipeCount) AS SIGNED) AS count
+        FROM recipeDailyRollups
+        WHERE dimension = 'all'{where}
+        GROUP BY date
+        HAVING count > 0
+        ORDER BY date;
+    ''', args
+
+
+def review_series_query(bucket='day', start=None, end=None):
+    where, args = _range(start, end)
+    return f'''
+        SELECT {BUCKETS[bucket]} AS date, CAST(SUM(reviewCount) AS SIGNED) AS count,
+               CAST(SUM(ratingCount) AS SIGNED) AS ratingCount, CAST(SUM(ratingSum) AS SIGNED) AS ratingSum
+        FROM reviewDailyRollups
+        WHERE 1 = 1{where}
+        GROUP BY date
+        HAVING count > 0
+        ORDER BY date;
+    ''', args
+
+
+def recipe_series(cursor, bucket='day', start=None, end=None):
+    cursor.execute(*recipe_series_query(bucket, start, end))
+    return cursor.fetchall()
+
+
+def review_series(cursor, bucket='day', start=None, end=None):
+    cursor.execute(*review_series_query(bucket, start, end))
+    return cursor.fetchall()
+
+
+#------------------------------------------------------------
+# Recomputes every rollup from the recipes and reviews tables
+# (the backfill)
+def rebuild_rollups(cursor):
+    cursor.execute('DELETE FROM recipeDailyRollups;')
+    cursor.execute('DELETE FROM recipeRollupTotals;')
+    delta = _DELTA_SELECT.format(sign=1, where='', where_r='')
+    cursor.execute(f'''
+        INSERT INTO recipeDailyRollups (day, dimension, dimKey, recipeCount)
+        {delta};
+    ''')
+    cursor.execute('''
+        INSERT INTO recipeRollupTotals (dimension, dimKey, recipeCount)
+        SELECT dimension, dimKey, SUM(recipeCount)
+        FROM recipeDailyRollups
+        GROUP BY dimension, dimKey;
+    ''')
+    cursor.execute('DELETE FROM reviewDailyRollups;')
+    cursor.execute(f'''
+        INSERT INTO reviewDailyRollups (day, reviewCount, ratingCount, ratingSum)
+        {_REVIEW_DELTA.format(sign=1, where='1 = 1')};
+    ''')
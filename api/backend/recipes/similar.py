@@ -0,0 +1,296 @@
+#------------------------------------------------------------
+# "Similar recipes" from shared ingredients.
+#
+# Recipes are rows of a sparse recipe x ingredient matrix, kept as
+# plain numpy arrays in CSR form (for reading a recipe's row) and
+# CSC form (for reading which recipes use an ingredient). Weights
+# are TF-IDF style (an ingredient in few recipes counts more than
+# salt) or binary, and every row is L2-normalized, so a dot product
+# is the cosine similarity.
+#
+# A query only walks the columns of the recipe's own ingredients:
+# their postings are concatenated and summed per recipe with one
+# np.bincount, then np.argpartition picks the top k. The cost grows
+# with how many recipes share an ingredient, not with the catalog.
+#
+# Routes keep it current a recipe at a time: a changed or deleted
+# recipe's row is switched off and new rows are held in a small
+# overlay that is scored directly. Once the overlay gets large, or
+# the matrix is older than max_age seconds, it is rebuilt from the
+# database while queries keep using the old copy.
+#------------------------------------------------------------
+import threading
+import time
+
+import numpy as np
+
+from backend.utils.generation import Generation
+
+# rebuild once this share of rows lives in the overlay
+OVERLAY_REBUILD_RATIO = 0.05
+OVERLAY_REBUILD_MIN = 500
+
+PAIRS_QUERY = 'SELECT recipeId, ingredientId FROM recipeIngredients;'
+
+
+class _Matrix(object):
+    # an immutable snapshot of the recipe x ingredient matrix
+    def __init__(self, recipe_ids, ingredient_ids, tfidf):
+        # (recipe, ingredient) pairs are a primary key in the database;
+        # dedupe anyway so a repeated pair can't count twice
+        pairs = np.unique(np.stack([np.asarray(recipe_ids, dtype=np.int64).reshape(-1),
+                                    np.asarray(ingredient_ids, dtype=np.int64).reshape(-1)]), axis=1)
+        recipe_ids, ingredient_ids = pairs[0], pairs[1]
+
+        self.recipe_ids, rows = np.unique(recipe_ids, return_inverse=True)
+        self.ingredient_ids, cols = np.unique(ingredient_ids, return_inverse=True)
+        n_rows, n_cols = len(self.recipe_ids), len(self.ingredient_ids)
+        self.row_of = {int(r): i for i, r in enumerate(self.recipe_ids)}
+        self.col_of = {int(c): j for j, c in enumerate(self.ingredient_ids)}
+
+        # document frequency per ingredient and smoothed idf
+        df = np.bincount(cols, minlength=n_cols)
+        if tfidf:
+            self.idf = (np.log((1.0 + n_rows) / (1.0 + df)) + 1.0).astype(np.float32)
+        else:
+            self.idf = np.ones(n_cols, dtype=np.float32)
+        self.max_idf = float(self.idf.max()) if n_cols else 1.0
+
+        weights = self.idf[cols]
+        norms = np.sqrt(np.bincount(rows, weights=weights.astype(np.float64) ** 2, minlength=n_rows))
+        weights = (weights / norms[rows]).astype(np.float32)
+
+        # CSR: row i's ingredients are indices[indptr[i]:indptr[i + 1]]
+        order = np.lexsort((cols, rows))
+        self.indices = cols[order].astype(np.int32)
+        self.data = weights[order]
+        self.indptr = np.zeros(n_rows + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=n_rows), out=self.indptr[1:])
+
+        # CSC: column j's recipes are col_rows[col_ptr[j]:col_ptr[j + 1]]
+        order = np.lexsort((rows, cols))
+        self.col_rows = rows[order].astype(np.int32)
+        self.col_data = weights[order]
+        self.col_ptr = np.zeros(n_cols + 1, dtype=np.int64)
+        np.cumsum(df, out=self.col_ptr[1:])
+
+        self.alive = np.ones(n_rows, dtype=bool)
+
+    @property
+    def nnz(self):
+        return len(self.data)
+
+    # weight an ingredient set the same way as the stored rows
+    def weigh(self, ingredient_ids):
+        ingredient_ids = sorted(set(int(i) for i in ingredient_ids))
+        if not ingredient_ids:
+            return {}
+        weights = np.array([self.idf[self.col_of[i]] if i in self.col_of else self.max_idf
+                            for i in ingredient_ids], dtype=np.float64)
+        weights /= np.sqrt((weights ** 2).sum())
+        return dict(zip(ingredient_ids, weights.tolist()))
+
+    def row_vector(self, row):
+        start, end = self.indptr[row], self.indptr[row + 1]
+        return {int(self.ingredient_ids[j]): float(w) for j, w in zip(self.indices[start:end], self.data[start:end])}
+
+    # cosine scores of one weighted ingredient vector against every row
+    def scores(self, vector):
+        cols = [self.col_of[i] for i in vector if i in self.col_of]
+        if not cols:
+            return np.zeros(len(self.recipe_ids), dtype=np.float32)
+        starts, ends = self.col_ptr[cols], self.col_ptr[np.array(cols) + 1]
+        lengths = ends - starts
+        # gather every posting of the query's columns in one go
+        offsets = np.repeat(starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+        positions = np.arange(lengths.sum()) + offsets
+        query_weights = np.repeat([vector[int(self.ingredient_ids[j])] for j in cols], lengths)
+        return np.bincount(self.col_rows[positions], weights=self.col_data[positions] * query_weights,
+                           minlength=len(self.recipe_ids))
+
+
+class SimilarRecipes(object):
+    def __init__(self, tfidf=True, max_age=600):
+        self.tfidf = tfidf
+        self.max_age = max_age
+        self._lock = threading.RLock()
+        self._rebuilding = threading.Lock()
+        self._matrix = None
+        self._overlay = {}       # recipeId -> {ingredientId: weight}
+        # (recipeId, ingredientIds) for every update made while a
+        # rebuild runs, replayed onto the new matrix before the swap
+        self._pending = None
+        self._stale = False
+        self.built_at = None
+        self.generation = Generation()
+
+    @property
+    def ready(self):
+        return (self.built_at is not None and not self._stale
+                and time.monotonic() - self.built_at < self.max_age)
+
+    def stats(self):
+        matrix = self._matrix
+        return {
+            'recipes': int(matrix.alive.sum()) + len(self._overlay) if matrix is not None else 0,
+            'ingredients': len(matrix.ingredient_ids) if matrix is not None else 0,
+            'nnz': matrix.nnz if matrix is not None else 0,
+            'overlay': len(self._overlay),
+        }
+
+    #------------------------------------------------------------
+    # Building and incremental updates
+
+    # Swaps in a matrix of the given pairs. Updates recorded since
+    # build() started reading them go to the old matrix as usual and
+    # are replayed onto the new one under the same lock as the swap.
+    def build_from_pairs(self, recipe_ids, ingredient_ids):
+        matrix = _Matrix(recipe_ids, ingredient_ids, self.tfidf)
+        with self._lock:
+            self._matrix = matrix
+            self._overlay = {}
+            self._stale = False
+            self.built_at = time.monotonic()
+            self.generation.reset()
+            for recipe_id, recipe_ingredient_ids in self._pending or ():
+                self._apply(recipe_id, recipe_ingredient_ids)
+            self._pending = None
+
+    def build(self, cursor):
+        with self._lock:
+            self._pending = []
+        try:
+            cursor.execute(PAIRS_QUERY)
+            pairs = cursor.fetchall()
+            self.build_from_pairs([p['recipeId'] for p in pairs], [p['ingredientId'] for p in pairs])
+        except Exception:
+            with self._lock:
+                self._pending = None
+            raise
+
+    def ensure_built(self, cursor):
+        if self.ready:
+            return
+        acquired = self._rebuilding.acquire(blocking=self.built_at is None)
+        if not acquired:
+            return
+        try:
+            if not self.ready:
+                self.build(cursor)
+        finally:
+            self._rebuilding.release()
+
+    def invalidate(self):
+        self._stale = True
+
+    # re-reads one recipe's ingredients after it was added or changed
+    def refresh_recipe(self, cursor, recipe_id):
+        if self._matrix is None and self._pending is None:
+            return
+        cursor.execute('SELECT ingredientId FROM recipeIngredients WHERE recipeId = %s;', (recipe_id,))
+        ingredient_ids = [row['ingredientId'] for row in cursor.fetchall()]
+        with self._lock:
+            self._record(int(recipe_id), ingredient_ids)
+
+    def remove_recipe(self, recipe_id):
+        with self._lock:
+            self._record(int(recipe_id), [])
+
+    def _record(self, recipe_id, ingredient_ids):
+        self._apply(recipe_id, ingredient_ids)
+        if self._pending is not None:
+            self._pending.append((recipe_id, ingredient_ids))
+
+    # replaces a recipe's row with an overlay entry (none if it has
+    # no ingredients left)
+    def _apply(self, recipe_id, ingredient_ids):
+        if self._matrix is None:
+            return
+        self._remove(recipe_id)
+        if ingredient_ids:
+            self._overlay[recipe_id] = self._matrix.weigh(ingredient_ids)
+        limit = max(OVERLAY_REBUILD_MIN, OVERLAY_REBUILD_RATIO * len(self._matrix.recipe_ids))
+        if len(self._overlay) > limit:
+            self._stale = True
+        self.generation.bump()
+
+    def _remove(self, recipe_id):
+        self._overlay.pop(recipe_id, None)
+        row = self._matrix.row_of.get(recipe_id)
+        if row is not None:
+            self._matrix.alive[row] = False
+
+    #------------------------------------------------------------
+    # Querying
+
+    # Returns up to k (recipeId, score) pairs for the recipes most
+    # similar to recipe_id, best first; None if the recipe is unknown
+    def similar(self, recipe_id, k=10):
+        recipe_id = int(recipe_id)
+        with self._lock:
+            matrix = self._matrix
+            if matrix is None:
+                return None
+            if recipe_id in self._overlay:
+                vector = self._overlay[recipe_id]
+            elif recipe_id in matrix.row_of and matrix.alive[matrix.row_of[recipe_id]]:
+                vector = matrix.row_vector(matrix.row_of[recipe_id])
+            else:
+                return None
+            overlay = list(self._overlay.items())
+            alive = matrix.alive.copy()
+
+        scores = matrix.scores(vector)
+        scores[~alive] = 0.0
+        if recipe_id in matrix.row_of:
+            scores[matrix.row_of[recipe_id]] = 0.0
+
+        candidates = []
+        if k < len(scores):
+            top = np.argpartition(-scores, k)[:k]
+        else:
+            top = np.arange(len(scores))
+        for row in top:
+            if scores[row] > 0:
+                candidates.append((int(matrix.recipe_ids[row]), float(scores[row])))
+
+        # recipes added since the last build are scored directly
+        for other_id, other in overlay:
+            if other_id == recipe_id:
+                continue
+            score = sum(w * other[i] for i, w in vector.items() if i in other)
+            if score > 0:
+                candidates.append((other_id, score))
+
+        candidates.sort(key=lambda item: (-item[1], item[0]))
+        return candidates[:k]
+
+
+similar_recipes = SimilarRecipes()
+
+
+#------------------------------------------------------------
+# Times queries on a synthetic catalog of n_recipes, each using
+# per_recipe ingredients drawn from n_ingredients with a Zipf-like
+# popularity (a few staples everywhere, a long tail of rare ones).
+# Returns build time and query latency percentiles in milliseconds.
+def benchmark(n_recipes=100000, n_ingredients=2000, per_recipe=9, queries=1000, k=10, tfidf=True, seed=0):
+    rng = np.random.default_rng(seed)
+    popularity = 1.0 / np.arange(1, n_ingredients + 1)
+    popularity /= popularity.sum()
+    recipe_ids = np.repeat(np.arange(1, n_recipes + 1), per_recipe)
+    ingredient_ids = rng.choice(n_ingredients, n_recipes * per_recipe, p=popularity) + 1
+
+    index = SimilarRecipes(tfidf=tfidf)
+    started = time.perf_counter()
+    index.build_from_pairs(recipe_ids, ingredient_ids)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    latencies = []
+    for recipe_id in rng.integers(1, n_recipes + 1, queries):
+        started = time.perf_counter()
+        index.similar(recipe_id, k)
+        latencies.append((time.perf_counter() - started) * 1000)
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return dict(index.stats(), build_ms=build_ms, queries=queries,
+                p50_ms=float(p50), p95_ms=float(p95), p99_ms=float(p99), max_ms=float(max(latencies)))
@@ -1,10 +1,21 @@
 from flask import Flask
 
 from backend.db_connection import db
+from backend.cache import cache
+from backend.metrics import metrics
+from backend.db_connection.query_plans import check_plans_command
 from backend.challenges.challenges_routes import challenges_bp
 from backend.recipes.recipes_routes import recipes
 from backend.ingredients.ingredient_route import ingredients
 from backend.users.users_routes import users
+from backend.search.search_routes import search
+from backend.search.index import recipe_index
+from backend.pantry.pantry_routes import pantry
+from backend.pantry.matcher import pantry_matcher
+from backend.ingredients.substitutions import substitution_graph
+from backend.ingredients.trigram import ingredient_trigrams
+from backend.ingredients.suggest import ingredient_suggester
+from backend.recipes.similar import similar_recipes
 
 import os
 from dotenv import load_dotenv
@@ -33,10 +44,57 @@ def create_app():
     app.config['MYSQL_DATABASE_PORT'] = int(os.getenv('DB_PORT').strip())
     app.config['MYSQL_DATABASE_DB'] = os.getenv('DB_NAME').strip()  # Change this to your DB name
 
+    # connection pool settings (see backend/db_connection/pool.py).
+    # Stats are available in code through db.stats()
+    app.config['MYSQL_POOL_MIN_SIZE'] = int(os.getenv('DB_POOL_MIN_SIZE', '1'))
+    app.config['MYSQL_POOL_MAX_SIZE'] = int(os.getenv('DB_POOL_MAX_SIZE', '10'))
+    app.config['MYSQL_POOL_PRE_PING'] = os.getenv('DB_POOL_PRE_PING', 'true').strip().lower() in ('1', 'true', 'yes')
+    app.config['MYSQL_POOL_MAX_LIFETIME'] = int(os.getenv('DB_POOL_MAX_LIFETIME', '3600'))
+    app.config['MYSQL_POOL_TIMEOUT'] = float(os.getenv('DB_POOL_TIMEOUT', '10'))
+
     # Initialize the database object with the settings above. 
     app.logger.info('current_app(): starting the database connection')
     db.init_app(app)
 
+    # response cache for the hot read routes (see backend/cache).
+    # CACHE_BACKEND is memory (per-process LRU), redis, or local
+    # (an in-process stand-in for redis). Counters: cache.stats()
+    app.config['CACHE_ENABLED'] = os.getenv('CACHE_ENABLED', 'true').strip().lower() in ('1', 'true', 'yes')
+    app.config['CACHE_BACKEND'] = os.getenv('CACHE_BACKEND', 'memory').strip()
+    app.config['CACHE_MAX_ENTRIES'] = int(os.getenv('CACHE_MAX_ENTRIES', '1024'))
+    app.config['CACHE_DEFAULT_TTL'] = int(os.getenv('CACHE_DEFAULT_TTL', '60'))
+    app.config['CACHE_REDIS_URL'] = os.getenv('CACHE_REDIS_URL', 'redis://localhost:6379/0').strip()
+    cache.init_app(app)
+
+    # request metrics, served at GET /metrics (see backend/metrics).
+    # Set METRICS_DIR when running several workers so every scrape
+    # reports all of them
+    app.config['METRICS_ENABLED'] = os.getenv('METRICS_ENABLED', 'true').strip().lower() in ('1', 'true', 'yes')
+    app.config['METRICS_DIR'] = os.getenv('METRICS_DIR', '').strip() or None
+    app.config['METRICS_FLUSH_INTERVAL'] = float(os.getenv('METRICS_FLUSH_INTERVAL', '5'))
+    metrics.init_app(app)
+    metrics.add_collector('db_pool', db.stats, counters=('checkouts', 'waits', 'timeouts', 'created', 'discarded'))
+    metrics.add_collector('cache', cache.stats,
+                          counters=('hits', 'misses', 'invalidations', 'evictions', 'expirations', 'errors'))
+    metrics.add_collector('search_index', lambda: {'recipes': len(recipe_index), 'ready': recipe_index.ready})
+    metrics.add_collector('similar_index', similar_recipes.stats)
+    metrics.add_collector('pantry_index', pantry_matcher.stats)
+    metrics.add_collector('substitution_graph', substitution_graph.stats)
+
+    # the in-memory search indexes are rebuilt from the database once
+    # they are this many seconds old, to pick up writes made by other workers
+    recipe_index.max_age = int(os.getenv('SEARCH_INDEX_MAX_AGE', '600'))
+    ingredient_trigrams.max_age = recipe_index.max_age
+    ingredient_suggester.max_age = recipe_index.max_age
+    similar_recipes.max_age = recipe_index.max_age
+    pantry_matcher.max_age = recipe_index.max_age
+    substitution_graph.max_age = recipe_index.max_age
+
+    # how many substitution edges a chain may follow, and in how many
+    # recipes an edge must appear to apply to every recipe
+    substitution_graph.depth = int(os.getenv('SUBSTITUTION_DEPTH', '2'))
+    substitution_graph.min_recipes = int(os.getenv('SUBSTITUTION_MIN_RECIPES', '2'))
+
 
     # Register the routes from each Blueprint with the app object
     # and give a url prefix to each
@@ -45,6 +103,11 @@ def create_app():
     app.register_blueprint(recipes)
     app.register_blueprint(ingredients)
     app.register_blueprint(users)
+    app.register_blueprint(search)
+    app.register_blueprint(pantry)
+
+    # maintenance commands, run with `flask --app backend_app <command>`
+    app.cli.add_command(check_plans_command)
 
     # Don't forget to return the app object
     return app
\ No newline at end of file
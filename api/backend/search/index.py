@@ -0,0 +1,247 @@
+#------------------------------------------------------------
+# In-memory inverted index over recipes with BM25 ranking.
+#
+# Every recipe is a document made of its title, description,
+# instructions and category names. Fields are weighted (a title
+# hit counts more than an instructions hit) and folded into one
+# term frequency per term, BM25F-style. A query only touches the
+# posting lists of its own terms, so its cost depends on how many
+# recipes match, not on the size of the catalog.
+#
+# The last query word is also matched as a prefix ("chick" finds
+# "chickpea"), using a sorted vocabulary and bisect. Results come
+# out of a top-k heap.
+#
+# The routes keep the index current one recipe at a time
+# (refresh_recipe / remove_recipe). It is built from the database
+# on first use, and rebuilt once it is older than max_age seconds
+# so writes made by other worker processes are picked up too.
+#------------------------------------------------------------
+import bisect
+import heapq
+import math
+import re
+import threading
+import time
+from collections import defaultdict
+
+FIELD_WEIGHTS = {
+    'title': 3.0,
+    'categories': 2.0,
+    'description': 1.0,
+    'instructions': 1.0,
+}
+
+STOPWORDS = {
+    'a', 'an', 'and', 'the', 'of', 'with', 'in', 'on', 'for', 'to', 'or', 'is', 'it', 'at', 'by',
+}
+
+# prefix matches score a little lower than exact matches
+PREFIX_WEIGHT = 0.8
+MAX_PREFIX_EXPANSIONS = 50
+
+_TOKEN = re.compile(r'[a-z0-9]+')
+
+_DOC_QUERY = '''
+    SELECT r.recipeId, r.title, r.description, r.instructions,
+           GROUP_CONCAT(c.categoryName SEPARATOR ' ') AS categories
+    FROM recipes r
+    LEFT JOIN categories c ON c.recipeId = r.recipeId
+'''
+
+
+def tokenize(text):
+    if not text:
+        return []
+    return [t for t in _TOKEN.findall(text.lower()) if t not in STOPWORDS]
+
+
+class RecipeSearchIndex(object):
+    def __init__(self, k1=1.2, b=0.75, max_age=600):
+        self.k1 = k1
+        self.b = b
+        self.max_age = max_age
+        self._lock = threading.RLock()
+        self._rebuilding = threading.Lock()
+        self._stale = False
+        # (recipeId, row or None) for every update made while a
+        # rebuild runs, replayed onto the new index before the swap
+        self._pending = None
+        self._clear()
+
+    def _clear(self):
+        self._postings = defaultdict(dict)   # term -> {recipeId: weighted tf}
+        self._doc_terms = {}                 # recipeId -> {term: weighted tf}
+        self._doc_len = {}                   # recipeId -> weighted length
+        self._total_len = 0.0
+        self._vocab = []                     # sorted list of terms
+        self.built_at = None
+
+    @property
+    def ready(self):
+        return (self.built_at is not None and not self._stale
+                and time.monotonic() - self.built_at < self.max_age)
+
+    def __len__(self):
+        return len(self._doc_len)
+
+    #------------------------------------------------------------
+    # Building and incremental updates
+
+    # Builds a fresh index off to the side and swaps it in, so
+    # queries keep using the old one while a rebuild runs. Updates
+    # that arrive meanwhile go to the old index and are recorded;
+    # they are replayed onto the new one, which may have read the
+    # recipes before them, under the same lock as the swap.
+    def build(self, cursor):
+        with self._lock:
+            self._pending = []
+        try:
+            cursor.execute(_DOC_QUERY + ' GROUP BY r.recipeId;')
+            fresh = RecipeSearchIndex(self.k1, self.b, self.max_age)
+            for row in cursor.fetchall():
+                fresh._add(row, sort_vocab=False)
+            fresh._vocab = sorted(fresh._postings)
+        except Exception:
+            with self._lock:
+                self._pending = None
+            raise
+        with self._lock:
+            for recipe_id, row in self._pending:
+                fresh._remove(recipe_id)
+                if row is not None:
+                    fresh._add(row)
+            self._pending = None
+            self._postings = fresh._postings
+            self._doc_terms = fresh._doc_terms
+            self._doc_len = fresh._doc_len
+            self._total_len = fresh._total_len
+            self._vocab = fresh._vocab
+            self._stale = False
+            self.built_at = time.monotonic()
+
+    # Builds on first use. Once the index is stale, one request
+    # rebuilds it while the others carry on with the old copy.
+    def ensure_built(self, cursor):
+        if self.ready:
+            return
+        # the very first build has nothing to fall back on, so wait
+        acquired = self._rebuilding.acquire(blocking=self.built_at is None)
+        if not acquired:
+            return
+        try:
+            if not self.ready:
+                self.build(cursor)
+        finally:
+            self._rebuilding.release()
+
+    # marks the index for a rebuild after bulk writes, where
+    # refreshing recipe by recipe would cost more than a rebuild
+    def invalidate(self):
+        self._stale = True
+
+    # re-reads one recipe from the database and replaces its document
+    def refresh_recipe(self, cursor, recipe_id):
+        if self.built_at is None:
+            return
+        cursor.execute(_DOC_QUERY + ' WHERE r.recipeId = %s GROUP BY r.recipeId;', (recipe_id,))
+        row = cursor.fetchone()
+        with self._lock:
+            self._remove(int(recipe_id))
+            if row is not None:
+                self._add(row)
+            if self._pending is not None:
+                self._pending.append((int(recipe_id), row))
+
+    def remove_recipe(self, recipe_id):
+        with self._lock:
+            self._remove(int(recipe_id))
+            if self._pending is not None:
+                self._pending.append((int(recipe_id), None))
+
+    def _add(self, row, sort_vocab=True):
+        recipe_id = row['recipeId']
+        terms = defaultdict(float)
+        for field, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(row.get(field)):
+                terms[token] += weight
+        if not terms:
+            return
+        self._doc_terms[recipe_id] = dict(terms)
+        length = sum(terms.values())
+        self._doc_len[recipe_id] = length
+        self._total_len += length
+        for term, tf in terms.items():
+            posting = self._postings[term]
+            if not posting and sort_vocab:
+                bisect.insort(self._vocab, term)
+            posting[recipe_id] = tf
+
+    def _remove(self, recipe_id):
+        terms = self._doc_terms.pop(recipe_id, None)
+        if terms is None:
+            return
+        self._total_len -= self._doc_len.pop(recipe_id)
+        for term in terms:
+            posting = self._postings[term]
+            posting.pop(recipe_id, None)
+            if not posting:
+                del self._postings[term]
+                i = bisect.bisect_left(self._vocab, term)
+                if i < len(self._vocab) and self._vocab[i] == term:
+                    del self._vocab[i]
+
+    #------------------------------------------------------------
+    # Querying
+
+    def _prefix_terms(self, prefix):
+        i = bisect.bisect_left(self._vocab, prefix)
+        found = []
+        while i < len(self._vocab) and self._vocab[i].startswith(prefix) and len(found) < MAX_PREFIX_EXPANSIONS:
+            found.append(self._vocab[i])
+            i += 1
+        return found
+
+    def _idf(self, term):
+        n = len(self._doc_len)
+        df = len(self._postings.get(term, ()))
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    # Returns up to k (recipeId, score) pairs, best first
+    def search(self, query, k=10, prefix=True):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+
+        with self._lock:
+            if not self._doc_len:
+                return []
+            avg_len = self._total_len / len(self._doc_len)
+            scores = defaultdict(float)
+
+            for position, token in enumerate(tokens):
+                # each query word scores through its exact term and, for
+                # the word being typed (the last one), every term it prefixes
+                expansions = [(token, 1.0)]
+                if prefix and position == len(tokens) - 1:
+                    expansions += [(t, PREFIX_WEIGHT) for t in self._prefix_terms(token) if t != token]
+
+                best = {}
+                for term, weight in expansions:
+                    posting = self._postings.get(term)
+                    if not posting:
+                        continue
+                    idf = self._idf(term)
+                    for recipe_id, tf in posting.items():
+                        norm = self.k1 * (1 - self.b + self.b * self._doc_len[recipe_id] / avg_len)
+                        score = weight * idf * tf * (self.k1 + 1) / (tf + norm)
+                        # a word counts once per recipe, via its best expansion
+                        if score > best.get(recipe_id, 0.0):
+                            best[recipe_id] = score
+                for recipe_id, score in best.items():
+                    scores[recipe_id] += score
+
+            return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+
+recipe_index = RecipeSearchIndex()
@@ -0,0 +1,49 @@
+from flask import Blueprint, request, jsonify, make_response
+from backend.db_connection import db
+from backend.search.index import recipe_index
+
+# ------------------------------------------------------------
+# Create a new Blueprint object for ranked search
+search = Blueprint('search', __name__)
+
+MAX_RESULTS = 100
+
+# ------------------------------------------------------------
+# Ranked full-text recipe search over titles, descriptions,
+# instructions and category names, e.g.
+#   GET /search/recipes?q=spicy chick&k=10
+# Returns the best k recipes (default 10) with their BM25 score,
+# best match first. The last word also matches as a prefix.
+@search.route('/search/recipes', methods=['GET'])
+def search_recipes_ranked():
+    q = request.args.get('q', '')
+    try:
+        k = max(1, min(int(request.args.get('k', 10)), MAX_RESULTS))
+    except ValueError:
+        return make_response({'error': 'k must be an integer'}, 400)
+
+    cursor = db.get_db().cursor()
+    recipe_index.ensure_built(cursor)
+    hits = recipe_index.search(q, k)
+    if not hits:
+        return make_response(jsonify([]), 200)
+
+    ids = [recipe_id for recipe_id, _ in hits]
+    placeholders = ', '.join(['%s'] * len(ids))
+    cursor.execute(f'''
+        SELECT r.recipeId, r.title, r.description, r.difficulty, r.calories, r.chefId, r.datePosted, r.prepTime, r.servings, u.username as chefName
+        FROM recipes r JOIN users u ON r.chefId = u.userId
+        WHERE r.recipeId IN ({placeholders});
+    ''', ids)
+    rows = {row['recipeId']: row for row in cursor.fetchall()}
+
+    theData = []
+    for recipe_id, score in hits:
+        if recipe_id in rows:
+            row = rows[recipe_id]
+            row['score'] = round(score, 4)
+            theData.append(row)
+
+    response = make_response(jsonify(theData))
+    response.status_code = 200
+    return response
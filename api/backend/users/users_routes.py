@@ -1,18 +1,28 @@
 from flask import Blueprint, request, jsonify, make_response, current_app
 import json
 from backend.db_connection import db
+from backend.cache.conditional import conditional, bump_versions
+from backend.recipes.ratings import refresh_ratings
+from backend.recipes.rollups import remove_recipes, remove_reviews
+from backend.recipes.similar import similar_recipes
+from backend.pantry.matcher import pantry_matcher
+from backend.ingredients.substitutions import substitution_graph
+from backend.search.index import recipe_index
+from backend.cache import cache
 
 users = Blueprint('users', __name__)
 
 # Get all user profiles
-@users.route('/users', methods=['GET'])
-def get_all_users():
-    cursor = db.get_db().cursor()
-    the_query = '''
+ALL_USERS_QUERY = '''
         SELECT userId, username, firstName, lastName, email
         FROM users
     '''
-    cursor.execute(the_query)
+
+@users.route('/users', methods=['GET'])
+@conditional('users')
+def get_all_users():
+    cursor = db.get_db().cursor()
+    cursor.execute(ALL_USERS_QUERY)
     theData = cursor.fetchall()
     the_response = make_response(theData)
     the_response.status_code = 200
@@ -20,16 +30,62 @@ def get_all_users():
     return the_response
 
 # Get a specific user profile
+USER_QUERY = 'SELECT * FROM users WHERE userId = %s'
+
 @users.route('/users/<userId>', methods=['GET'])
+@conditional('users')
 def get_user(userId):
     current_app.logger.info('GET /users/<userId> route')
     cursor = db.get_db().cursor()
-    cursor.execute('SELECT * FROM users WHERE userId = %s', (userId))
+    cursor.execute(USER_QUERY, (userId,))
     theData = cursor.fetchall()
     the_response = make_response(jsonify(theData))
     the_response.status_code = 200
     return the_response
 
+# ------------------------------------------------------------
+# Everything a profile page shows in one response: the user, the
+# recipes they posted (with their rating summary) and the
+# challenges they have taken on. The three queries run at the same
+# time on separate pooled connections (see run_parallel).
+PROFILE_RECIPES_QUERY = '''
+            SELECT r.*, rr.ratingCount, rr.ratingSum
+            FROM recipes r
+            LEFT JOIN recipeRatings rr ON rr.recipeId = r.recipeId
+            WHERE r.chefId = %s
+            ORDER BY r.datePosted DESC, r.recipeId DESC
+        '''
+PROFILE_CHALLENGES_QUERY = 'SELECT * FROM challenges WHERE studentId = %s'
+
+@users.route('/users/<int:userId>/profile', methods=['GET'])
+@conditional('users', 'recipes', 'recipeRatings', 'challenges')
+def get_user_profile(userId):
+    def user(cursor):
+        cursor.execute(USER_QUERY, (userId,))
+        return cursor.fetchone()
+
+    def own_recipes(cursor):
+        cursor.execute(PROFILE_RECIPES_QUERY, (userId,))
+        return cursor.fetchall()
+
+    def challenges(cursor):
+        cursor.execute(PROFILE_CHALLENGES_QUERY, (userId,))
+        return cursor.fetchall()
+
+    user_row, recipe_rows, challenge_rows = db.run_parallel(user, own_recipes, challenges)
+    if user_row is None:
+        return make_response({'error': f'User {userId} not found'}, 404)
+
+    for row in recipe_rows:
+        count, total = row.pop('ratingCount'), row.pop('ratingSum')
+        row['avgRating'] = round(float(total) / count, 2) if count else None
+        row['ratingCount'] = count or 0
+
+    theData = {'user': user_row, 'recipes': recipe_rows, 'challenges': challenge_rows}
+    the_response = make_response(jsonify(theData))
+    the_response.status_code = 200
+    return the_response
+
 # Update a specific user's profile
 @users.route('/users', methods=['PUT'])
 def update_user():
@@ -53,13 +109,39 @@ def update_user():
     cursor = db.get_db().cursor()
     cursor.execute(query, data)
     db.get_db().commit()
+    bump_versions(db.get_db(), 'users')
+    cache.invalidate('users')
 
     return 'user updated!'
 
 # Delete a user profile
+REVIEWED_RECIPES_QUERY = 'SELECT DISTINCT recipeId FROM reviews WHERE userId = %s'
+OWN_RECIPES_QUERY = 'SELECT recipeId FROM recipes WHERE chefId = %s'
+
 @users.route('/users/<userId>', methods=['DELETE'])
 def delete_user(userId):
     cursor = db.get_db().cursor()
+    # their reviews are removed by ON DELETE CASCADE, so the rating
+    # summaries of the recipes they reviewed are recomputed afterwards
+    cursor.execute(REVIEWED_RECIPES_QUERY, (userId,))
+    reviewed = [row['recipeId'] for row in cursor.fetchall()]
+    # so do their recipes (and every review of those), which leave
+    # the report rollups first
+    cursor.execute(OWN_RECIPES_QUERY, (userId,))
+    own_recipes = [row['recipeId'] for row in cursor.fetchall()]
+    remove_recipes(cursor, own_recipes)
+    remove_reviews(cursor, 'userId = %s OR recipeId IN (SELECT recipeId FROM recipes WHERE chefId = %s)',
+                   [userId, userId])
     cursor.execute('DELETE FROM users WHERE userId = %s', (userId,))
+    refresh_ratings(cursor, reviewed)
     db.get_db().commit()
+    bump_versions(db.get_db(), 'users', 'recipes', 'recipeIngredients', 'categories', 'reviews', 'recipeRatings',
+                  'substitutions')
+    cache.invalidate('users', 'recipes', 'reviews')
+    for recipe_id in own_recipes:
+        recipe_index.remove_recipe(recipe_id)
+        similar_recipes.remove_recipe(recipe_id)
+        pantry_matcher.remove_recipe(recipe_id)
+    if own_recipes:
+        substitution_graph.invalidate()
     return 'user deleted!'
\ No newline at end of file
@@ -0,0 +1,30 @@
+#------------------------------------------------------------
+# Identifies the state of a per-process in-memory index, for
+# ETags (see backend/cache/conditional.py).
+#
+# Each gunicorn worker builds and updates its own copy of an index,
+# so two workers can hold different contents with the same number
+# of updates. The generation is therefore the process id, a random
+# token drawn on every full build and a count of the incremental
+# updates since that build: two equal generations always mean the
+# same contents.
+#------------------------------------------------------------
+import os
+
+
+class Generation(object):
+    def __init__(self):
+        self._token = None
+        self._changes = 0
+
+    # after a full build
+    def reset(self):
+        self._token = os.urandom(6).hex()
+        self._changes = 0
+
+    # after an incremental update
+    def bump(self):
+        self._changes += 1
+
+    def __str__(self):
+        return f'{os.getpid()}:{self._token}:{self._changes}'
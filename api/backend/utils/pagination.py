@@ -0,0 +1,101 @@
+#------------------------------------------------------------
+# Helpers for keyset (cursor) pagination on list routes that are
+# ordered newest first by a (date, id) pair.
+#
+# A page is requested with ?limit=N and, after the first page,
+# ?next=<token> where the token is whatever the previous page
+# returned. Instead of OFFSET the query continues from the last
+# row seen:
+#   WHERE date < last_date OR (date = last_date AND id < last_id)
+# so page 1000 costs the same as page 1.
+#
+# Passing ?all=true skips pagination and returns the plain list,
+# which is what these routes returned before.
+#------------------------------------------------------------
+import base64
+import json
+from datetime import datetime
+
+from flask import request, jsonify, make_response
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+class BadCursor(ValueError):
+    pass
+
+
+def wants_all():
+    return request.args.get('all', '').lower() in ('1', 'true', 'yes')
+
+
+def encode_cursor(date_value, id_value):
+    if isinstance(date_value, datetime):
+        date_value = date_value.isoformat()
+    raw = json.dumps([date_value, id_value]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        date_value, id_value = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(date_value), int(id_value)
+    except Exception:
+        raise BadCursor(f'invalid pagination cursor: {token!r}')
+
+
+#------------------------------------------------------------
+# Reads ?limit and ?next from the request.
+# Returns (limit, cursor) where cursor is None on the first page.
+def page_args():
+    try:
+        limit = int(request.args.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise BadCursor('limit must be an integer')
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    token = request.args.get('next')
+    cursor = decode_cursor(token) if token else None
+    return limit, cursor
+
+
+#------------------------------------------------------------
+# Builds the WHERE fragment and arguments that continue after
+# `cursor`. Returns ('', []) on the first page.
+def keyset_clause(date_col, id_col, cursor):
+    if cursor is None:
+        return '', []
+    last_date, last_id = cursor
+    sql = f'({date_col} < %s OR ({date_col} = %s AND {id_col} < %s))'
+    return sql, [last_date, last_date, last_id]
+
+
+#------------------------------------------------------------
+# Completes `query` (a SELECT without WHERE or ORDER BY) into one
+# page: the keyset condition, newest first, and limit + 1 rows so
+# page_response can tell if another page exists. Returns
+# (sql, args).
+def page_query(query, date_col, id_col, cursor, limit):
+    where, args = keyset_clause(date_col, id_col, cursor)
+    if where:
+        query += f' WHERE {where}'
+    query += f' ORDER BY {date_col} DESC, {id_col} DESC LIMIT %s;'
+    return query, args + [limit + 1]
+
+
+#------------------------------------------------------------
+# Turns the rows of a page into the JSON response. The query must
+# have fetched limit + 1 rows so we can tell if another page exists.
+#   {"items": [...], "next": "<token or null>"}
+def page_response(rows, limit, date_key, id_key):
+    next_token = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_token = encode_cursor(last[date_key], last[id_key])
+
+    response = make_response(jsonify({'items': rows, 'next': next_token}))
+    response.status_code = 200
+    return response
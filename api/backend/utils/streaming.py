@@ -0,0 +1,59 @@
+#------------------------------------------------------------
+# Streams a query result to the client instead of building the
+# whole list in memory. Rows are read from an unbuffered
+# (server-side) cursor in batches and encoded one at a time, so
+# memory stays flat no matter how big the table is and the first
+# bytes go out as soon as MySQL returns the first rows.
+#
+# Routes opt in with ?stream=json (a chunked JSON array) or
+# ?stream=ndjson (one JSON object per line).
+#------------------------------------------------------------
+from flask import request, current_app, Response, stream_with_context
+from backend.db_connection import db, TimedSSDictCursor
+
+STREAM_BATCH_SIZE = 500
+
+_MIMETYPES = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+#------------------------------------------------------------
+# Returns 'json' or 'ndjson' if the client asked for a streamed
+# response, otherwise None
+def stream_format():
+    fmt = request.args.get('stream', '').lower()
+    return fmt if fmt in _MIMETYPES else None
+
+
+def stream_query(sql, args=None, fmt='json', batch_size=STREAM_BATCH_SIZE):
+    cursor = db.get_db().cursor(TimedSSDictCursor)
+    # run the query before the response starts so SQL errors still
+    # turn into a normal 500 instead of a half-written body
+    cursor.execute(sql, args)
+    dumps = current_app.json.dumps
+
+    def generate():
+        try:
+            first = True
+            if fmt == 'json':
+                yield '['
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                if fmt == 'ndjson':
+                    yield ''.join(dumps(row) + '\n' for row in rows)
+                else:
+                    chunk = ','.join(dumps(row) for row in rows)
+                    yield chunk if first else ',' + chunk
+                    first = False
+            if fmt == 'json':
+                yield ']'
+        finally:
+            # an unbuffered cursor has to be drained before the
+            # connection goes back to the pool
+            cursor.close()
+
+    return Response(stream_with_context(generate()), mimetype=_MIMETYPES[fmt])
@@ -0,0 +1,106 @@
+#------------------------------------------------------------
+# Shared query arguments and downsampling for the time-series
+# report endpoints:
+#   ?bucket=day|week|month   size of each point (default day)
+#   ?start=YYYY-MM-DD        first day to include
+#   ?end=YYYY-MM-DD          last day to include
+#   ?max_points=N            most points to return (default 500)
+#
+# The database aggregates into buckets; when that still gives more
+# than max_points points, they are re-aggregated here into the next
+# coarser bucket (day -> week -> month, then runs of months) so the
+# payload (and the cost of plotting it) stays bounded however many
+# years the range covers.
+#------------------------------------------------------------
+import math
+from datetime import date, timedelta
+
+from flask import request
+
+BUCKETS = ('day', 'week', 'month')
+DEFAULT_MAX_POINTS = 500
+MAX_POINTS_LIMIT = 5000
+
+
+def _date_arg(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'{name} must be a date (YYYY-MM-DD)')
+
+
+#------------------------------------------------------------
+# Returns (bucket, start, end, max_points) from the query string;
+# raises ValueError with a message for the client on bad input
+def series_args():
+    bucket = request.args.get('bucket', 'day').lower()
+    if bucket not in BUCKETS:
+        raise ValueError(f'bucket must be one of {", ".join(BUCKETS)}')
+    start, end = _date_arg('start'), _date_arg('end')
+    if start and end and start > end:
+        raise ValueError('start must not be after end')
+    try:
+        max_points = int(request.args.get('max_points', DEFAULT_MAX_POINTS))
+    except ValueError:
+        raise ValueError('max_points must be an integer')
+    return bucket, start, end, max(1, min(max_points, MAX_POINTS_LIMIT))
+
+
+# first day of the week / month a bucket date falls in
+_BUCKET_START = {
+    'week': lambda day: day - timedelta(days=day.weekday()),
+    'month': lambda day: day.replace(day=1),
+}
+
+
+# sums `sum_keys` over consecutive rows whose dates map to the same
+# bucket start; rows must be oldest first
+def _regroup(rows, bucket_start, sum_keys):
+    merged = []
+    for row in rows:
+        start = bucket_start(row['date'])
+        if not merged or merged[-1]['date'] != start:
+            merged.append(dict({key: 0 for key in sum_keys}, date=start))
+        point = merged[-1]
+        for key in sum_keys:
+            point[key] += row[key] or 0
+    return merged
+
+
+#------------------------------------------------------------
+# Re-aggregates rows of `bucket` points into coarser buckets until
+# at most max_points remain: weeks, then months, then runs of whole
+# months (quarters, years, ...) counted from the first month. Points
+# are merged by the calendar, not by position, so gaps (buckets with
+# no rows) never stretch a merged point. Each point is dated by the
+# start of its bucket (a week goes in the month it starts in) and
+# carries the sum of `sum_keys` (counts, or the parts of an
+# average), so totals are preserved exactly.
+def downsample(rows, max_points, bucket='day', sum_keys=('count',)):
+    if len(rows) <= max_points:
+        return rows
+    for coarser in BUCKETS[BUCKETS.index(bucket) + 1:]:
+        merged = _regroup(rows, _BUCKET_START[coarser], sum_keys)
+        if len(merged) <= max_points:
+            return merged
+
+    first, last = rows[0]['date'], rows[-1]['date']
+    first_month = first.year * 12 + first.month - 1
+    months = math.ceil((last.year * 12 + last.month - first_month) / max_points)
+
+    def run_start(day):
+        month = first_month + (day.year * 12 + day.month - 1 - first_month) // months * months
+        return date(month // 12, month % 12 + 1, 1)
+
+    return _regroup(rows, run_start, sum_keys)
+
+
+# formats dates as YYYY-MM-DD for the client
+def iso_dates(rows):
+    for row in rows:
+        if hasattr(row['date'], 'isoformat'):
+            row['date'] = row['date'].isoformat()
+    return rows
@@ -0,0 +1,85 @@
+#------------------------------------------------------------
+# Canonical units for recipe quantities.
+#
+# recipeIngredients.unit is free text ("g", "tbsp", "cups", "pcs"),
+# so before quantities can be added up each unit is mapped to a
+# canonical one and a factor:
+#   mass    -> g   (kg, oz, lb, ...)
+#   volume  -> ml  (l, tsp, tbsp, cup, ...)
+#   count   -> pc  (pcs, piece, whole, ...)
+# Countable things that are not interchangeable with a plain piece
+# (a clove of garlic, a slice of bread) keep a canonical unit of
+# their own. Units not in the table are kept as written (trimmed,
+# lowercased) with a factor of 1, so they still merge with
+# themselves.
+#------------------------------------------------------------
+import numpy as np
+
+# alias -> (canonical unit, factor to the canonical unit)
+UNITS = {}
+
+
+def _add(canonical, factor, *aliases):
+    for alias in aliases:
+        UNITS[alias] = (canonical, factor)
+
+
+_add('g', 1.0, 'g', 'gr', 'gram', 'grams', 'gramme', 'grammes')
+_add('g', 1000.0, 'kg', 'kgs', 'kilogram', 'kilograms')
+_add('g', 0.001, 'mg', 'milligram', 'milligrams')
+_add('g', 28.349523125, 'oz', 'ounce', 'ounces')
+_add('g', 453.59237, 'lb', 'lbs', 'pound', 'pounds')
+
+_add('ml', 1.0, 'ml', 'milliliter', 'milliliters', 'millilitre', 'millilitres')
+_add('ml', 10.0, 'cl', 'centiliter', 'centiliters')
+_add('ml', 100.0, 'dl', 'deciliter', 'deciliters')
+_add('ml', 1000.0, 'l', 'liter', 'liters', 'litre', 'litres')
+_add('ml', 4.92892159375, 'tsp', 'tsps', 'teaspoon', 'teaspoons')
+_add('ml', 14.78676478125, 'tbsp', 'tbsps', 'tablespoon', 'tablespoons')
+_add('ml', 29.5735295625, 'fl oz', 'fluid ounce', 'fluid ounces')
+_add('ml', 236.5882365, 'cup', 'cups')
+_add('ml', 473.176473, 'pint', 'pints')
+_add('ml', 946.352946, 'quart', 'quarts')
+_add('ml', 3785.411784, 'gallon', 'gallons')
+
+_add('pc', 1.0, 'pc', 'pcs', 'piece', 'pieces', 'whole', 'each', 'ea', 'unit', 'units', 'x', '')
+_add('clove', 1.0, 'clove', 'cloves')
+_add('slice', 1.0, 'slice', 'slices')
+_add('fillet', 1.0, 'fillet', 'fillets')
+_add('leaf', 1.0, 'leaf', 'leaves')
+_add('sprig', 1.0, 'sprig', 'sprigs')
+_add('can', 1.0, 'can', 'cans', 'tin', 'tins')
+_add('pinch', 1.0, 'pinch', 'pinches')
+_add('bunch', 1.0, 'bunch', 'bunches')
+
+# bigger units to show totals in, once they reach 1 of them
+DISPLAY = {
+    'g': (('kg', 1000.0),),
+    'ml': (('l', 1000.0),),
+}
+
+
+def unit_key(unit):
+    return ' '.join((unit or '').strip().lower().rstrip('.').split())
+
+
+#------------------------------------------------------------
+# Maps an array of unit strings to (canonical unit per entry,
+# factor per entry). Each distinct spelling is looked up once.
+def normalize_units(units):
+    distinct, inverse = np.unique(np.asarray(units, dtype=str), return_inverse=True)
+    canonical = np.empty(len(distinct), dtype=object)
+    factors = np.ones(len(distinct), dtype=np.float64)
+    for i, unit in enumerate(distinct):
+        key = unit_key(unit)
+        canonical[i], factors[i] = UNITS.get(key, (key, 1.0))
+    return canonical[inverse], factors[inverse]
+
+
+# (quantity, unit) to show for an amount in a canonical unit,
+# e.g. 1500 g -> (1.5, 'kg')
+def display_amount(quantity, canonical):
+    for unit, factor in DISPLAY.get(canonical, ()):
+        if quantity >= factor:
+            return quantity / factor, unit
+    return quantity, canonical
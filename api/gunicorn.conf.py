@@ -0,0 +1,76 @@
+#------------------------------------------------------------
+# gunicorn settings for the production API (see wsgi.py).
+# Every value can be overridden from the environment (or the .env
+# file) without rebuilding the image.
+#
+# Graceful reload: `kill -HUP <master pid>` re-reads this file and
+# replaces the workers one by one, letting in-flight requests
+# finish. With preload_app the code is imported by the master, so
+# new code needs a new master: `kill -USR2 <master pid>` starts
+# one next to the old, then `kill -QUIT <old master pid>`.
+#------------------------------------------------------------
+import multiprocessing
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def _env_bool(name, default):
+    return os.getenv(name, default).strip().lower() in ('1', 'true', 'yes')
+
+
+bind = os.getenv('API_BIND', '0.0.0.0:4000')
+
+# one worker per core: the search, similar-recipes and pantry
+# indexes are CPU bound, and threads cover the time spent waiting
+# on MySQL
+workers = int(os.getenv('API_WORKERS', str(multiprocessing.cpu_count())))
+threads = int(os.getenv('API_THREADS', '4'))
+worker_class = 'gthread' if threads > 1 else 'sync'
+
+# seconds an idle keep-alive connection is held open, a silent
+# worker is killed and restarted, and workers get to finish their
+# requests on shutdown or reload
+keepalive = int(os.getenv('API_KEEPALIVE', '5'))
+timeout = int(os.getenv('API_TIMEOUT', '30'))
+graceful_timeout = int(os.getenv('API_GRACEFUL_TIMEOUT', '30'))
+
+# import the app once in the master and fork the workers from it,
+# so they start quickly and share its memory until they write to it
+preload_app = _env_bool('API_PRELOAD', 'true')
+
+# recycle a worker after this many requests (0 turns it off); the
+# jitter keeps the workers from all restarting at the same time
+max_requests = int(os.getenv('API_MAX_REQUESTS', '10000'))
+max_requests_jitter = int(os.getenv('API_MAX_REQUESTS_JITTER', '1000'))
+
+# where workers share their request metrics, so GET /metrics
+# reports all of them (see backend/metrics)
+os.environ.setdefault('METRICS_DIR', '/tmp/pantrypal-metrics')
+
+accesslog = os.getenv('API_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.getenv('API_LOG_LEVEL', 'info')
+
+
+# a worker must not reuse connections (or db.run_parallel threads)
+# inherited from the master
+def post_fork(server, worker):
+    from backend.db_connection import db
+    db.after_fork()
+
+
+# metrics left behind by an earlier run belong to other processes
+def on_starting(server):
+    directory = os.environ['METRICS_DIR']
+    os.makedirs(directory, exist_ok=True)
+    for name in os.listdir(directory):
+        os.remove(os.path.join(directory, name))
+
+
+# keep an exited worker's counters in the totals
+def child_exit(server, worker):
+    from backend.metrics.prometheus import retire
+    retire(os.environ['METRICS_DIR'], worker.pid)
@@ -0,0 +1,29 @@
+#------------------------------------------------------------
+# Shared setup for the unit tests. Run from api/ with
+#   python -m pytest tests
+#
+# The tests check the in-memory indexes and helpers against
+# brute-force versions on small random inputs, so they need no
+# database: the indexes that read through a cursor get a FakeCursor
+# that answers from a list of rows.
+#------------------------------------------------------------
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeCursor(object):
+    # answer(sql, args) returns the rows for one statement
+    def __init__(self, answer):
+        self.answer = answer
+        self.rows = []
+
+    def execute(self, sql, args=None):
+        self.rows = list(self.answer(sql, args))
+
+    def fetchall(self):
+        return self.rows
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
@@ -0,0 +1,135 @@
+import json
+import random
+
+import pytest
+
+from backend.recipes.importer import parse_line, summarize, ImportRowError, DIFFICULTIES, MAX_REPORTED_FAILURES
+
+# a usable value most of the time, otherwise one of the bad ones
+def pick(rng, good, bad):
+    return rng.choice(good) if rng.random() < 0.9 else rng.choice(bad)
+
+
+def random_record(rng):
+    record = {
+        'chefId': pick(rng, [3, '3'], [None, 'three']),
+        'title': pick(rng, ['Shakshuka', 'x' * 50], ['  ', 'x' * 51, 7, None]),
+        'description': pick(rng, ['Eggs in sauce'], ['', None]),
+        'instructions': rng.choice(['Simmer.', None, '']),
+        'prepTime': pick(rng, [25, '25'], [None, 'soon', '2.5']),
+        'servings': pick(rng, [2, '2.5'], [None, 'two']),
+        'difficulty': pick(rng, ['easy', 'HARD', 'Medium', None], ['extreme', 3]),
+        'calories': pick(rng, [420, None, ''], ['lots']),
+        'ingredients': [pick(rng, [
+            {'name': 'Tomato', 'quantity': 4, 'unit': 'whole'},
+            {'name': ' tomato ', 'quantity': '2', 'unit': 'cups'},
+            {'name': 'Egg', 'quantity': 3, 'unit': 'pcs'},
+        ], [{'name': 'Egg', 'quantity': None, 'unit': 'pcs'}, {'name': 'Egg', 'quantity': 1}, 'Salt'])
+            for _ in range(rng.randint(0, 3))],
+        'categories': [pick(rng, ['Breakfast', {'name': 'Vegetarian', 'description': 'no meat'}], [5, {}])
+                       for _ in range(rng.randint(0, 2))],
+    }
+    # optional fields may be left out altogether
+    return {key: value for key, value in record.items() if value is not None or rng.random() < 0.5}
+
+
+# brute force: spell every rule out in order, field by field
+def reference_parse(record):
+    def number(source, field, cast, required=True):
+        value = source.get(field)
+        if value is None or value == '':
+            if required:
+                raise ImportRowError(f'{field} is required')
+            return None
+        try:
+            return cast(value)
+        except (TypeError, ValueError):
+            raise ImportRowError(f'{field} must be a number')
+
+    def text(source, field, max_length=None, required=True):
+        value = source.get(field)
+        if value is None or (isinstance(value, str) and value.strip() == ''):
+            if required:
+                raise ImportRowError(f'{field} is required')
+            return None
+        if not isinstance(value, str):
+            raise ImportRowError(f'{field} must be a string')
+        if max_length is not None and len(value) > max_length:
+            raise ImportRowError(f'{field} is longer than {max_length} characters')
+        return value
+
+    recipe = {'chefId': number(record, 'chefId', int), 'title': text(record, 'title', 50),
+              'description': text(record, 'description'),
+              'instructions': text(record, 'instructions', required=False),
+              'prepTime': number(record, 'prepTime', int), 'servings': number(record, 'servings', float),
+              'difficulty': text(record, 'difficulty', required=False),
+              'calories': number(record, 'calories', int, required=False)}
+    if recipe['difficulty'] is not None:
+        recipe['difficulty'] = recipe['difficulty'].upper()
+        if recipe['difficulty'] not in DIFFICULTIES:
+            raise ImportRowError('bad difficulty')
+
+    by_name = {}
+    for item in record.get('ingredients') or []:
+        if not isinstance(item, dict):
+            raise ImportRowError('bad ingredient')
+        name = text(item, 'name', 50)
+        by_name[name.strip().lower()] = {'name': name.strip(), 'quantity': number(item, 'quantity', float),
+                                         'unit': text(item, 'unit', 255)}
+    recipe['ingredients'] = list(by_name.values())
+
+    recipe['categories'] = []
+    for item in record.get('categories') or []:
+        if isinstance(item, str):
+            item = {'name': item}
+        if not isinstance(item, dict):
+            raise ImportRowError('bad category')
+        recipe['categories'].append((text(item, 'name', 50), text(item, 'description', required=False)))
+    return recipe
+
+
+def outcome(parse, value):
+    try:
+        return parse(value)
+    except ImportRowError:
+        return ImportRowError
+
+
+@pytest.mark.parametrize('seed', range(300))
+def test_parse_line_matches_brute_force(seed):
+    rng = random.Random(seed)
+    record = random_record(rng)
+    line = json.dumps(record)
+    if rng.random() < 0.5:
+        line = line.encode('utf-8')
+    parsed = outcome(parse_line, line)
+    expected = outcome(reference_parse, record)
+    assert parsed == expected
+
+
+@pytest.mark.parametrize('line', ['{"title": ', '[1, 2]', '"recipe"', b'\xff'])
+def test_parse_line_rejects_non_objects(line):
+    with pytest.raises((ImportRowError, UnicodeDecodeError)):
+        parse_line(line)
+
+
+def random_report(rng):
+    failed = rng.randint(0, 400)
+    return {'rows': failed + rng.randint(0, 500), 'imported': rng.randint(0, 500), 'failed': failed,
+            'seconds': rng.random(), 'failures': [{'line': n} for n in range(failed)]}
+
+
+@pytest.mark.parametrize('seed', range(50))
+def test_summarize_matches_brute_force(seed):
+    rng = random.Random(seed)
+    reports = [random_report(rng) for _ in range(rng.randint(0, 8))]
+    summary = summarize(iter(reports))
+
+    assert summary['batches'] == len(reports)
+    for key in ('rows', 'imported', 'failed'):
+        assert summary[key] == sum(report[key] for report in reports)
+    seconds = round(sum(report['seconds'] for report in reports), 3)
+    assert summary['seconds'] == pytest.approx(seconds, abs=1e-9)
+    assert summary['rowsPerSecond'] == (round(summary['rows'] / seconds, 1) if seconds else None)
+    every_failure = [failure for report in reports for failure in report['failures']]
+    assert summary['failures'] == every_failure[:MAX_REPORTED_FAILURES]
@@ -0,0 +1,156 @@
+import random
+
+import pytest
+
+from backend.ingredients.substitutions import SubstitutionGraph
+from backend.pantry.matcher import PantryMatcher, COST_CLASSES
+from conftest import FakeCursor
+from test_substitutions import random_rows, reference_distances
+
+N_INGREDIENTS = 12
+
+
+def random_catalog(rng, n_recipes=15):
+    return {recipe_id: set(rng.sample(range(1, N_INGREDIENTS + 1), rng.randint(1, 6)))
+            for recipe_id in range(1, n_recipes + 1)}
+
+
+def build(catalog, costs):
+    matcher = PantryMatcher()
+    pairs = [(r, i) for r, ingredients in catalog.items() for i in ingredients]
+    matcher.build_from_pairs([r for r, _ in pairs], [i for _, i in pairs], costs)
+    return matcher
+
+
+# brute force: score every recipe on its own, sort everything
+def reference_match(catalog, costs, pantry, limit, min_coverage, max_missing, rows=None, depth=2):
+    results = []
+    for recipe_id, required in catalog.items():
+        swaps = {}
+        for i in sorted(required - pantry):
+            if rows is None:
+                continue
+            distances = reference_distances(rows, i, depth, 2, recipe_id)
+            options = [distances[s] for s in pantry if s in distances]
+            if options:
+                swaps[i] = min(options)
+        have = len(required & pantry) + len(swaps)
+        missing = sorted(required - pantry - set(swaps))
+        coverage = have / len(required)
+        if not have or coverage < min_coverage or (max_missing is not None and len(missing) > max_missing):
+            continue
+        cost = max((COST_CLASSES.index(costs.get(i)) for i in missing), default=0)
+        results.append({'recipeId': recipe_id, 'coverage': coverage, 'required': len(required),
+                        'present': len(required & pantry), 'substituted': len(swaps), 'missing': len(missing),
+                        'missingCost': cost, 'missingIngredients': missing, 'depths': swaps})
+    results.sort(key=lambda r: (-r['coverage'], r['missing'], r['substituted'], r['missingCost'], r['recipeId']))
+    for result in results:
+        result['coverage'] = round(result['coverage'], 4)
+        result['missingCost'] = COST_CLASSES[result['missingCost']]
+    return results[:limit]
+
+
+def check(matches, expected):
+    assert [m['recipeId'] for m in matches] == [e['recipeId'] for e in expected]
+    for match, want in zip(matches, expected):
+        for key in ('coverage', 'required', 'present', 'substituted', 'missing', 'missingCost'):
+            assert match[key] == want[key], key
+        assert sorted(match['missingIngredients']) == want['missingIngredients']
+        assert {s['ingredientId']: s['depth'] for s in match['substitutions']} == want['depths']
+
+
+def random_query(rng):
+    pantry = set(rng.sample(range(1, N_INGREDIENTS + 1), rng.randint(1, 8)))
+    limit = rng.randint(1, 20)
+    min_coverage = rng.choice([0.0, 0.3, 0.5, 1.0])
+    max_missing = rng.choice([None, 0, 1, 3])
+    return pantry, limit, min_coverage, max_missing
+
+
+@pytest.mark.parametrize('seed', range(60))
+def test_match_matches_brute_force(seed):
+    rng = random.Random(seed)
+    catalog = random_catalog(rng)
+    costs = {i: rng.choice(COST_CLASSES) for i in range(1, N_INGREDIENTS + 1)}
+    matcher = build(catalog, costs)
+
+    for _ in range(5):
+        pantry, limit, min_coverage, max_missing = random_query(rng)
+        check(matcher.match(pantry, limit, min_coverage, max_missing),
+              reference_match(catalog, costs, pantry, limit, min_coverage, max_missing))
+
+
+@pytest.mark.parametrize('seed', range(60))
+def test_match_with_substitutes_matches_brute_force(seed):
+    rng = random.Random(seed)
+    catalog = random_catalog(rng)
+    costs = {i: rng.choice(COST_CLASSES) for i in range(1, N_INGREDIENTS + 1)}
+    rows = random_rows(rng, n_ingredients=N_INGREDIENTS, n_rows=30, n_recipes=15)
+    graph = SubstitutionGraph(depth=2, min_recipes=2)
+    graph.build_from_rows(rows)
+    matcher = build(catalog, costs)
+
+    for _ in range(5):
+        pantry, limit, min_coverage, max_missing = random_query(rng)
+        check(matcher.match(pantry, limit, min_coverage, max_missing, graph),
+              reference_match(catalog, costs, pantry, limit, min_coverage, max_missing, rows))
+
+
+@pytest.mark.parametrize('seed', range(30))
+def test_updates_after_build_match_brute_force(seed):
+    rng = random.Random(seed)
+    catalog = random_catalog(rng)
+    costs = {i: rng.choice(COST_CLASSES) for i in range(1, N_INGREDIENTS + 1)}
+    matcher = build(catalog, costs)
+
+    cursor = FakeCursor(lambda sql, args: [{'ingredientId': i} for i in sorted(catalog.get(args[0], ()))])
+    for _ in range(6):
+        recipe_id = rng.randint(1, 20)
+        if rng.random() < 0.3:
+            catalog.pop(recipe_id, None)
+            matcher.remove_recipe(recipe_id)
+        else:
+            catalog[recipe_id] = set(rng.sample(range(1, N_INGREDIENTS + 1), rng.randint(1, 6)))
+            matcher.refresh_recipe(cursor, recipe_id)
+
+    rows = random_rows(rng, n_ingredients=N_INGREDIENTS, n_rows=30, n_recipes=20)
+    graph = SubstitutionGraph(depth=2, min_recipes=2)
+    graph.build_from_rows(rows)
+    for _ in range(5):
+        pantry, limit, min_coverage, max_missing = random_query(rng)
+        check(matcher.match(pantry, limit, min_coverage, max_missing),
+              reference_match(catalog, costs, pantry, limit, min_coverage, max_missing))
+        check(matcher.match(pantry, limit, min_coverage, max_missing, graph),
+              reference_match(catalog, costs, pantry, limit, min_coverage, max_missing, rows))
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_updates_during_a_rebuild_are_kept(seed):
+    rng = random.Random(seed)
+    built = random_catalog(rng)
+    costs = {i: rng.choice(COST_CLASSES) for i in range(1, N_INGREDIENTS + 1)}
+    matcher = build(built, costs)
+
+    # the rebuild reads `built`; these writes land after that read
+    # but before the new arrays are swapped in
+    catalog = {recipe_id: set(ingredients) for recipe_id, ingredients in built.items()}
+    cursor = FakeCursor(lambda sql, args: [{'ingredientId': i} for i in sorted(catalog.get(args[0], ()))])
+
+    def during_rebuild(sql, args):
+        if 'cost' in sql:
+            return [{'ingredientId': i, 'cost': cost} for i, cost in costs.items() if cost is not None]
+        for _ in range(4):
+            recipe_id = rng.randint(1, 20)
+            if rng.random() < 0.3:
+                catalog.pop(recipe_id, None)
+                matcher.remove_recipe(recipe_id)
+            else:
+                catalog[recipe_id] = set(rng.sample(range(1, N_INGREDIENTS + 1), rng.randint(1, 6)))
+                matcher.refresh_recipe(cursor, recipe_id)
+        return [{'recipeId': r, 'ingredientId': i} for r, ingredients in built.items() for i in ingredients]
+
+    matcher.build(FakeCursor(during_rebuild))
+    for _ in range(5):
+        pantry, limit, min_coverage, max_missing = random_query(rng)
+        check(matcher.match(pantry, limit, min_coverage, max_missing),
+              reference_match(catalog, costs, pantry, limit, min_coverage, max_missing))
@@ -0,0 +1,139 @@
+import math
+import random
+
+import pytest
+
+from backend.search.index import RecipeSearchIndex, FIELD_WEIGHTS, PREFIX_WEIGHT, MAX_PREFIX_EXPANSIONS, tokenize
+from conftest import FakeCursor
+
+WORDS = ['chicken', 'chickpea', 'chick', 'curry', 'tomato', 'soup', 'roast', 'lemon', 'garlic', 'bread',
+         'the', 'with', 'quick', 'easy', 'stew', 'salad', 'rice', 'spicy', 'vegan', 'cake']
+
+
+def random_text(rng, n):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(0, n))) or rng.choice([None, ''])
+
+
+def random_row(rng, recipe_id):
+    return {'recipeId': recipe_id, 'title': random_text(rng, 3), 'description': random_text(rng, 8),
+            'instructions': random_text(rng, 12), 'categories': random_text(rng, 2)}
+
+
+def answer(rows):
+    # the build query reads every row; refresh_recipe reads one
+    def run(sql, args):
+        if args:
+            return [rows[args[0]]] if args[0] in rows else []
+        return list(rows.values())
+    return run
+
+
+# brute force: BM25F over every document, straight from the definition
+def reference_search(rows, query, k, prefix=True, k1=1.2, b=0.75):
+    docs = {}
+    for row in rows:
+        terms = {}
+        for field, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(row.get(field)):
+                terms[token] = terms.get(token, 0.0) + weight
+        if terms:
+            docs[row['recipeId']] = terms
+    tokens = tokenize(query)
+    if not tokens or not docs:
+        return {}
+    avg_len = sum(sum(terms.values()) for terms in docs.values()) / len(docs)
+    vocab = sorted({term for terms in docs.values() for term in terms})
+
+    scores = {}
+    for position, token in enumerate(tokens):
+        expansions = [(token, 1.0)]
+        if prefix and position == len(tokens) - 1:
+            expanded = [t for t in vocab if t.startswith(token)][:MAX_PREFIX_EXPANSIONS]
+            expansions += [(t, PREFIX_WEIGHT) for t in expanded if t != token]
+        for recipe_id, terms in docs.items():
+            best = 0.0
+            for term, weight in expansions:
+                if term not in terms:
+                    continue
+                df = sum(1 for other in docs.values() if term in other)
+                idf = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+                tf = terms[term]
+                norm = k1 * (1 - b + b * sum(terms.values()) / avg_len)
+                best = max(best, weight * idf * tf * (k1 + 1) / (tf + norm))
+            if best > 0:
+                scores[recipe_id] = scores.get(recipe_id, 0.0) + best
+    return scores
+
+
+def random_query(rng):
+    words = [rng.choice(WORDS) for _ in range(rng.randint(1, 3))]
+    words[-1] = words[-1][:rng.randint(1, len(words[-1]))]
+    return rng.choice([' '.join(words), ' '.join(words).upper(), 'the with', ''])
+
+
+def check(index, rows, rng):
+    query, k, prefix = random_query(rng), rng.randint(1, 15), rng.random() < 0.7
+    found = index.search(query, k, prefix)
+    expected = reference_search(rows, query, k, prefix)
+    assert [score for _, score in found] == pytest.approx(sorted(expected.values(), reverse=True)[:k])
+    for recipe_id, score in found:
+        assert score == pytest.approx(expected[recipe_id])
+
+
+@pytest.mark.parametrize('seed', range(60))
+def test_search_matches_brute_force(seed):
+    rng = random.Random(seed)
+    rows = {i: random_row(rng, i) for i in range(1, 25)}
+    index = RecipeSearchIndex()
+    index.build(FakeCursor(answer(rows)))
+    for _ in range(10):
+        check(index, list(rows.values()), rng)
+
+
+@pytest.mark.parametrize('seed', range(30))
+def test_updates_after_build_match_brute_force(seed):
+    rng = random.Random(seed)
+    rows = {i: random_row(rng, i) for i in range(1, 20)}
+    index = RecipeSearchIndex()
+    cursor = FakeCursor(answer(rows))
+    index.build(cursor)
+
+    for _ in range(8):
+        recipe_id = rng.randint(1, 25)
+        if rng.random() < 0.3:
+            rows.pop(recipe_id, None)
+            index.remove_recipe(recipe_id)
+        else:
+            rows[recipe_id] = random_row(rng, recipe_id)
+            index.refresh_recipe(cursor, recipe_id)
+
+    for _ in range(10):
+        check(index, list(rows.values()), rng)
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_updates_during_a_rebuild_are_kept(seed):
+    rng = random.Random(seed)
+    rows = {i: random_row(rng, i) for i in range(1, 20)}
+    index = RecipeSearchIndex()
+    index.build(FakeCursor(answer(rows)))
+
+    # the rebuild reads the old rows; these writes land after that
+    # read but before the new index is swapped in
+    read = answer(dict(rows))
+
+    def during_rebuild(sql, args):
+        result = read(sql, args)
+        for _ in range(4):
+            recipe_id = rng.randint(1, 25)
+            if rng.random() < 0.3:
+                rows.pop(recipe_id, None)
+                index.remove_recipe(recipe_id)
+            else:
+                rows[recipe_id] = random_row(rng, recipe_id)
+                index.refresh_recipe(FakeCursor(answer(rows)), recipe_id)
+        return result
+
+    index.build(FakeCursor(during_rebuild))
+    for _ in range(10):
+        check(index, list(rows.values()), rng)
@@ -0,0 +1,77 @@
+import random
+from collections import defaultdict
+
+import pytest
+
+from backend.pantry.shopping import build_list, COST_CLASSES
+from backend.utils.units import UNITS, display_amount
+
+UNIT_CHOICES = ['g', 'kg', 'oz', 'ml', 'tbsp', 'cup', 'pcs', 'clove', 'pinch']
+COSTS = COST_CLASSES + (None,)
+
+
+def random_rows(rng, n_recipes=6, n_ingredients=8):
+    rows = []
+    for recipe_id in range(1, n_recipes + 1):
+        servings = rng.choice([0, None, 1, 2, 4, 6])
+        for ingredient_id in rng.sample(range(1, n_ingredients + 1), rng.randint(0, 5)):
+            rows.append({'recipeId': recipe_id, 'title': f'Recipe {recipe_id}', 'recipeServings': servings,
+                         'ingredientId': ingredient_id, 'name': f'Ingredient {ingredient_id}',
+                         'cost': COSTS[ingredient_id % len(COSTS)],
+                         'quantity': rng.choice([None, 0.5, 1, 2, 3.25]), 'unit': rng.choice(UNIT_CHOICES)})
+    return rows
+
+
+# brute force: scale and convert row by row, add up in a dict
+def reference_list(rows, plan, pantry):
+    scale = defaultdict(float)
+    for recipe_id, servings in plan:
+        base = next((row['recipeServings'] for row in rows if row['recipeId'] == recipe_id), None) or 0
+        scale[recipe_id] += 1.0 if servings is None or base <= 0 else servings / base
+
+    totals = defaultdict(float)
+    recipe_ids = defaultdict(set)
+    for row in rows:
+        if row['ingredientId'] in pantry:
+            continue
+        unit, factor = UNITS.get(row['unit'], (row['unit'], 1.0))
+        totals[(row['ingredientId'], unit)] += (row['quantity'] or 0) * scale[row['recipeId']] * factor
+        recipe_ids[row['ingredientId']].add(row['recipeId'])
+
+    items = {}
+    for (ingredient_id, unit), total in sorted(totals.items(), key=lambda item: (item[0][0], item[0][1])):
+        shown, shown_unit = display_amount(total, unit)
+        items.setdefault(ingredient_id, []).append({'quantity': round(shown, 2), 'unit': shown_unit})
+    return items, recipe_ids, scale
+
+
+@pytest.mark.parametrize('seed', range(80))
+def test_build_list_matches_brute_force(seed):
+    rng = random.Random(seed)
+    rows = random_rows(rng)
+    plan = [(rng.randint(1, 8), rng.choice([None, 1.0, 2.0, 5.0])) for _ in range(rng.randint(1, 6))]
+    pantry = set(rng.sample(range(1, 9), rng.randint(0, 3)))
+    planned = {recipe_id for recipe_id, _ in plan}
+    rows = [row for row in rows if row['recipeId'] in planned]
+
+    result = build_list(rows, plan, pantry)
+    items, recipe_ids, scale = reference_list(rows, plan, pantry)
+
+    assert [item['ingredientId'] for item in result['items']] == sorted(items, key=lambda i: f'ingredient {i}')
+    for item in result['items']:
+        got = sorted(item['amounts'], key=lambda a: a['unit'])
+        want = sorted(items[item['ingredientId']], key=lambda a: a['unit'])
+        assert [a['unit'] for a in got] == [a['unit'] for a in want]
+        # summed in a different order, so the last rounded digit may differ
+        assert [a['quantity'] for a in got] == pytest.approx([a['quantity'] for a in want], abs=0.011)
+        assert item['recipeIds'] == sorted(recipe_ids[item['ingredientId']])
+    for recipe in result['recipes']:
+        assert recipe['scale'] == round(scale[recipe['recipeId']], 4)
+
+    with_rows = {row['recipeId'] for row in rows}
+    assert result['missingRecipes'] == sorted(planned - with_rows)
+    assert result['unscaledRecipes'] == sorted(
+        {recipe_id for recipe_id, servings in plan if servings is not None and recipe_id in with_rows
+         and not next(row['recipeServings'] for row in rows if row['recipeId'] == recipe_id)})
+    assert result['inPantry'] == len({row['ingredientId'] for row in rows} & pantry)
+    assert sum(result['costSummary'].values()) == len(result['items'])
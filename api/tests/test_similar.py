@@ -0,0 +1,121 @@
+import math
+import random
+
+import pytest
+
+from backend.recipes.similar import SimilarRecipes
+from conftest import FakeCursor
+
+N_INGREDIENTS = 15
+
+
+def random_catalog(rng, n_recipes=20):
+    return {recipe_id: set(rng.sample(range(1, N_INGREDIENTS + 1), rng.randint(1, 6)))
+            for recipe_id in range(1, n_recipes + 1)}
+
+
+def build(catalog, tfidf):
+    index = SimilarRecipes(tfidf=tfidf)
+    pairs = [(r, i) for r, ingredients in catalog.items() for i in ingredients]
+    index.build_from_pairs([r for r, _ in pairs], [i for _, i in pairs])
+    return index
+
+
+# brute force: weight every recipe from the catalog it was built on
+# and take the cosine with every other recipe
+def reference_scores(built, current, recipe_id, tfidf):
+    n = len(built)
+    df = {}
+    for ingredients in built.values():
+        for i in ingredients:
+            df[i] = df.get(i, 0) + 1
+    max_idf = max(math.log((1.0 + n) / (1.0 + d)) + 1.0 for d in df.values())
+
+    def vector(ingredients):
+        if tfidf:
+            weights = {i: math.log((1.0 + n) / (1.0 + df[i])) + 1.0 if i in df else max_idf for i in ingredients}
+        else:
+            weights = {i: 1.0 for i in ingredients}
+        norm = math.sqrt(sum(w * w for w in weights.values()))
+        return {i: w / norm for i, w in weights.items()}
+
+    query = vector(current[recipe_id])
+    scores = {}
+    for other_id, ingredients in current.items():
+        if other_id != recipe_id:
+            score = sum(w * query.get(i, 0.0) for i, w in vector(ingredients).items())
+            if score > 0:
+                scores[other_id] = score
+    return scores
+
+
+def check(index, built, current, recipe_id, k, tfidf):
+    found = index.similar(recipe_id, k)
+    if recipe_id not in current:
+        assert found is None
+        return
+    expected = reference_scores(built, current, recipe_id, tfidf)
+    assert len(found) == min(k, len(expected))
+    assert [score for _, score in found] == pytest.approx(sorted(expected.values(), reverse=True)[:k], abs=1e-5)
+    for other_id, score in found:
+        assert score == pytest.approx(expected[other_id], abs=1e-5)
+
+
+@pytest.mark.parametrize('seed', range(60))
+@pytest.mark.parametrize('tfidf', [True, False])
+def test_similar_matches_brute_force(seed, tfidf):
+    rng = random.Random(seed)
+    catalog = random_catalog(rng)
+    index = build(catalog, tfidf)
+    for recipe_id in range(1, 22):
+        check(index, catalog, catalog, recipe_id, rng.randint(1, 25), tfidf)
+
+
+@pytest.mark.parametrize('seed', range(30))
+@pytest.mark.parametrize('tfidf', [True, False])
+def test_updates_after_build_match_brute_force(seed, tfidf):
+    rng = random.Random(seed)
+    built = random_catalog(rng)
+    index = build(built, tfidf)
+
+    # updated recipes are weighed with the idf of the last build
+    current = {recipe_id: set(ingredients) for recipe_id, ingredients in built.items()}
+    cursor = FakeCursor(lambda sql, args: [{'ingredientId': i} for i in sorted(current.get(args[0], ()))])
+    for _ in range(6):
+        recipe_id = rng.randint(1, 25)
+        if rng.random() < 0.3:
+            current.pop(recipe_id, None)
+            index.remove_recipe(recipe_id)
+        else:
+            current[recipe_id] = set(rng.sample(range(1, N_INGREDIENTS + 3), rng.randint(1, 6)))
+            index.refresh_recipe(cursor, recipe_id)
+
+    for recipe_id in range(1, 26):
+        check(index, built, current, recipe_id, rng.randint(1, 25), tfidf)
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_updates_during_a_rebuild_are_kept(seed):
+    rng = random.Random(seed)
+    built = random_catalog(rng)
+    index = build(built, True)
+
+    # the rebuild reads `built`; these writes land after that read
+    # but before the new matrix is swapped in
+    current = {recipe_id: set(ingredients) for recipe_id, ingredients in built.items()}
+    cursor = FakeCursor(lambda sql, args: [{'ingredientId': i} for i in sorted(current.get(args[0], ()))])
+
+    def during_rebuild(sql, args):
+        for _ in range(4):
+            recipe_id = rng.randint(1, 25)
+            if rng.random() < 0.3:
+                current.pop(recipe_id, None)
+                index.remove_recipe(recipe_id)
+            else:
+                current[recipe_id] = set(rng.sample(range(1, N_INGREDIENTS + 1), rng.randint(1, 6)))
+                index.refresh_recipe(cursor, recipe_id)
+        return [{'recipeId': r, 'ingredientId': i} for r, ingredients in built.items() for i in ingredients]
+
+    index.build(FakeCursor(during_rebuild))
+    for recipe_id in range(1, 26):
+        check(index, built, current, recipe_id, rng.randint(1, 25), True)
@@ -0,0 +1,98 @@
+import random
+from collections import defaultdict, deque
+
+import pytest
+
+from backend.ingredients.substitutions import SubstitutionGraph
+
+
+def random_rows(rng, n_ingredients=8, n_rows=25, n_recipes=5):
+    return [{'originalIngredientId': rng.randint(1, n_ingredients), 'subIngredientId': rng.randint(1, n_ingredients),
+             'recipeId': rng.randint(1, n_recipes), 'quantity': rng.randint(1, 3), 'unit': 'g'}
+            for _ in range(n_rows)]
+
+
+# brute force: the edges usable in `recipe_id` (every global edge,
+# plus the recipe's own when given), walked breadth-first
+def reference_distances(rows, start, depth, min_recipes, recipe_id=None):
+    support = defaultdict(set)
+    for row in rows:
+        if row['originalIngredientId'] != row['subIngredientId']:
+            support[(row['originalIngredientId'], row['subIngredientId'])].add(row['recipeId'])
+    edges = {edge for edge, recipes in support.items()
+             if len(recipes) >= min_recipes or recipe_id in recipes}
+    found = {}
+    queue = deque([(start, 0)])
+    while queue:
+        node, d = queue.popleft()
+        if d == depth:
+            continue
+        for original, sub in edges:
+            if original == node and sub != start and sub not in found:
+                found[sub] = d + 1
+                queue.append((sub, d + 1))
+    return found
+
+
+@pytest.mark.parametrize('seed', range(40))
+@pytest.mark.parametrize('depth,min_recipes', [(1, 2), (2, 2), (3, 1), (3, 2)])
+def test_substitutes_match_brute_force(seed, depth, min_recipes):
+    rng = random.Random(seed)
+    rows = random_rows(rng)
+    graph = SubstitutionGraph(depth=depth, min_recipes=min_recipes)
+    graph.build_from_rows(rows)
+
+    for ingredient_id in range(1, 9):
+        found = {s['ingredientId']: s['depth'] for s in graph.substitutes(ingredient_id)}
+        assert found == reference_distances(rows, ingredient_id, depth, min_recipes)
+        for recipe_id in range(1, 6):
+            found = {s['ingredientId']: s['depth'] for s in graph.substitutes(ingredient_id, recipe_id)}
+            assert found == reference_distances(rows, ingredient_id, depth, min_recipes, recipe_id)
+
+
+@pytest.mark.parametrize('seed', range(40))
+@pytest.mark.parametrize('depth', [1, 2, 3])
+def test_pantry_coverage_matches_brute_force(seed, depth):
+    rng = random.Random(seed)
+    rows = random_rows(rng)
+    graph = SubstitutionGraph(depth=depth, min_recipes=2)
+    graph.build_from_rows(rows)
+    pantry = set(rng.sample(range(1, 9), rng.randint(1, 4)))
+
+    covered = graph.covered(pantry)
+    for original in range(1, 9):
+        if original in pantry:
+            assert original not in covered
+            continue
+        options = {sub: reference_distances(rows, original, depth, 2).get(sub) for sub in pantry}
+        options = {sub: d for sub, d in options.items() if d is not None}
+        if not options:
+            assert original not in covered
+        else:
+            sub, d = covered[original]
+            assert d == min(options.values()) and options[sub] == d
+
+    # within a recipe, the global and recipe-only replacements
+    # together give the nearest pantry substitute
+    local = {}
+    for recipe_id, original, sub, d in zip(*(column.tolist() for column in graph.recipe_covered(pantry))):
+        assert (recipe_id, original) not in local
+        local[(recipe_id, original)] = (sub, d)
+    for recipe_id in range(1, 6):
+        for original in set(range(1, 9)) - pantry:
+            options = {sub: reference_distances(rows, original, depth, 2, recipe_id).get(sub) for sub in pantry}
+            options = {sub: d for sub, d in options.items() if d is not None}
+            best = [option for option in (covered.get(original), local.get((recipe_id, original))) if option]
+            if not options:
+                assert not best
+                continue
+            sub, d = min(best, key=lambda option: option[1])
+            assert d == min(options.values()) and options[sub] == d
+
+
+def test_direct_edges_carry_quantity_and_unit():
+    rows = [{'originalIngredientId': 1, 'subIngredientId': 2, 'recipeId': 7, 'quantity': 3, 'unit': 'tbsp'}]
+    graph = SubstitutionGraph(depth=2, min_recipes=2)
+    graph.build_from_rows(rows)
+    assert graph.substitutes(1) == []
+    assert graph.substitutes(1, 7) == [{'ingredientId': 2, 'depth': 1, 'quantity': 3, 'unit': 'tbsp'}]
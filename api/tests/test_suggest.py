@@ -0,0 +1,51 @@
+import random
+
+import pytest
+
+from backend.ingredients.suggest import IngredientSuggester, MAX_SUGGESTIONS
+from backend.ingredients.trigram import normalize
+from conftest import FakeCursor
+from test_trigram import WORDS, random_name
+
+
+def build(rows):
+    suggester = IngredientSuggester()
+    suggester.build(FakeCursor(lambda sql, args: rows))
+    return suggester
+
+
+# brute force: scan every name for a word starting with the prefix
+def reference_suggest(rows, prefix, limit, by_usage):
+    prefix = normalize(prefix)
+    if not prefix:
+        return []
+    limit = min(limit, MAX_SUGGESTIONS)
+    matches = []
+    for row in rows:
+        words = normalize(row['name']).split()
+        keys = [' '.join(words[i:]) for i in range(len(words)) if ' '.join(words[i:]).startswith(prefix)]
+        if keys:
+            matches.append((min(keys), row))
+    if by_usage:
+        matches.sort(key=lambda match: (-match[1]['recipeCount'], match[1]['ingredientId']))
+    else:
+        matches.sort(key=lambda match: (match[0], match[1]['ingredientId']))
+    return [row['ingredientId'] for _, row in matches[:limit]]
+
+
+def random_prefix(rng):
+    word = rng.choice(WORDS + ['olive oil', 'sea salt', 'x'])
+    return rng.choice([word[:1], word[:2], word[:rng.randint(1, len(word))], word.upper(), ' ' + word[:3], '?'])
+
+
+@pytest.mark.parametrize('seed', range(60))
+def test_suggest_matches_brute_force(seed):
+    rng = random.Random(seed)
+    rows = [{'ingredientId': i, 'name': random_name(rng), 'recipeCount': rng.choice([0, 1, 1, 2, 5, 40])}
+            for i in range(1, rng.randint(2, 80))]
+    suggester = build(rows)
+
+    for _ in range(20):
+        prefix, limit, by_usage = random_prefix(rng), rng.choice([1, 3, 10, 100]), rng.random() < 0.5
+        found = [row['ingredientId'] for row in suggester.suggest(prefix, limit, by_usage)]
+        assert found == reference_suggest(rows, prefix, limit, by_usage)
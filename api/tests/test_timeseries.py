@@ -0,0 +1,71 @@
+import random
+from datetime import date, timedelta
+
+import pytest
+
+from backend.utils.timeseries import downsample
+
+
+def month_index(day):
+    return day.year * 12 + day.month - 1
+
+
+# brute force: try each coarser calendar bucket, then runs of 1, 2,
+# 3, ... months, and group with a dict keyed by the bucket's first day
+def reference_downsample(rows, max_points, bucket, sum_keys):
+    if len(rows) <= max_points:
+        return rows
+    starts = {'week': lambda day: day - timedelta(days=day.weekday()),
+              'month': lambda day: date(day.year, day.month, 1)}
+    levels = ['week', 'month'] if bucket == 'day' else ['month'] if bucket == 'week' else []
+    first, last = month_index(rows[0]['date']), month_index(rows[-1]['date'])
+    months = 1
+    while len(range(first, last + 1, months)) > max_points:
+        months += 1
+
+    def runs(day):
+        i = first + (month_index(day) - first) // months * months
+        return date(i // 12, i % 12 + 1, 1)
+
+    for start in [starts[level] for level in levels] + [runs]:
+        grouped = {}
+        for row in rows:
+            point = grouped.setdefault(start(row['date']), dict({key: 0 for key in sum_keys}))
+            for key in sum_keys:
+                point[key] += row[key] or 0
+        if len(grouped) <= max_points or start is runs:
+            return [dict(point, date=day) for day, point in sorted(grouped.items())]
+
+
+def random_rows(rng, bucket, sum_keys):
+    day = date(rng.randint(2019, 2024), rng.randint(1, 12), rng.randint(1, 28))
+    if bucket == 'week':
+        day -= timedelta(days=day.weekday())
+    elif bucket == 'month':
+        day = day.replace(day=1)
+    rows = []
+    for _ in range(rng.randint(0, 120)):
+        rows.append(dict({key: rng.choice([None, 0, 1, 2, 5]) for key in sum_keys}, date=day))
+        for _ in range(rng.choice([1, 1, 1, 2, 9, 40])):
+            if bucket == 'day':
+                day += timedelta(days=1)
+            elif bucket == 'week':
+                day += timedelta(days=7)
+            else:
+                day = date(day.year + day.month // 12, day.month % 12 + 1, 1)
+    return rows
+
+
+@pytest.mark.parametrize('seed', range(100))
+@pytest.mark.parametrize('bucket', ['day', 'week', 'month'])
+def test_downsample_matches_brute_force(seed, bucket):
+    rng = random.Random(seed)
+    sum_keys = rng.choice([('count',), ('count', 'ratingCount', 'ratingSum')])
+    rows = random_rows(rng, bucket, sum_keys)
+    max_points = rng.choice([1, 2, 3, 7, 20, 500])
+
+    result = downsample(rows, max_points, bucket, sum_keys)
+    assert result == reference_downsample(rows, max_points, bucket, sum_keys)
+    assert len(result) <= max(max_points, 1)
+    for key in sum_keys:
+        assert sum(point[key] or 0 for point in result) == sum(row[key] or 0 for row in rows)
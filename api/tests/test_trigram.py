@@ -0,0 +1,82 @@
+import random
+
+import pytest
+
+from backend.ingredients.trigram import TrigramIndex, trigrams, normalize
+from conftest import FakeCursor
+
+WORDS = ['tomato', 'tomatoes', 'cherry', 'basil', 'chicken', 'breast', 'thigh', 'olive', 'oil', 'garlic',
+         'salt', 'sea', 'black', 'pepper', 'egg', 'eggs', 'flour', 'rice', 'red', 'onion']
+
+
+def random_name(rng):
+    name = ' '.join(rng.sample(WORDS, rng.randint(1, 3)))
+    return ''.join(c.upper() if rng.random() < 0.2 else c for c in name) + rng.choice(['', '!', ' (fresh)'])
+
+
+def random_query(rng):
+    name = random_name(rng)
+    # drop, double or swap a letter, like a typo would
+    i = rng.randrange(len(name))
+    return rng.choice([name, name[:i] + name[i + 1:], name[:i] + name[i] + name[i:], name[::-1], '  ', '!!'])
+
+
+def build(rows):
+    index = TrigramIndex()
+    index.build(FakeCursor(lambda sql, args: rows))
+    return index
+
+
+# brute force: Jaccard similarity against every name
+def reference_lookup(rows, name, limit, min_score):
+    if not normalize(name):
+        return []
+    query = trigrams(name)
+    scored = []
+    for row in rows:
+        grams = trigrams(row['name'])
+        score = len(query & grams) / len(query | grams)
+        if score >= min_score and score > 0:
+            scored.append((score, row['ingredientId']))
+    scored.sort(reverse=True)
+    return scored[:limit]
+
+
+def check(index, rows, rng):
+    name, limit, min_score = random_query(rng), rng.randint(1, 10), rng.choice([0.0, 0.25, 0.5])
+    found = [(score, row['ingredientId']) for row, score in index.lookup(name, limit, min_score)]
+    expected = reference_lookup(rows, name, limit, min_score)
+    assert [i for _, i in found] == [i for _, i in expected]
+    assert [score for score, _ in found] == pytest.approx([score for score, _ in expected])
+
+
+@pytest.mark.parametrize('seed', range(60))
+def test_lookup_matches_brute_force(seed):
+    rng = random.Random(seed)
+    rows = [{'ingredientId': i, 'name': random_name(rng), 'cost': None} for i in range(1, 30)]
+    index = build(rows)
+    for _ in range(10):
+        check(index, rows, rng)
+
+
+@pytest.mark.parametrize('seed', range(30))
+def test_updates_after_build_match_brute_force(seed):
+    rng = random.Random(seed)
+    rows = {i: {'ingredientId': i, 'name': random_name(rng), 'cost': None} for i in range(1, 20)}
+    index = build(list(rows.values()))
+
+    cursor = FakeCursor(lambda sql, args: [rows[args[0]]] if args[0] in rows else [])
+    for _ in range(8):
+        ingredient_id = rng.randint(1, 25)
+        if rng.random() < 0.3:
+            rows.pop(ingredient_id, None)
+            index.refresh_ingredient(cursor, ingredient_id)
+        elif rng.random() < 0.5:
+            rows[ingredient_id] = {'ingredientId': ingredient_id, 'name': random_name(rng), 'cost': None}
+            index.refresh_ingredient(cursor, ingredient_id)
+        else:
+            rows[ingredient_id] = {'ingredientId': ingredient_id, 'name': random_name(rng), 'cost': None}
+            index.add_rows([rows[ingredient_id]])
+
+    for _ in range(10):
+        check(index, list(rows.values()), rng)
@@ -0,0 +1,53 @@
+import random
+
+import pytest
+
+from backend.utils.units import UNITS, normalize_units, display_amount, unit_key
+
+
+def random_spelling(rng, unit):
+    unit = ''.join(c.upper() if rng.random() < 0.3 else c for c in unit)
+    return ' ' * rng.randint(0, 2) + unit + rng.choice(['', '.', ' ']) + ' ' * rng.randint(0, 2)
+
+
+@pytest.mark.parametrize('seed', range(50))
+def test_normalize_units_matches_one_at_a_time_lookup(seed):
+    rng = random.Random(seed)
+    aliases = list(UNITS) + ['handful', 'Dash', 'knob of']
+    units = [random_spelling(rng, rng.choice(aliases)) for _ in range(rng.randint(1, 40))]
+
+    canonical, factor = normalize_units(units)
+    for unit, got_unit, got_factor in zip(units, canonical, factor):
+        key = ' '.join(unit.strip().lower().rstrip('.').split())
+        want_unit, want_factor = UNITS.get(key, (key, 1.0))
+        assert (got_unit, got_factor) == (want_unit, want_factor)
+
+
+@pytest.mark.parametrize('unit,quantity,canonical,amount', [
+    ('kg', 1.5, 'g', 1500.0),
+    ('lbs', 1, 'g', 453.59237),
+    ('Tbsp.', 2, 'ml', 29.5735295625),
+    ('cups', 0.5, 'ml', 118.29411825),
+    ('fl  oz', 1, 'ml', 29.5735295625),
+    ('Cloves', 3, 'clove', 3.0),
+    ('', 2, 'pc', 2.0),
+])
+def test_known_conversions(unit, quantity, canonical, amount):
+    got_unit, got_factor = normalize_units([unit])
+    assert got_unit[0] == canonical
+    assert quantity * got_factor[0] == pytest.approx(amount)
+
+
+def test_unit_key_trims_case_and_spacing():
+    assert unit_key('  Fl   Oz. ') == 'fl oz'
+    assert unit_key(None) == ''
+
+
+@pytest.mark.parametrize('quantity,canonical,shown', [
+    (999.0, 'g', (999.0, 'g')),
+    (1000.0, 'g', (1.0, 'kg')),
+    (2500.0, 'ml', (2.5, 'l')),
+    (3.0, 'clove', (3.0, 'clove')),
+])
+def test_display_amount(quantity, canonical, shown):
+    assert display_amount(quantity, canonical) == shown
@@ -0,0 +1,12 @@
+###
+# Production entry point
+###
+
+# gunicorn loads `app` from here, with the settings in
+# gunicorn.conf.py:
+#   gunicorn wsgi:app
+# backend_app.py (Flask's dev server with the reloader) is
+# still the way to run the API while developing.
+from backend.rest_entry import create_app
+
+app = create_app()
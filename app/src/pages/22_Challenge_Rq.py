@@ -10,6 +10,8 @@ SideBarLinks()
 
 st.title('📝 Challenge Approval')
 API_BASE = "http://web-api:4000"
+# most requests PUT /c/requests/review accepts in one call
+MAX_REVIEW_BATCH = 1000
 
 st.header("Pending Challenge Requests")
 st.write("----")
@@ -33,7 +35,53 @@ if response.status_code == 200:
     if not requests_data:
         st.success("No pending challenge requests!")
     else:
+        # review many requests at once: one call, one transaction per
+        # MAX_REVIEW_BATCH ids (the API rejects bigger batches)
+        def review_batch(approve, decline):
+            batches = [{"approve": approve[i:i + MAX_REVIEW_BATCH], "decline": []}
+                       for i in range(0, len(approve), MAX_REVIEW_BATCH)]
+            batches += [{"approve": [], "decline": decline[i:i + MAX_REVIEW_BATCH]}
+                        for i in range(0, len(decline), MAX_REVIEW_BATCH)]
+            summary = {}
+            for batch in batches:
+                try:
+                    resp = requests.put(f"{API_BASE}/c/requests/review", json=batch)
+                    resp.raise_for_status()
+                except Exception as e:
+                    st.error("Failed to review the selected requests.")
+                    st.exception(e)
+                    failed = True
+                    break
+                for status, count in resp.json()["summary"].items():
+                    summary[status] = summary.get(status, 0) + count
+            else:
+                failed = False
+            # batches that went through before a failure stay reviewed
+            if summary:
+                st.session_state["review_summary"] = ", ".join(
+                    f"{count} {status.replace('_', ' ')}" for status, count in summary.items())
+            if not failed:
+                st.rerun()
+
+        if "review_summary" in st.session_state:
+            st.success(st.session_state.pop("review_summary"))
+
+        selected = [req['requestID'] for req in requests_data
+                    if st.session_state.get(f"select_{req['requestID']}")]
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            if st.button(f"✅ Approve selected ({len(selected)})", disabled=not selected):
+                review_batch(selected, [])
+        with col2:
+            if st.button(f"❌ Deny selected ({len(selected)})", disabled=not selected):
+                review_batch([], selected)
+        with col3:
+            if st.button(f"✅ Approve all ({len(requests_data)})"):
+                review_batch([req['requestID'] for req in requests_data], [])
+        st.write("----")
+
         for req in requests_data:
+            st.checkbox("Select", key=f"select_{req['requestID']}")
             try:
                 ing_resp = requests.get(f"{API_BASE}/c/{req['requestID']}/req-ingredients")
                 ing_resp.raise_for_status()
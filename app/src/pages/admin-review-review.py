@@ -13,8 +13,20 @@ SideBarLinks()
 
 def fetch_reviews():
     try:
-        res = requests.get(f"{API_BASE}/reviews")
-        return pd.DataFrame(res.json()) if res.status_code == 200 else pd.DataFrame()
+        # /reviews is paged; follow the "next" cursor until the last page
+        reviews, next_token = [], None
+        while True:
+            params = {"limit": 500}
+            if next_token:
+                params["next"] = next_token
+            res = requests.get(f"{API_BASE}/reviews", params=params)
+            if res.status_code != 200:
+                return pd.DataFrame()
+            page = res.json()
+            reviews.extend(page["items"])
+            next_token = page["next"]
+            if not next_token:
+                return pd.DataFrame(reviews)
     except Exception as e:
         st.error("❌ Failed to load reviews.")
         return pd.DataFrame()
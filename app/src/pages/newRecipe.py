@@ -30,16 +30,20 @@ st.write("### Ingredients")
 
 ingredients = []
 
-ingredient_options = []
-
-try:
-    ingredients_response = requests.get("http://web-api:4000/ingredients")
-    ingredients_response.raise_for_status()
-    all_ingredients = ingredients_response.json()
-    ingredient_options = sorted(list(set(i['name'] for i in all_ingredients if 'name' in i)))
-except Exception as e:
-    st.warning("Could not fetch ingredients.")
-    st.exception(e)
+# ingredient choices come from the autocomplete endpoint, one
+# small request per search box, instead of the whole table
+def suggest_ingredients(q):
+    if not q:
+        return []
+    try:
+        response = requests.get("http://web-api:4000/ingredients/suggest",
+                                params={"q": q, "limit": 20, "rank": "usage"})
+        response.raise_for_status()
+        return [i['name'] for i in response.json()]
+    except Exception as e:
+        st.warning("Could not fetch ingredients.")
+        st.exception(e)
+        return []
 
 def add_ingredient():
     ingredients.append({"name": "", "quantity": "", "unit": ""})
@@ -54,7 +58,11 @@ if st.button("Add Another Ingredient"):
 # Render the ingredients list
 for i, ingredient in enumerate(st.session_state.ingredients):
     cols = st.columns([3, 1, 1, 0.5])
-    ingredient["name"] = cols[0].selectbox(f"Ingredient", options=ingredient_options, key=f"name_{i}")
+    query = cols[0].text_input(f"Find ingredient", value=ingredient["name"], placeholder="Start typing an ingredient", key=f"search_{i}")
+    options = suggest_ingredients(query)
+    if ingredient["name"] and ingredient["name"] not in options:
+        options = [ingredient["name"]] + options
+    ingredient["name"] = cols[0].selectbox(f"Ingredient", options=options, key=f"name_{i}")
     ingredient["quantity"] = cols[1].text_input(f"Quantity", value=ingredient["quantity"], placeholder="Enter quantity", key=f"quantity_{i}")
     ingredient["unit"] = cols[2].text_input(f"Unit", value=ingredient["unit"], placeholder="Enter unit", key=f"unit_{i}")
     with cols[3]:
@@ -71,25 +79,30 @@ if st.button("Submit Recipe", type='primary', use_container_width=True):
     elif not all(ingredient["quantity"] and ingredient["unit"] for ingredient in st.session_state.ingredients if ingredient["name"]):
         st.warning("Please fill in all ingredient fields.")
     else:
-        for ingredient in st.session_state.ingredients:
-            compiled_ingredients = []
-        for ingredient in st.session_state.ingredients:
-            try:
-                ingredient_data = requests.get(f"http://web-api:4000/ingredients/{ingredient['name']}").json()
-                ingredient_id = ingredient_data[0].get('ingredientId', None)
+        # resolve every ingredient name to its id in one request
+        compiled_ingredients = []
+        chosen = [ingredient for ingredient in st.session_state.ingredients if ingredient["name"]]
+        try:
+            resolve_response = requests.post("http://web-api:4000/ingredients/resolve",
+                                             json={"names": [ingredient["name"] for ingredient in chosen]})
+            resolve_response.raise_for_status()
+            ingredient_ids = resolve_response.json()["ids"]
+        except Exception as e:
+            st.warning("Could not fetch ingredient IDs.")
+            st.exception(e)
+            ingredient_ids = {}
 
-                if ingredient_id:
-                    compiled_ingredients.append({
-                        "ingredientId": ingredient_id,
-                        "name": ingredient["name"],
-                        "quantity": ingredient["quantity"],
-                        "unit": ingredient["unit"]
-                    })
-                else:
-                    st.warning(f"Ingredient ID not found for {ingredient['name']}.")
-            except Exception as e:
-                st.warning(f"Could not fetch ingredient ID for {ingredient['name']}.")
-                st.exception(e)
+        for ingredient in chosen:
+            ingredient_id = ingredient_ids.get(ingredient["name"])
+            if ingredient_id:
+                compiled_ingredients.append({
+                    "ingredientId": ingredient_id,
+                    "name": ingredient["name"],
+                    "quantity": ingredient["quantity"],
+                    "unit": ingredient["unit"]
+                })
+            else:
+                st.warning(f"Ingredient ID not found for {ingredient['name']}.")
 
         recipe_data = {
             "title": recipe_name,
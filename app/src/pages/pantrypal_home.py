@@ -15,62 +15,70 @@ st.write("The ingredient-driven recipe platform.")
 st.write("----")
 
 
-data = {} 
-try:
-    response = requests.get('http://web-api:4000/recipes')
-    response.raise_for_status()
-    recipes = response.json()
-except Exception as e:
-    st.error("Could not connect to the API.")
-    st.exception(e)
-    recipes = []
-
-try:
-    ingredients_response = requests.get("http://web-api:4000/ingredients")
-    ingredients_response.raise_for_status()
-    all_ingredients = ingredients_response.json()  # Expecting a list of dicts with 'name'
-    ingredient_options = sorted(list(set(i['name'] for i in all_ingredients if 'name' in i)))
-except Exception as e:
-    st.warning("Could not fetch ingredients for filter.")
-    st.exception(e)
-    ingredient_options = []
+# only ask the API for ingredients matching what was typed, plus
+# whatever is already selected, instead of the whole table
+def suggest_ingredients(q):
+    if not q:
+        return []
+    try:
+        response = requests.get("http://web-api:4000/ingredients/suggest",
+                                params={"q": q, "limit": 20, "rank": "usage"})
+        response.raise_for_status()
+        return [i['name'] for i in response.json()]
+    except Exception as e:
+        st.warning("Could not fetch ingredients for filter.")
+        st.exception(e)
+        return []
 
 # UI with side-by-side layout
 col1, col2, col3 = st.columns([3,2, 1])
 with col1:
-    selected_ingredients = st.multiselect("Search by ingredients", options=ingredient_options)
+    ingredient_query = st.text_input("Find ingredients", placeholder="Start typing an ingredient")
+    already_selected = st.session_state.get("selected_ingredients", [])
+    ingredient_options = sorted(set(already_selected) | set(suggest_ingredients(ingredient_query)))
+    selected_ingredients = st.multiselect("Search by ingredients", options=ingredient_options,
+                                          key="selected_ingredients")
 with col2:
     search = st.text_input("Search by title or category")
 with col3:
     difficulty_filter = st.selectbox("Filter by difficulty", options=["All", "EASY", "MEDIUM", "HARD"])
 
-# apply search filters
-filtered_recipes = []
-for r in recipes:
-    title_match = search.lower() in r['title'].lower()
+rank_by_pantry = st.toggle("What can I cook? Rank recipes by how many of my ingredients they use",
+                           disabled=not selected_ingredients)
 
-    recipeId = r['recipeId']
-    try:
-        ingredients_response = requests.get(f"http://web-api:4000/recipe/{recipeId}/ingredients")
-        ingredients_response.raise_for_status()
-        ingredients = ingredients_response.json()
-    except Exception as e:
-        ingredients = []
-
-    ingredient_names = [ing.get('name', '').lower() for ing in ingredients]
-
-    matches_selected_ingredients = all(
-        ing.lower() in ingredient_names for ing in selected_ingredients
-    ) if selected_ingredients else True
-
-    matches_difficulty = difficulty_filter == "All" or r["difficulty"] == difficulty_filter
-    matches_search = search.lower() in r['title'].lower() or any(
-        search.lower() in ing_name for ing_name in ingredient_names
-    )
-
-    if matches_difficulty and matches_search and matches_selected_ingredients:
-        r['ingredients'] = ingredients
-        filtered_recipes.append(r)
+# "what can I cook": every recipe ranked by how much of it the
+# selected ingredients cover, instead of only exact matches
+def match_pantry(names):
+    response = requests.post("http://web-api:4000/ingredients/resolve", json={"names": names})
+    response.raise_for_status()
+    ids = list(response.json()['ids'].values())
+    if not ids:
+        return []
+    response = requests.post("http://web-api:4000/pantry/match", json={"ingredients": ids, "limit": 50})
+    response.raise_for_status()
+    matches = response.json()
+    if search:
+        matches = [r for r in matches if search.lower() in r['title'].lower()]
+    if difficulty_filter != "All":
+        matches = [r for r in matches if r.get('difficulty') == difficulty_filter]
+    return matches
+
+# apply search filters on the server: one request returns the
+# matching recipes with their ingredients already embedded
+try:
+    if rank_by_pantry and selected_ingredients:
+        filtered_recipes = match_pantry(selected_ingredients)
+    else:
+        params = {"q": search, "ingredient": selected_ingredients}
+        if difficulty_filter != "All":
+            params["difficulty"] = difficulty_filter
+        response = requests.get('http://web-api:4000/recipes/search', params=params)
+        response.raise_for_status()
+        filtered_recipes = response.json()
+except Exception as e:
+    st.error("Could not connect to the API.")
+    st.exception(e)
+    filtered_recipes = []
 
 if not filtered_recipes:
     st.info("No recipes found. Request a recipe challenge from culinary students or chefs below!")
@@ -82,14 +90,17 @@ if not filtered_recipes:
                 time.sleep(1.5)
                 # API call to submit the challenge HERE
                 ing_ids = []
-                for ing in selected_ingredients:
-                    try:
-                        response = requests.get(f"http://web-api:4000/ingredients/{ing}")
-                        response.raise_for_status()
-                        ing_ids.append(response.json()[0]['ingredientId'])
-                    except Exception as e:
+                try:
+                    response = requests.post("http://web-api:4000/ingredients/resolve",
+                                             json={"names": selected_ingredients})
+                    response.raise_for_status()
+                    resolved = response.json()
+                    ing_ids = [resolved['ids'][ing] for ing in selected_ingredients if ing in resolved['ids']]
+                    for ing in resolved['missing']:
                         st.error(f"Could not fetch ingredient ID for {ing}.")
-                        st.exception(e)
+                except Exception as e:
+                    st.error("Could not fetch ingredient IDs.")
+                    st.exception(e)
                 
                 challenge_data = {
                     "ingredients": ing_ids,
@@ -132,6 +143,14 @@ else:
                             st.switch_page('pages/user_profile.py')
                         st.markdown(f"**🕒 Prep Time:** {recipe['prepTime']} minutes | **🍽️ Servings:** {recipe['servings']}")
                         st.markdown(f"**Calories:** {recipe['calories']}")
+                        if 'coverage' in recipe:
+                            st.progress(recipe['coverage'], text=f"You have {recipe['present']} of {recipe['required']} ingredients")
+                            if recipe['missingIngredients']:
+                                missing = ", ".join(i['name'] for i in recipe['missingIngredients'])
+                                cost = f" ({recipe['missingCost'].lower()})" if recipe['missingCost'] else ""
+                                st.caption(f"Missing: {missing}{cost}")
+                            for swap in recipe.get('substitutions', []):
+                                st.caption(f"Use {swap['substituteName']} instead of {swap['name']}")
                         difficulty = recipe.get("difficulty", "UNKNOWN")
                         if difficulty == "EASY":
                             st.badge("EASY", color="green")
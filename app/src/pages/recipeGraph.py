@@ -17,26 +17,39 @@ st.markdown("Explore how recipes have been posted over time and the distribution
 # --- API Base URL ---
 API_URL = "http://web-api:4000/"
 
+# --- Report Controls ---
+# bucketing, the date range and the point budget are applied by the
+# API, so every chart gets at most MAX_POINTS points to plot
+MAX_POINTS = 200
+ctrl1, ctrl2, ctrl3 = st.columns([1, 1, 1])
+with ctrl1:
+    bucket = st.selectbox("Group by", options=["day", "week", "month"], index=1)
+with ctrl2:
+    start_date = st.date_input("From", value=None)
+with ctrl3:
+    end_date = st.date_input("To", value=None)
+
+def series_params():
+    params = {"bucket": bucket, "max_points": MAX_POINTS}
+    if start_date:
+        params["start"] = start_date.isoformat()
+    if end_date:
+        params["end"] = end_date.isoformat()
+    return params
+
 # --- Helper Functions ---
-def fetch_recipes_by_date():
+# all three charts come from one request
+def fetch_dashboard():
     try:
-        res = requests.get(f"{API_URL}/recipes/posted-over-time")
+        res = requests.get(f"{API_URL}/reports/dashboard", params=series_params())
         res.raise_for_status()
-        return pd.DataFrame(res.json())
+        return res.json()
     except requests.exceptions.RequestException as e:
-        logger.error(f"Error fetching recipe data by date: {e}")
-        st.error("Failed to fetch recipe data by date.")
-        return pd.DataFrame()
+        logger.error(f"Error fetching report data: {e}")
+        st.error("Failed to fetch report data.")
+        return {}
 
-def fetch_recipes_by_category():
-    try:
-        res = requests.get(f"{API_URL}/recipebycategory")
-        res.raise_for_status()
-        return pd.DataFrame(res.json())
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Error fetching recipe data by category: {e}")
-        st.error("Failed to fetch recipe data by category.")
-        return pd.DataFrame()
+dashboard = fetch_dashboard()
 
 # --- Layout for Side-by-Side Charts ---
 col1, col2 = st.columns(2)
@@ -44,16 +57,16 @@ col1, col2 = st.columns(2)
 # --- Chart 1: Recipes Over Time ---
 with col1:
     st.subheader("📈 Recipes Over Time")
-    df_date = fetch_recipes_by_date()
+    df_date = pd.DataFrame(dashboard.get('recipesOverTime', []))
     if not df_date.empty:
+        # already ordered and downsampled by the API
         df_date['date'] = pd.to_datetime(df_date['date'])
-        df_date = df_date.sort_values('date')
 
         fig, ax = plt.subplots()
         ax.plot(df_date['date'], df_date['count'], marker='o', linestyle='-', linewidth=2)
         ax.set_xlabel("Date")
         ax.set_ylabel("Number of Recipes")
-        ax.set_title("Recipes Posted Over Time")
+        ax.set_title(f"Recipes Posted per {bucket.capitalize()}")
         plt.xticks(rotation=45)
         st.pyplot(fig)
     else:
@@ -62,7 +75,7 @@ with col1:
 # --- Chart 2: Recipes by Category ---
 with col2:
     st.subheader("📊 Recipes by Category")
-    df_cat = fetch_recipes_by_category()
+    df_cat = pd.DataFrame(dashboard.get('recipesByCategory', []))
     if not df_cat.empty:
         fig, ax = plt.subplots(figsize=(10, 5))
         ax.bar(df_cat['categoryName'], df_cat['count'], width=0.5)
@@ -73,3 +86,23 @@ with col2:
         st.pyplot(fig)
     else:
         st.info("No category data available.")
+
+# --- Chart 3: Reviews Over Time ---
+st.subheader("⭐ Reviews Over Time")
+df_reviews = pd.DataFrame(dashboard.get('reviewsOverTime', []))
+if not df_reviews.empty:
+    df_reviews['date'] = pd.to_datetime(df_reviews['date'])
+
+    fig, ax = plt.subplots(figsize=(12, 4))
+    ax.bar(df_reviews['date'], df_reviews['count'], width={"day": 1, "week": 5, "month": 20}[bucket], color="tab:blue", alpha=0.6)
+    ax.set_xlabel("Date")
+    ax.set_ylabel("Number of Reviews")
+    ax2 = ax.twinx()
+    ax2.plot(df_reviews['date'], df_reviews['avgRating'], color="tab:orange", marker='o', linewidth=2)
+    ax2.set_ylabel("Average Rating")
+    ax2.set_ylim(0, 5)
+    ax.set_title(f"Review Volume and Average Rating per {bucket.capitalize()}")
+    plt.xticks(rotation=45)
+    st.pyplot(fig)
+else:
+    st.info("No review data available.")
@@ -14,10 +14,12 @@ recipe_id = st.session_state.get('recipeId', None)
 if not recipe_id:
     st.warning("No recipe ID provided.")
 
-recipe_req = requests.get(f"http://web-api:4000/recipe/{recipe_id}")
+# one request for the recipe, chef, ingredients, rating and reviews
+recipe_req = requests.get(f"http://web-api:4000/recipe/{recipe_id}/full")
+page_data = recipe_req.json() if recipe_req.status_code == 200 else {}
 
 st.set_page_config(
-    page_title=recipe_req.json()[0]['title'] if recipe_req.status_code == 200 else "Recipe",
+    page_title=page_data['recipe']['title'] if page_data else "Recipe",
     page_icon="🍽️",
     layout='wide',
 )
@@ -34,15 +36,14 @@ with right:
     if recipe_req.status_code != 200:
         st.error("Could not fetch recipe details.")
     else:
-        recipe_data = recipe_req.json()[0]
+        recipe_data = page_data['recipe']
         st.title(recipe_data['title'])
         st.write(recipe_data['description'])
 
-    user_req = requests.get(f"http://web-api:4000/users/{recipe_data['chefId']}")
-    if user_req.status_code != 200:
+    if not page_data:
         st.error("Could not fetch user details.")
     else:
-        user_data = user_req.json()[0]
+        user_data = page_data['chef']
         if st.button(f"### 👩‍🍳 {user_data['username']}"):
             st.session_state['viewingId'] = user_data['userId']
             st.switch_page('pages/user_profile.py')
@@ -60,11 +61,10 @@ with right:
         st.write(f"📅 {format_date(recipe_data['datePosted'])}")
     st.write("----")
 
-    ingredients_req = requests.get(f"http://web-api:4000/recipe/{recipe_id}/ingredients")
-    if ingredients_req.status_code != 200:
+    if not page_data:
         st.error("Could not fetch recipe ingredients.")
     else:
-        ingredients_data = ingredients_req.json()
+        ingredients_data = page_data['ingredients']
         st.write("### Ingredients")
         for ingredient in ingredients_data:
             left, right = st.columns([0.03, 0.95])
@@ -85,11 +85,10 @@ st.write(instructions)
 st.write("----")
 st.write("### Reviews")
 
-avg_rating = requests.get(f"http://web-api:4000/recipe/{recipe_id}/avg-rating")
-if avg_rating.status_code != 200:
+if not page_data:
     st.error("Could not fetch average rating.")
 else:
-    avg_rating_data = avg_rating.json()[0]
+    avg_rating_data = page_data['rating']
     if avg_rating_data and avg_rating_data['avg_rating'] is not None:
         avg_rating_rounded = round(float(avg_rating_data['avg_rating']), 1)
         avg_rating_display = int(avg_rating_rounded) if avg_rating_rounded.is_integer() else avg_rating_rounded
@@ -111,11 +110,10 @@ with st.expander("📝 Write a review"):
         else:
             st.error("Failed to submit review.")
 
-reviews_req = requests.get(f"http://web-api:4000/recipe/{recipe_id}/reviews")
-if reviews_req.status_code != 200:
+if not page_data:
     st.error("Could not fetch recipe reviews.")
 else:
-    reviews_data = reviews_req.json()
+    reviews_data = page_data['reviews']
     if not reviews_data:
         st.write("No reviews yet!")
     else:
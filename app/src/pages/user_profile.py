@@ -3,7 +3,6 @@ import requests
 from modules.nav import SideBarLinks
 
 API_BASE_USER = "http://web-api:4000/users"
-API_BASE_RECIPES = "http://web-api:4000/user"
 
 st.set_page_config(page_title="User Profile", page_icon="👤", layout='wide')
 
@@ -13,14 +12,12 @@ userId = st.session_state.get("viewingId", None)
 if userId:
     with st.spinner("Fetching data..."):
         try:
-            user_resp = requests.get(f"{API_BASE_USER}/{userId}")
-            user_data = user_resp.json()
+            # the user and their recipes in one request
+            profile_resp = requests.get(f"{API_BASE_USER}/{userId}/profile")
+            profile = profile_resp.json() if profile_resp.status_code == 200 else {}
 
-            if user_resp.status_code == 200 and user_data:
-                if isinstance(user_data, list):
-                    user = user_data[0]
-                else:
-                    user = user_data
+            if profile.get("user"):
+                user = profile["user"]
 
                 left, right = st.columns([1, 5])
                 with left:
@@ -33,10 +30,9 @@ if userId:
             else:
                 st.info("User not found.")
 
-            recipe_resp = requests.get(f"{API_BASE_RECIPES}/{userId}/recipes")
-            recipes = recipe_resp.json()
+            recipes = profile.get("recipes", [])
 
-            if recipe_resp.status_code == 200 and recipes:
+            if recipes:
                 st.subheader("Recipes")
                 col1, col2 = st.columns(2)
                 for idx, recipe in enumerate(recipes):
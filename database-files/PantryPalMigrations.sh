@@ -0,0 +1,13 @@
+#!/bin/bash
+# Runs by the MySQL image on first start, after PantryPalDatabase.sql
+# (init files run in alphabetical order). Applies every migration in
+# migrations/ in version order; each one records itself in the
+# schemaMigrations table.
+#
+# To bring an existing database up to date, apply the migrations it
+# is missing by hand, e.g.
+#   docker exec -i mysql_db mysql -uroot -p < database-files/migrations/001_secondary_indexes.sql
+for f in /docker-entrypoint-initdb.d/migrations/*.sql; do
+    echo "PantryPal: applying migration $f"
+    docker_process_sql < "$f"
+done
@@ -0,0 +1,50 @@
+-- Migration 001: secondary and composite indexes for the API's queries
+--
+-- Until now the schema only declared primary and foreign keys, so
+-- the filters and sorts below either leaned on the index InnoDB
+-- creates behind a foreign key or scanned the whole table.
+-- api/backend/db_connection/query_plans.py holds the queries these
+-- are for and checks their EXPLAIN plans.
+
+USE PantryPal;
+
+CREATE TABLE IF NOT EXISTS schemaMigrations
+(
+    version INT NOT NULL PRIMARY KEY,
+    name varchar(100) NOT NULL,
+    appliedAt DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- recipes: newest-first listing and keyset pages on (datePosted, recipeId),
+-- a chef's recipes, and the search page's difficulty filter
+CREATE INDEX idx_recipes_posted ON recipes (datePosted, recipeId);
+CREATE INDEX idx_recipes_chef ON recipes (chefId, datePosted);
+CREATE INDEX idx_recipes_difficulty ON recipes (difficulty, datePosted);
+
+-- recipeIngredients: ingredient -> recipe lookups (the search endpoint's
+-- set containment); the primary key already covers recipe -> ingredient
+CREATE INDEX idx_recipe_ingredients_ingredient ON recipeIngredients (ingredientId, recipeId);
+
+-- reviews: a recipe's reviews newest first, the review monitor's
+-- keyset pages, and a user's reviews
+CREATE INDEX idx_reviews_recipe ON reviews (recipeId, datePosted, reviewId);
+CREATE INDEX idx_reviews_posted ON reviews (datePosted, reviewId);
+CREATE INDEX idx_reviews_user ON reviews (userId, recipeId);
+
+-- categories: lookups and counts by category name
+CREATE INDEX idx_categories_name ON categories (categoryName, recipeId);
+
+-- challenges: the available list (status), difficulty filter,
+-- a student's challenges and keyset pages on (createdAt, challengeId)
+CREATE INDEX idx_challenges_status ON challenges (status, createdAt);
+CREATE INDEX idx_challenges_difficulty ON challenges (difficulty, status);
+CREATE INDEX idx_challenges_student ON challenges (studentId);
+CREATE INDEX idx_challenges_created ON challenges (createdAt, challengeId);
+
+-- challengeRequests: the admin queue by status, a user's requests and
+-- keyset pages on (dateSubmitted, requestID)
+CREATE INDEX idx_challenge_requests_status ON challengeRequests (status, dateSubmitted);
+CREATE INDEX idx_challenge_requests_user ON challengeRequests (requestedById, dateSubmitted);
+CREATE INDEX idx_challenge_requests_submitted ON challengeRequests (dateSubmitted, requestID);
+
+INSERT INTO schemaMigrations (version, name) VALUES (1, 'secondary_indexes');
@@ -0,0 +1,17 @@
+-- Migration 002: link each challenge to the request it was approved from
+--
+-- With the request id on the challenge, approving a batch of requests
+-- is set-based: one INSERT ... SELECT creates the challenges and one
+-- more copies every request's ingredients across, matched on requestId.
+-- The unique key also stops a request from being approved twice.
+-- Challenges posted directly (POST /c/post) and older approvals keep NULL.
+
+USE PantryPal;
+
+ALTER TABLE challenges
+    ADD COLUMN requestId INT DEFAULT NULL,
+    ADD UNIQUE KEY uq_challenges_request (requestId),
+    ADD CONSTRAINT fk_challenges_request FOREIGN KEY (requestId)
+        REFERENCES challengeRequests (requestID) ON UPDATE CASCADE ON DELETE SET NULL;
+
+INSERT INTO schemaMigrations (version, name) VALUES (2, 'challenge_request_link');
@@ -0,0 +1,53 @@
+-- Migration 003: precomputed recipe counts for the Reports page
+--
+-- recipeDailyRollups holds the number of recipes posted per day,
+-- overall and broken down by category, difficulty and chef.
+-- recipeRollupTotals holds the same counts summed over all time.
+--
+-- The API keeps both current in the same transaction as every
+-- recipe insert, update and delete (api/backend/recipes/rollups.py),
+-- so reports read a few hundred rows however large recipes grows.
+--   dimension 'all'        dimKey ''
+--   dimension 'category'   dimKey categories.categoryName
+--   dimension 'difficulty' dimKey recipes.difficulty ('' when unset)
+--   dimension 'chef'       dimKey recipes.chefId
+-- They can be rebuilt from scratch at any time with
+--   flask --app backend_app recipes rebuild-rollups
+
+USE PantryPal;
+
+CREATE TABLE recipeDailyRollups
+(
+    day DATE NOT NULL,
+    dimension ENUM('all', 'category', 'difficulty', 'chef') NOT NULL,
+    dimKey varchar(50) NOT NULL DEFAULT '',
+    recipeCount INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (dimension, dimKey, day),
+    INDEX idx_rollups_day (dimension, day)
+);
+
+CREATE TABLE recipeRollupTotals
+(
+    dimension ENUM('all', 'category', 'difficulty', 'chef') NOT NULL,
+    dimKey varchar(50) NOT NULL DEFAULT '',
+    recipeCount INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (dimension, dimKey)
+);
+
+-- backfill from the existing recipes
+INSERT INTO recipeDailyRollups (day, dimension, dimKey, recipeCount)
+SELECT DATE(datePosted), 'all', '', COUNT(*) FROM recipes GROUP BY DATE(datePosted)
+UNION ALL
+SELECT DATE(r.datePosted), 'category', c.categoryName, COUNT(*)
+FROM recipes r JOIN categories c ON c.recipeId = r.recipeId
+GROUP BY DATE(r.datePosted), c.categoryName
+UNION ALL
+SELECT DATE(datePosted), 'difficulty', COALESCE(difficulty, ''), COUNT(*) FROM recipes
+GROUP BY DATE(datePosted), COALESCE(difficulty, '')
+UNION ALL
+SELECT DATE(datePosted), 'chef', chefId, COUNT(*) FROM recipes GROUP BY DATE(datePosted), chefId;
+
+INSERT INTO recipeRollupTotals (dimension, dimKey, recipeCount)
+SELECT dimension, dimKey, SUM(recipeCount) FROM recipeDailyRollups GROUP BY dimension, dimKey;
+
+INSERT INTO schemaMigrations (version, name) VALUES (3, 'recipe_rollups');
@@ -0,0 +1,25 @@
+-- Migration 004: daily review rollups for the Reports page
+--
+-- One row per day with the number of reviews posted and the count
+-- and sum of their ratings, so review volume and average rating over
+-- time are read per day (or week, or month) instead of grouping the
+-- reviews table. Kept current by api/backend/recipes/rollups.py next
+-- to recipeDailyRollups (migration 003) and rebuilt with it by
+--   flask --app backend_app recipes rebuild-rollups
+
+USE PantryPal;
+
+CREATE TABLE reviewDailyRollups
+(
+    day DATE NOT NULL PRIMARY KEY,
+    reviewCount INT NOT NULL DEFAULT 0,
+    ratingCount INT NOT NULL DEFAULT 0,
+    ratingSum INT NOT NULL DEFAULT 0
+);
+
+INSERT INTO reviewDailyRollups (day, reviewCount, ratingCount, ratingSum)
+SELECT DATE(datePosted), COUNT(*), COUNT(rating), COALESCE(SUM(rating), 0)
+FROM reviews
+GROUP BY DATE(datePosted);
+
+INSERT INTO schemaMigrations (version, name) VALUES (4, 'review_rollups');
@@ -0,0 +1,31 @@
+-- Migration 005: table version counters for ETags
+--
+-- One row per table with a counter that the API bumps once per
+-- committed write (bump_versions in api/backend/cache/conditional.py)
+-- and reads to build ETags without running the real query. Routes
+-- decorated with @conditional answer If-None-Match with 304 while
+-- the versions of the tables they read are unchanged.
+
+USE PantryPal;
+
+CREATE TABLE tableVersions
+(
+    tableName varchar(64) NOT NULL PRIMARY KEY,
+    version BIGINT UNSIGNED NOT NULL DEFAULT 0
+);
+
+INSERT INTO tableVersions (tableName) VALUES
+('users'),
+('recipes'),
+('ingredients'),
+('recipeIngredients'),
+('challenges'),
+('challengeIngredients'),
+('challengeRequests'),
+('requestIngredients'),
+('reviews'),
+('substitutions'),
+('categories'),
+('recipeRatings');
+
+INSERT INTO schemaMigrations (version, name) VALUES (5, 'table_versions');
@@ -0,0 +1,33 @@
+-- Migration 006: per-recipe rating summaries
+--
+-- One row per reviewed recipe with the number of ratings, their sum
+-- and a 0-5 star histogram, kept current by the API whenever a review is
+-- added or deleted (api/backend/recipes/ratings.py), so rating views
+-- read one row instead of running AVG() over reviews. Rebuilt from
+-- the reviews table with
+--   flask --app backend_app recipes rebuild-ratings
+
+USE PantryPal;
+
+CREATE TABLE recipeRatings
+(
+    recipeId INT NOT NULL PRIMARY KEY,
+    ratingCount INT NOT NULL DEFAULT 0,
+    ratingSum INT NOT NULL DEFAULT 0,
+    stars0 INT NOT NULL DEFAULT 0,
+    stars1 INT NOT NULL DEFAULT 0,
+    stars2 INT NOT NULL DEFAULT 0,
+    stars3 INT NOT NULL DEFAULT 0,
+    stars4 INT NOT NULL DEFAULT 0,
+    stars5 INT NOT NULL DEFAULT 0,
+    FOREIGN KEY (recipeId) REFERENCES recipes(recipeId) ON UPDATE CASCADE ON DELETE CASCADE
+);
+
+INSERT INTO recipeRatings (recipeId, ratingCount, ratingSum, stars0, stars1, stars2, stars3, stars4, stars5)
+SELECT recipeId, COUNT(rating), COALESCE(SUM(rating), 0), COALESCE(SUM(rating = 0), 0),
+       COALESCE(SUM(rating = 1), 0), COALESCE(SUM(rating = 2), 0), COALESCE(SUM(rating = 3), 0),
+       COALESCE(SUM(rating = 4), 0), COALESCE(SUM(rating = 5), 0)
+FROM reviews
+GROUP BY recipeId;
+
+INSERT INTO schemaMigrations (version, name) VALUES (6, 'recipe_ratings');